@@ -3,6 +3,15 @@ ASGI config for finance_tracker project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, for example one process per CPU:
+
+    uvicorn finance_tracker.asgi:application --workers 4
+
+The async dashboards at /home/async/ and /portfolio/async/ only stay on the
+event loop while every middleware is async-capable; enabling
+STOCKS_PERFORMANCE_ENABLED adds a sync-only middleware. Compare throughput
+with `python manage.py benchmark --concurrency 8`.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "stocks.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,15 +75,101 @@ WSGI_APPLICATION = "finance_tracker.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Choose a profile: "default" keeps SQLite's defaults and a connection per
+# request; "throughput" switches the file to WAL so readers don't block behind
+# writers such as fetch_stocks, relaxes fsyncs to once per checkpoint, enlarges
+# the page cache and memory map, waits for locks instead of failing with
+# "database is locked" and keeps connections open between requests. The
+# pragmas are applied to every new connection by stocks.db.apply_pragmas; run
+# `python manage.py db_maintenance` periodically on either profile.
+
+STOCKS_DB_PROFILE = "default"
+
+DATABASE_PROFILES = {
+    "default": {
+        "CONN_MAX_AGE": 0,
+        "PRAGMAS": {},
+    },
+    "throughput": {
+        "CONN_MAX_AGE": 600,
+        "PRAGMAS": {
+            "journal_mode": "wal",
+            "synchronous": "normal",
+            "busy_timeout": 5000,
+            "cache_size": -64000,
+            "mmap_size": 268435456,
+            "temp_store": "memory",
+        },
+    },
+}
 
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": DATABASE_PROFILES[STOCKS_DB_PROFILE]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+STOCKS_SQLITE_PRAGMAS = DATABASE_PROFILES[STOCKS_DB_PROFILE]["PRAGMAS"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Dashboard results are cached per user; choose "locmem", "file" or "database"
+# (run `python manage.py createcachetable` for the database backend).
+
+STOCKS_CACHE_BACKEND = "locmem"
+STOCKS_CACHE_TIMEOUT = 3600
+
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fintrack",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    },
+    "database": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "stocks_cache",
+    },
+}
+
+CACHES = {
+    "default": {
+        **CACHE_BACKENDS[STOCKS_CACHE_BACKEND],
+        "TIMEOUT": STOCKS_CACHE_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
 
+# Request instrumentation (stocks.middleware.PerformanceMiddleware): adds a
+# Server-Timing header, logs slow requests and collects per-view stats shown
+# at /performance/ for staff users.
+
+STOCKS_PERFORMANCE_ENABLED = False
+STOCKS_PERFORMANCE_TRACE_ALLOCATIONS = False
+STOCKS_SLOW_REQUEST_MS = 500
+STOCKS_SLOW_REQUEST_TOP_QUERIES = 5
+
+
+# Market quotes: `python manage.py refresh_quotes` fetches the price of every
+# held symbol from the provider and caches it for STOCKS_QUOTE_TIMEOUT seconds,
+# in the cache above and in a per-process LRU of STOCKS_QUOTE_LOCAL_ENTRIES.
+# The directory provider reads Symbol,Price CSV files from STOCKS_QUOTE_SOURCE.
+# The command only reaches the web processes through a shared cache backend
+# ("file" or "database"); without quotes, holdings use their latest close.
+
+STOCKS_QUOTE_PROVIDER = "stocks.quotes.DirectoryProvider"
+STOCKS_QUOTE_SOURCE = BASE_DIR / "quotes"
+STOCKS_QUOTE_TIMEOUT = 300
+STOCKS_QUOTE_LOCAL_ENTRIES = 10000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
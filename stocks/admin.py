@@ -1,18 +1,103 @@
 from django.contrib import admin
 
-from .models import StockTransaction
+from stocks import caching, jobs, ledger, snapshots
+from stocks.pagination import EstimatedCountPaginator
+
+from .models import Holding, Security, StockTransaction
+
+
+class InputFilter(admin.SimpleListFilter):
+    # A text box instead of a link per value, so the sidebar doesn't list
+    # every user or run a DISTINCT over the whole table.
+    template = "admin/input_filter.html"
+    placeholder = ""
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "display": "All",
+            "hidden_params": [
+                (name, value)
+                for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+        }
+
+
+class UsernameFilter(InputFilter):
+    title = "user"
+    parameter_name = "username"
+    placeholder = "Username"
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(user__username=self.value().strip())
+
+
+class SymbolFilter(InputFilter):
+    title = "stock symbol"
+    parameter_name = "symbol"
+    placeholder = "Symbol"
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(security__symbol=self.value().strip().upper())
+
+
+@admin.register(Security)
+class SecurityAdmin(admin.ModelAdmin):
+    list_display = ("symbol", "name", "exchange", "isin")
+    search_fields = ("symbol", "name", "isin")
+    ordering = ("symbol",)
+
+    # Holdings keep a copy of the symbol for their (user, symbol) index, and
+    # snapshot breakdowns are keyed by it.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "symbol" in form.changed_data:
+            Holding.objects.filter(security=obj).update(symbol=obj.symbol)
+            jobs.enqueue(jobs.SNAPSHOTS, snapshots.mark_renamed(obj.pk))
+            caching.invalidate_all()
 
 
 @admin.register(StockTransaction)
 class StockTransactionAdmin(admin.ModelAdmin):
     list_display = (
         "user",
-        "stock_symbol",
+        "security",
         "transaction_type",
         "quantity",
         "price_per_share",
         "transaction_date",
     )
-    list_filter = ("user", "stock_symbol", "transaction_type")
-    search_fields = ("stock_symbol", "user__username")
+    list_filter = (UsernameFilter, SymbolFilter, "transaction_type")
+    list_select_related = ("user", "security")
+    search_fields = ("security__symbol", "user__username")
     date_hierarchy = "transaction_date"
+    # Newest first, in the order of the date indexes.
+    ordering = ("-transaction_date", "-id")
+    autocomplete_fields = ("user", "security")
+    # Exact counts of the whole table are replaced by an estimate.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Route admin writes through the ledger so holdings stay in sync.
+    def save_model(self, request, obj, form, change):
+        if change:
+            ledger.update(obj)
+        else:
+            ledger.add(obj)
+
+    def delete_model(self, request, obj):
+        ledger.delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            ledger.delete(obj)
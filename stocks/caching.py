@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = "stocks:version"
+QUOTE_VERSION_KEY = "stocks:quote:version"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, "STOCKS_CACHE_ALIAS", "default")]
+
+
+def _new_version():
+    # Time-based so a version key that was evicted never restarts at a value
+    # whose entries may still be cached.
+    return time.time_ns()
+
+
+def _versions(*keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def user_version_key(user_id):
+    return f"stocks:version:{user_id}"
+
+
+def invalidate(*user_ids):
+    # Bump after commit: a reader that runs before the commit caches the old
+    # data under the old version, which is never read again.
+    for user_id in set(user_ids):
+        transaction.on_commit(lambda user_id=user_id: _bump(user_version_key(user_id)))
+
+
+def invalidate_all():
+    transaction.on_commit(lambda: _bump(GLOBAL_VERSION_KEY))
+
+
+def quote_version():
+    return _versions(QUOTE_VERSION_KEY)[0]
+
+
+def invalidate_quotes():
+    # Cached quotes fall back to price bars; a bar load must reach them.
+    transaction.on_commit(lambda: _bump(QUOTE_VERSION_KEY))
+
+
+def _key(name, user, versions, parts):
+    return ":".join(str(part) for part in ("stocks", name, user.pk, *versions, *parts))
+
+
+def cached(user, name, compute, *parts):
+    cache = get_cache()
+    versions = _versions(GLOBAL_VERSION_KEY, user_version_key(user.pk))
+    key = _key(name, user, versions, parts)
+    value = cache.get(key)
+    if value is not None:
+        _count("hits", name)
+        return value
+
+    _count("misses", name)
+    value = compute()
+    cache.set(key, value, getattr(settings, "STOCKS_CACHE_TIMEOUT", 3600))
+    return value
+
+
+async def _aversions(*keys):
+    cache = get_cache()
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _new_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+async def acached(user, name, compute, *parts):
+    # cached() for async views: compute is a coroutine function and the cache
+    # is only reached through its async API.
+    cache = get_cache()
+    versions = await _aversions(GLOBAL_VERSION_KEY, user_version_key(user.pk))
+    key = _key(name, user, versions, parts)
+    value = await cache.aget(key)
+    if value is not None:
+        _count("hits", name)
+        return value
+
+    _count("misses", name)
+    value = await compute()
+    await cache.aset(key, value, getattr(settings, "STOCKS_CACHE_TIMEOUT", 3600))
+    return value
+
+
+def _count(outcome, name):
+    with _stats_lock:
+        _stats[outcome] += 1
+        _stats[f"{name}.{outcome}"] += 1
+    logger.debug("dashboard cache %s: %s", outcome, name)
+
+
+def stats():
+    # Per-process counters.
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = counts.get("hits", 0) + counts.get("misses", 0)
+    counts["hit_ratio"] = counts.get("hits", 0) / lookups if lookups else 0.0
+    return counts
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
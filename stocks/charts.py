@@ -0,0 +1,85 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import F, Max, Min, Sum, Window
+from django.db.models.functions import FirstValue, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from stocks.models import StockTransaction
+
+# Bucket sizes in ascending order with their approximate length in days.
+BUCKETS = (
+    ("day", TruncDay, 1),
+    ("week", TruncWeek, 7),
+    ("month", TruncMonth, 30),
+)
+
+
+def choose_bucket(start, end, points):
+    days = max((end - start).days, 1)
+    for name, trunc, length in BUCKETS:
+        if days / length <= points:
+            return name, trunc
+    return BUCKETS[-1][:2]
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def price_series(user, symbols, start=None, end=None, points=120):
+    transactions = StockTransaction.objects.filter(
+        user=user, security__symbol__in=symbols
+    )
+    if start is not None:
+        transactions = transactions.filter(transaction_date__gte=_day_start(start))
+    if end is not None:
+        transactions = transactions.filter(
+            transaction_date__lt=_day_start(end + timedelta(days=1))
+        )
+
+    if start is None or end is None:
+        bounds = transactions.aggregate(
+            first=Min("transaction_date"), last=Max("transaction_date")
+        )
+        if bounds["first"] is None:
+            return "day", {}
+        start = start or timezone.localdate(bounds["first"])
+        end = end or timezone.localdate(bounds["last"])
+
+    bucket_name, trunc = choose_bucket(start, end, points)
+    bucket = trunc("transaction_date")
+    partition = [F("security_id"), bucket]
+    ordering = [F("transaction_date").asc(), F("id").asc()]
+    # OHLC per (symbol, bucket) is computed in SQL with window functions; the
+    # DISTINCT collapses each bucket's rows into one.
+    rows = (
+        transactions.annotate(
+            bucket=bucket,
+            open=Window(FirstValue("price_per_share"), partition, ordering),
+            close=Window(
+                FirstValue("price_per_share"),
+                partition,
+                [F("transaction_date").desc(), F("id").desc()],
+            ),
+            high=Window(Max("price_per_share"), partition),
+            low=Window(Min("price_per_share"), partition),
+            volume=Window(Sum("quantity"), partition),
+        )
+        .values("security__symbol", "bucket", "open", "high", "low", "close", "volume")
+        .distinct()
+        .order_by("security__symbol", "bucket")
+    )
+
+    series = {}
+    for row in rows:
+        series.setdefault(row["security__symbol"], []).append(
+            {
+                "t": row["bucket"].date().isoformat(),
+                "open": float(row["open"]),
+                "high": float(row["high"]),
+                "low": float(row["low"]),
+                "close": float(row["close"]),
+                "volume": row["volume"],
+            }
+        )
+    return bucket_name, series
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import connection
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    # connection_created receiver: runs the STOCKS_SQLITE_PRAGMAS of the
+    # database profile on every new SQLite connection.
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "STOCKS_SQLITE_PRAGMAS", {})
+    if pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def pragma(cursor, name):
+    cursor.execute(f"PRAGMA {name}")
+    return cursor.fetchone()[0]
+
+
+def estimated_rows(model):
+    # Row count of the model's table as of the last ANALYZE (run by
+    # db_maintenance), or None without statistics.
+    if connection.vendor != "sqlite":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute(
+            "SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [model._meta.db_table]
+        )
+        # Each row starts with the number of rows in the table.
+        counts = [int(stat.split()[0]) for (stat,) in cursor.fetchall() if stat]
+    return max(counts, default=None)
@@ -0,0 +1,278 @@
+from decimal import Decimal
+
+import numpy as np
+from django.db import connections
+from django.db.models import Case, F, IntegerField, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from stocks import quotes, securities
+from stocks.models import Holding, StockTransaction
+
+PAISE = Decimal("0.01")
+DATE_BATCH_SIZE = 900
+
+
+def _paise(field):
+    # Prices are loaded as integer paise so every sum below is exact.
+    return Cast(Round(F(field) * 100), IntegerField())
+
+
+def _columns(queryset, dtypes):
+    # The ORM compiles the query but rows are read straight off the cursor,
+    # skipping per-row converters, and turned into one array per column.
+    # The SQL lists fields before annotations whatever the values_list order.
+    query = queryset.query
+    selected = list(query.values_select) + list(query.annotation_select)
+    sql, params = query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        _column(rows, selected.index(name), dtype) for name, dtype in dtypes.items()
+    ]
+
+
+def _column(rows, index, dtype):
+    return np.fromiter((row[index] for row in rows), dtype=dtype, count=len(rows))
+
+
+def _symbols(security_ids):
+    # Symbols for the grouped rows, looked up once per distinct security.
+    names = securities.symbols(int(pk) for pk in security_ids)
+    return np.array([names[int(pk)] for pk in security_ids], dtype=object)
+
+
+def _rupees(paise):
+    return (Decimal(int(paise)) * PAISE).quantize(PAISE)
+
+
+class Positions:
+    # Column-wise positions: one array element per (user, security) group.
+    # Costs are int64 paise, which holds ~9.2e16 rupees per group.
+    def __init__(
+        self, user_ids, security_ids, symbols, quantity, cost, latest_price, latest_id
+    ):
+        self.user_ids = user_ids
+        self.security_ids = security_ids
+        self.symbols = symbols
+        self.quantity = quantity
+        self.cost = cost
+        self.latest_price = latest_price
+        self.latest_id = latest_id
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0, dtype=np.int64) for _ in range(7)))
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        # Rows come back sorted by group and date, so each group is a
+        # contiguous run and its last row is the latest transaction.
+        queryset = (
+            transactions.order_by("user_id", "security_id", "transaction_date", "id")
+            .annotate(
+                signed_quantity=Case(
+                    When(transaction_type="SELL", then=-F("quantity")),
+                    default=F("quantity"),
+                    output_field=IntegerField(),
+                ),
+                paise=_paise("price_per_share"),
+            )
+            .values_list("user_id", "security_id", "signed_quantity", "paise", "id")
+        )
+        user_ids, security_ids, quantities, prices, ids = _columns(
+            queryset,
+            {
+                "user_id": np.int64,
+                "security_id": np.int64,
+                "signed_quantity": np.int64,
+                "paise": np.int64,
+                "id": np.int64,
+            },
+        )
+        if not len(user_ids):
+            return cls.empty()
+
+        boundary = np.empty(len(user_ids), dtype=bool)
+        boundary[0] = True
+        boundary[1:] = (user_ids[1:] != user_ids[:-1]) | (
+            security_ids[1:] != security_ids[:-1]
+        )
+        starts = np.flatnonzero(boundary)
+        ends = np.append(starts[1:], len(user_ids)) - 1
+
+        return cls(
+            user_ids[starts],
+            security_ids[starts],
+            _symbols(security_ids[starts]),
+            np.add.reduceat(quantities, starts),
+            np.add.reduceat(quantities * prices, starts),
+            prices[ends],
+            ids[ends],
+        )
+
+    @classmethod
+    def from_holdings(cls, holdings):
+        queryset = (
+            holdings.order_by("user_id", "security_id")
+            .annotate(
+                cost_paise=_paise("total_cost"),
+                price=Coalesce(_paise("latest_price"), 0),
+                latest_id=Coalesce("latest_transaction_id", 0),
+            )
+            .values_list(
+                "user_id",
+                "security_id",
+                "symbol",
+                "quantity",
+                "cost_paise",
+                "price",
+                "latest_id",
+            )
+        )
+        columns = _columns(
+            queryset,
+            {
+                "user_id": np.int64,
+                "security_id": np.int64,
+                "symbol": object,
+                "quantity": np.int64,
+                "cost_paise": np.int64,
+                "price": np.int64,
+                "latest_id": np.int64,
+            },
+        )
+        return cls(*columns)
+
+    def at_market(self):
+        # Last traded prices replaced by market quotes, fetched for all
+        # symbols at once; symbols without a quote keep their last trade.
+        quoted = quotes.latest(self.symbols)
+        latest_price = self.latest_price.copy()
+        for index, symbol in enumerate(self.symbols):
+            if symbol in quoted:
+                latest_price[index] = int(quoted[symbol] * 100)
+        return Positions(
+            self.user_ids,
+            self.security_ids,
+            self.symbols,
+            self.quantity,
+            self.cost,
+            latest_price,
+            self.latest_id,
+        )
+
+    def open(self):
+        mask = self.quantity > 0
+        return Positions(
+            *(
+                column[mask]
+                for column in (
+                    self.user_ids,
+                    self.security_ids,
+                    self.symbols,
+                    self.quantity,
+                    self.cost,
+                    self.latest_price,
+                    self.latest_id,
+                )
+            )
+        )
+
+    def average_price(self):
+        # In paise; 0 for closed positions.
+        return np.divide(
+            self.cost,
+            self.quantity,
+            out=np.zeros(len(self), dtype=float),
+            where=self.quantity != 0,
+        )
+
+    def market_value(self):
+        return self.quantity * self.latest_price
+
+    def unrealized(self):
+        return self.market_value() - self.cost
+
+    def percent_change(self):
+        return np.divide(
+            self.unrealized() * 100.0,
+            self.cost,
+            out=np.zeros(len(self), dtype=float),
+            where=self.cost > 0,
+        )
+
+    def total_value(self):
+        return _rupees(self.market_value().sum())
+
+    def top(self, limit):
+        # Indices of the best performers, ties broken by symbol.
+        return np.lexsort((self.symbols, -self.percent_change()))[:limit]
+
+    def by_user(self):
+        # Per-user totals: {user_id: (positions, cost, value)} in paise.
+        users, inverse = np.unique(self.user_ids, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(users))
+        costs = np.zeros(len(users), dtype=np.int64)
+        values = np.zeros(len(users), dtype=np.int64)
+        np.add.at(costs, inverse, self.cost)
+        np.add.at(values, inverse, self.market_value())
+        return {
+            int(user): (int(count), int(cost), int(value))
+            for user, count, cost, value in zip(users, counts, costs, values)
+        }
+
+    def row(self, index):
+        # Same keys and Decimal values as holdings.position(); only the
+        # selected rows are converted back from paise.
+        quantity = int(self.quantity[index])
+        total_cost = _rupees(self.cost[index])
+        latest_price = _rupees(self.latest_price[index])
+        avg_price = total_cost / quantity
+        return {
+            "symbol": self.symbols[index],
+            "quantity": quantity,
+            "total_cost": total_cost,
+            "avg_price": avg_price,
+            "latest_price": latest_price,
+            "total_value": quantity * latest_price,
+            "percent_change": (
+                (latest_price - avg_price) / avg_price * 100
+                if avg_price > 0
+                else Decimal("0.00")
+            ),
+            "latest_pk": int(self.latest_id[index]),
+        }
+
+    def rows(self, indices=None):
+        if indices is None:
+            indices = range(len(self))
+        return [self.row(index) for index in indices]
+
+    def to_holdings(self):
+        # Dates are only needed for the latest row of each group, so they are
+        # fetched by id instead of being loaded for every transaction.
+        ids = [int(pk) for pk in self.latest_id]
+        dates = {}
+        for start in range(0, len(ids), DATE_BATCH_SIZE):
+            dates.update(
+                StockTransaction.objects.filter(
+                    id__in=ids[start : start + DATE_BATCH_SIZE]
+                ).values_list("id", "transaction_date")
+            )
+        return [
+            Holding(
+                user_id=int(self.user_ids[index]),
+                security_id=int(self.security_ids[index]),
+                symbol=self.symbols[index],
+                quantity=int(self.quantity[index]),
+                total_cost=_rupees(self.cost[index]),
+                latest_price=_rupees(self.latest_price[index]),
+                latest_date=dates[ids[index]],
+                latest_transaction_id=ids[index],
+            )
+            for index in range(len(self))
+        ]
@@ -0,0 +1,58 @@
+import csv
+import io
+from decimal import Decimal
+
+from stocks.importer import COLUMNS, batched
+
+# The fetch_stocks columns first, so an export imports back as it is; the
+# extra column is ignored by the importer.
+LEDGER_COLUMNS = (*COLUMNS, "Transaction date")
+HOLDING_COLUMNS = (*COLUMNS, "Total cost")
+CHUNK_ROWS = 1000
+
+
+def _csv(header, rows):
+    # The header goes out on its own so a response starts immediately; rows
+    # follow in blocks of CHUNK_ROWS rather than one small write per row.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    for batch in batched(rows, CHUNK_ROWS):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def ledger_rows(transactions):
+    rows = transactions.values_list(
+        "security__symbol",
+        "price_per_share",
+        "transaction_type",
+        "quantity",
+        "transaction_date",
+    ).iterator(chunk_size=CHUNK_ROWS)
+    for symbol, price, trans_type, quantity, date in rows:
+        yield symbol, price, trans_type, quantity, date.isoformat()
+
+
+def holding_rows(holdings):
+    # One BUY at the average cost per holding, which imports back into the
+    # same quantity; the cost only differs by the rounding of the average.
+    rows = (
+        holdings.order_by("symbol")
+        .values_list("symbol", "quantity", "total_cost")
+        .iterator(chunk_size=CHUNK_ROWS)
+    )
+    for symbol, quantity, total_cost in rows:
+        price = (total_cost / quantity).quantize(Decimal("0.01"))
+        yield symbol, price, "BUY", quantity, total_cost
+
+
+def ledger_csv(transactions):
+    return _csv(LEDGER_COLUMNS, ledger_rows(transactions))
+
+
+def holdings_csv(holdings):
+    return _csv(HOLDING_COLUMNS, holding_rows(holdings))
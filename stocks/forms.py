@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth.models import User
 
-from stocks.models import StockTransaction
+from stocks import securities
+from stocks.models import Security, StockTransaction
 
 
 class LoginForm(forms.Form):
@@ -68,15 +69,21 @@ class SignUpForm(forms.ModelForm):
 
 
 class StockTransactionForm(forms.ModelForm):
+    # Entered as a symbol; save() resolves it to its Security, creating
+    # symbols traded for the first time.
+    stock_symbol = forms.CharField(
+        max_length=Security._meta.get_field("symbol").max_length,
+        widget=forms.TextInput(
+            attrs={
+                "class": "w-full p-3 border rounded-lg focus:border-indigo-600 focus:outline-none"
+            }
+        ),
+    )
+
     class Meta:
         model = StockTransaction
         fields = ["stock_symbol", "transaction_type", "quantity", "price_per_share"]
         widgets = {
-            "stock_symbol": forms.TextInput(
-                attrs={
-                    "class": "w-full p-3 border rounded-lg focus:border-indigo-600 focus:outline-none"
-                }
-            ),
             "transaction_type": forms.Select(
                 attrs={
                     "class": "w-full p-3 border rounded-lg focus:border-indigo-600 focus:outline-none"
@@ -95,15 +102,38 @@ class StockTransactionForm(forms.ModelForm):
             ),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.security_id:
+            self.initial.setdefault("stock_symbol", self.instance.security.symbol)
+
+    def clean_stock_symbol(self):
+        return securities.normalize(self.cleaned_data["stock_symbol"])
+
+    def save(self, commit=True):
+        self.instance.security = securities.get(self.cleaned_data["stock_symbol"])
+        return super().save(commit)
+
 
 class AdminStockTransactionForm(StockTransactionForm):
-    user_id = forms.ModelChoiceField(
-        queryset=User.objects.all(),
+    # A username rather than a <select> of every user.
+    user_id = forms.CharField(
+        max_length=150,
         required=False,
         label="User",
-        widget=forms.Select(
+        help_text="Username; leave empty to add the transaction for yourself.",
+        widget=forms.TextInput(
             attrs={
                 "class": "w-full p-3 border rounded-lg focus:border-indigo-600 focus:outline-none"
             }
         ),
     )
+
+    def clean_user_id(self):
+        username = self.cleaned_data["user_id"].strip()
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError(f"User {username!r} does not exist.")
@@ -0,0 +1,261 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from stocks import caching, engine, quotes, securities
+from stocks.models import Holding, StockTransaction
+
+
+def _signed(trans):
+    quantity = trans.quantity if trans.transaction_type == "BUY" else -trans.quantity
+    return quantity, quantity * Decimal(trans.price_per_share)
+
+
+def _is_newer(trans, holding):
+    if holding.latest_date is None:
+        return True
+    return (trans.transaction_date, trans.pk) >= (
+        holding.latest_date,
+        holding.latest_transaction_id or 0,
+    )
+
+
+def _apply(user_id, security_id, quantity, cost, latest=None):
+    holding, created = Holding.objects.get_or_create(
+        user_id=user_id,
+        security_id=security_id,
+        defaults={"symbol": lambda: securities.symbols([security_id])[security_id]},
+    )
+    updates = {
+        "quantity": F("quantity") + quantity,
+        "total_cost": F("total_cost") + cost,
+    }
+    if latest is not None and _is_newer(latest, holding):
+        updates.update(
+            latest_price=latest.price_per_share,
+            latest_date=latest.transaction_date,
+            latest_transaction_id=latest.pk,
+        )
+    Holding.objects.filter(pk=holding.pk).update(**updates)
+    if created and latest is None:
+        _refresh_latest(user_id, security_id)
+
+
+def _refresh_latest(user_id, security_id, exclude=None):
+    latest = (
+        StockTransaction.objects.filter(user_id=user_id, security_id=security_id)
+        .exclude(pk=exclude)
+        .order_by("-transaction_date", "-id")
+        .first()
+    )
+    holdings = Holding.objects.filter(user_id=user_id, security_id=security_id)
+    if latest is None:
+        # No ledger rows left for this security.
+        holdings.delete()
+        return
+    holdings.update(
+        latest_price=latest.price_per_share,
+        latest_date=latest.transaction_date,
+        latest_transaction_id=latest.pk,
+    )
+
+
+@transaction.atomic
+def apply_created(transactions):
+    deltas = {}
+    for trans in transactions:
+        quantity, cost = _signed(trans)
+        delta = deltas.setdefault(
+            (trans.user_id, trans.security_id), [0, Decimal("0.00"), None]
+        )
+        delta[0] += quantity
+        delta[1] += cost
+        if delta[2] is None or (trans.transaction_date, trans.pk) > (
+            delta[2].transaction_date,
+            delta[2].pk,
+        ):
+            delta[2] = trans
+
+    if not deltas:
+        return
+
+    # Load every affected holding in one query and write them back in bulk.
+    existing = {
+        (holding.user_id, holding.security_id): holding
+        for holding in Holding.objects.filter(
+            user_id__in={user_id for user_id, _ in deltas},
+            security_id__in={security_id for _, security_id in deltas},
+        )
+    }
+    to_create = []
+    to_update = []
+    for (user_id, security_id), (quantity, cost, latest) in deltas.items():
+        holding = existing.get((user_id, security_id))
+        if holding is None:
+            holding = Holding(user_id=user_id, security_id=security_id)
+            to_create.append(holding)
+        else:
+            to_update.append(holding)
+        holding.quantity += quantity
+        holding.total_cost += cost
+        if _is_newer(latest, holding):
+            holding.latest_price = latest.price_per_share
+            holding.latest_date = latest.transaction_date
+            holding.latest_transaction_id = latest.pk
+
+    names = securities.symbols(holding.security_id for holding in to_create)
+    for holding in to_create:
+        holding.symbol = names[holding.security_id]
+    Holding.objects.bulk_create(to_create, batch_size=500)
+    # bulk_update() builds a CASE expression per row; a plain executemany is
+    # much cheaper for large import batches.
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {Holding._meta.db_table} SET quantity = %s, total_cost = %s, "
+            "latest_price = %s, latest_date = %s, latest_transaction_id = %s "
+            "WHERE id = %s",
+            [
+                (
+                    holding.quantity,
+                    connection.ops.adapt_decimalfield_value(holding.total_cost),
+                    connection.ops.adapt_decimalfield_value(holding.latest_price),
+                    connection.ops.adapt_datetimefield_value(holding.latest_date),
+                    holding.latest_transaction_id,
+                    holding.pk,
+                )
+                for holding in to_update
+            ],
+        )
+
+
+@transaction.atomic
+def apply_updated(previous, trans):
+    if (previous.user_id, previous.security_id) != (
+        trans.user_id,
+        trans.security_id,
+    ):
+        apply_deleted(previous)
+        apply_created([trans])
+        return
+
+    old_quantity, old_cost = _signed(previous)
+    quantity, cost = _signed(trans)
+    _apply(trans.user_id, trans.security_id, quantity - old_quantity, cost - old_cost)
+    if trans.transaction_date != previous.transaction_date:
+        # A moved row may gain or lose its place as the latest.
+        _refresh_latest(trans.user_id, trans.security_id)
+        return
+    Holding.objects.filter(
+        user_id=trans.user_id,
+        security_id=trans.security_id,
+        latest_transaction_id=trans.pk,
+    ).update(latest_price=trans.price_per_share)
+
+
+@transaction.atomic
+def apply_deleted(trans):
+    quantity, cost = _signed(trans)
+    _apply(trans.user_id, trans.security_id, -quantity, -cost)
+    holding = Holding.objects.get(user_id=trans.user_id, security_id=trans.security_id)
+    if holding.latest_transaction_id in (trans.pk, None):
+        _refresh_latest(trans.user_id, trans.security_id, exclude=trans.pk)
+
+
+def open_holdings(user):
+    return Holding.objects.filter(user=user, quantity__gt=0)
+
+
+def position(holding, market_price):
+    avg_price = holding.total_cost / holding.quantity
+    return {
+        "symbol": holding.symbol,
+        "quantity": holding.quantity,
+        "total_cost": holding.total_cost,
+        "avg_price": avg_price,
+        "latest_price": market_price,
+        "total_value": holding.quantity * market_price,
+        "percent_change": (
+            (market_price - avg_price) / avg_price * 100
+            if avg_price > 0
+            else Decimal("0.00")
+        ),
+        "latest_pk": holding.latest_transaction_id,
+    }
+
+
+def valued(holdings):
+    # Positions at market prices, with one quote lookup for all of them.
+    holdings = list(holdings)
+    quoted = quotes.latest(holding.symbol for holding in holdings)
+    return [
+        position(holding, quoted.get(holding.symbol, holding.latest_price))
+        for holding in holdings
+    ]
+
+
+def positions(user):
+    return valued(open_holdings(user).order_by("symbol"))
+
+
+def market_positions(user):
+    return engine.Positions.from_holdings(open_holdings(user)).at_market()
+
+
+def top_positions(user, limit=10):
+    positions = market_positions(user)
+    return positions.rows(positions.top(limit))
+
+
+def total_value(user):
+    return market_positions(user).total_value()
+
+
+def ledger_positions(transactions):
+    return engine.Positions.from_transactions(transactions).to_holdings()
+
+
+def _state(holding):
+    return (
+        holding.symbol,
+        holding.quantity,
+        holding.total_cost,
+        holding.latest_price,
+        holding.latest_transaction_id,
+    )
+
+
+def verify(user_ids=None):
+    transactions = StockTransaction.objects.all()
+    holdings = Holding.objects.all()
+    if user_ids:
+        transactions = transactions.filter(user_id__in=user_ids)
+        holdings = holdings.filter(user_id__in=user_ids)
+
+    expected = {
+        (h.user_id, h.security_id): _state(h) for h in ledger_positions(transactions)
+    }
+    actual = {(h.user_id, h.security_id): _state(h) for h in holdings}
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    transactions = StockTransaction.objects.all()
+    holdings = Holding.objects.all()
+    if user_ids:
+        transactions = transactions.filter(user_id__in=user_ids)
+        holdings = holdings.filter(user_id__in=user_ids)
+
+    rows = ledger_positions(transactions)
+    holdings.delete()
+    Holding.objects.bulk_create(rows, batch_size=500)
+    if user_ids:
+        caching.invalidate(*user_ids)
+    else:
+        caching.invalidate_all()
+    return len(rows)
@@ -0,0 +1,107 @@
+import csv
+import glob
+import io
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from stocks.models import Security, StockTransaction
+
+COLUMNS = ("Stock symbol", "Price per share", "Transaction Type", "Quantity")
+TRANSACTION_TYPES = dict(StockTransaction.TRANSACTION_TYPES)
+SYMBOL_MAX_LENGTH = Security._meta.get_field("symbol").max_length
+
+
+def max_decimal(field):
+    # The largest value a DecimalField can store.
+    places = field.decimal_places
+    return Decimal(10) ** (field.max_digits - places) - Decimal(10) ** -places
+
+
+# PositiveIntegerField's portable upper bound; SQLite itself enforces none.
+MAX_QUANTITY = 2147483647
+MAX_PRICE = max_decimal(StockTransaction._meta.get_field("price_per_share"))
+
+
+def parse_row(row):
+    # Clean header keys and values
+    row = {(key or "").strip(): (value or "").strip() for key, value in row.items()}
+
+    symbol = row.get("Stock symbol", "").upper()
+    if not symbol or len(symbol) > SYMBOL_MAX_LENGTH:
+        raise ValueError(f"Invalid stock symbol: {symbol!r}")
+
+    trans_type = row.get("Transaction Type", "").upper()
+    if trans_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type: {trans_type!r}")
+
+    try:
+        price = Decimal(row.get("Price per share", "")).quantize(Decimal("0.01"))
+        quantity = int(row.get("Quantity", ""))
+    except (InvalidOperation, ValueError):
+        raise ValueError("Invalid price or quantity")
+    # NaN survives quantize() but cannot be compared.
+    if not price.is_finite():
+        raise ValueError("Invalid price or quantity")
+    if quantity <= 0 or price <= 0:
+        raise ValueError("Quantity and price must be positive")
+    if quantity > MAX_QUANTITY or price > MAX_PRICE:
+        raise ValueError("Quantity or price is too large")
+
+    return symbol, trans_type, quantity, price
+
+
+def read_rows(f):
+    # Yields (line number, parsed row, error) lazily so huge files are never
+    # held in memory.
+    reader = csv.DictReader(f)
+    for raw_row in reader:
+        try:
+            yield reader.line_num, parse_row(raw_row), None
+        except ValueError as exc:
+            yield reader.line_num, None, str(exc)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def find_files(source):
+    path = Path(source)
+    if path.is_dir():
+        return sorted(path.glob("*.csv"))
+    if path.is_file():
+        return [path]
+    return sorted(Path(name) for name in glob.glob(source))
+
+
+def plan_chunks(path, chunk_size):
+    # Split a file into byte ranges that start and end on line boundaries so
+    # each one can be parsed independently with the file's header. Quoted
+    # fields spanning several lines are not supported in chunked mode.
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = f.tell()
+            yield str(path), header, start, end
+            start = end
+
+
+def parse_chunk(chunk):
+    path, header, start, end = chunk
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = (header + data).decode("utf-8-sig")
+    rows = list(read_rows(io.StringIO(text, newline="")))
+    # Line numbers are only exact for the chunk right after the header.
+    offset = None if start == len(header) else start
+    return path, offset, rows, time.perf_counter() - started
@@ -0,0 +1,133 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from stocks import ledger, securities
+from stocks.importer import (
+    MAX_PRICE,
+    MAX_QUANTITY,
+    SYMBOL_MAX_LENGTH,
+    TRANSACTION_TYPES,
+)
+from stocks.models import IngestKey, StockTransaction
+
+MAX_ITEMS = 1000
+KEY_MAX_LENGTH = IngestKey._meta.get_field("key").max_length
+
+
+class Conflict(Exception):
+    # Another request inserted one of the keys first; the batch can be retried.
+    pass
+
+
+def parse_item(item):
+    # The add_transaction checks for one JSON item; returns
+    # (key, symbol, other StockTransaction fields) or raises ValueError.
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object")
+
+    key = item.get("key")
+    if key is not None and (
+        not isinstance(key, str) or not key or len(key) > KEY_MAX_LENGTH
+    ):
+        raise ValueError(f"key must be a string of 1 to {KEY_MAX_LENGTH} characters")
+
+    symbol = str(item.get("stock_symbol") or "").strip().upper()
+    if not symbol or len(symbol) > SYMBOL_MAX_LENGTH:
+        raise ValueError(f"Invalid stock symbol: {symbol!r}")
+
+    trans_type = str(item.get("transaction_type") or "").strip().upper()
+    if trans_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type: {trans_type!r}")
+
+    quantity = item.get("quantity")
+    try:
+        # Strings keep prices exact; floats are accepted but rounded.
+        price = Decimal(str(item.get("price_per_share"))).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError("Invalid price")
+    if not price.is_finite():
+        raise ValueError("Invalid price")
+    if isinstance(quantity, bool) or not isinstance(quantity, int):
+        raise ValueError("Quantity must be an integer")
+    if quantity <= 0 or price <= 0:
+        raise ValueError("Quantity and price must be positive")
+    if quantity > MAX_QUANTITY:
+        raise ValueError(f"Quantity must be at most {MAX_QUANTITY}")
+    if price > MAX_PRICE:
+        raise ValueError(f"Price must be at most {MAX_PRICE}")
+
+    return (
+        key,
+        symbol,
+        {
+            "transaction_type": trans_type,
+            "quantity": quantity,
+            "price_per_share": price,
+        },
+    )
+
+
+def validate(items):
+    # Returns the parsed items and the per-item errors, by index.
+    parsed = []
+    errors = {}
+    for index, item in enumerate(items):
+        try:
+            parsed.append(parse_item(item))
+        except ValueError as exc:
+            errors[index] = str(exc)
+    return parsed, errors
+
+
+def ingest(user, parsed):
+    # All new items are written with one bulk insert in one transaction.
+    # Items whose key was seen before, in this batch or an earlier one, are
+    # reported as duplicates of the first transaction with that key.
+    keys = [key for key, _, _ in parsed if key is not None]
+    try:
+        with transaction.atomic():
+            seen = dict(
+                IngestKey.objects.filter(user=user, key__in=keys).values_list(
+                    "key", "transaction_id"
+                )
+            )
+            symbols = securities.SymbolMap().resolve(symbol for _, symbol, _ in parsed)
+            new = []
+            for index, (key, symbol, fields) in enumerate(parsed):
+                if key is None or key not in seen:
+                    trans = StockTransaction(
+                        user=user, security_id=symbols[symbol], **fields
+                    )
+                    new.append((index, key, trans))
+                    if key is not None:
+                        seen[key] = None
+
+            created = ledger.bulk_add([trans for _, _, trans in new])
+            ids = {index: trans.pk for (index, _, _), trans in zip(new, created)}
+            IngestKey.objects.bulk_create(
+                [
+                    IngestKey(user=user, key=key, transaction_id=ids[index])
+                    for index, key, _ in new
+                    if key is not None
+                ]
+            )
+    except IntegrityError:
+        raise Conflict
+
+    first = {key: ids[index] for index, key, _ in new if key is not None}
+    results = []
+    for index, (key, _, _) in enumerate(parsed):
+        if index in ids:
+            results.append({"index": index, "status": "created", "id": ids[index]})
+        else:
+            results.append(
+                {
+                    "index": index,
+                    "status": "duplicate",
+                    "id": first.get(key, seen.get(key)),
+                }
+            )
+        if key is not None:
+            results[-1]["key"] = key
+    return results
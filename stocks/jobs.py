@@ -0,0 +1,112 @@
+import traceback
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from stocks import snapshots
+from stocks.models import Job
+
+SNAPSHOTS = "snapshots"
+IMPORT = "import"
+
+# Writes within the delay coalesce into the job they queued.
+COALESCE_DELAY = timedelta(seconds=5)
+RETRY_DELAY = timedelta(seconds=30)
+# A job RUNNING for longer belongs to a worker that stopped.
+LEASE = timedelta(hours=1)
+CLAIM_CANDIDATES = 10
+
+
+def _build_snapshots(job):
+    snapshots.build([job.user_id])
+
+
+def _import(job):
+    call_command("fetch_stocks", job.key, user=str(job.user_id), stdout=StringIO())
+
+
+HANDLERS = {SNAPSHOTS: _build_snapshots, IMPORT: _import}
+# Imports commit batch by batch, so running a failed one again would
+# duplicate the rows it had already written.
+MAX_ATTEMPTS = {SNAPSHOTS: 3, IMPORT: 1}
+
+
+def enqueue(kind, user_ids, key="", delay=COALESCE_DELAY):
+    # Inside the caller's transaction, so the job exists only if the write
+    # that needs it commits. Conflicts are users that already have one queued.
+    run_after = timezone.now() + delay
+    Job.objects.bulk_create(
+        [
+            Job(kind=kind, user_id=user_id, key=key, run_after=run_after)
+            for user_id in set(user_ids)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def claim():
+    # The next due job, marked RUNNING. The status check in the update lets
+    # several workers race for the same row; only one wins it.
+    now = timezone.now()
+    due = Job.objects.filter(status="QUEUED", run_after__lte=now)
+    for job in due.order_by("run_after", "id")[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=job.pk, status="QUEUED").update(
+            status="RUNNING", attempts=F("attempts") + 1, started_at=now
+        )
+        if claimed:
+            job.status = "RUNNING"
+            job.attempts += 1
+            job.started_at = now
+            return job
+    return None
+
+
+def run(job):
+    try:
+        HANDLERS[job.kind](job)
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status="DONE", finished_at=timezone.now(), error=""
+    )
+    return True
+
+
+def fail(job, error):
+    # Queued again with a growing delay while attempts remain, unless a newer
+    # queued job already covers the same work.
+    now = timezone.now()
+    if job.attempts < MAX_ATTEMPTS.get(job.kind, 1):
+        try:
+            with transaction.atomic():
+                Job.objects.filter(pk=job.pk).update(
+                    status="QUEUED",
+                    run_after=now + RETRY_DELAY * 2 ** (job.attempts - 1),
+                    error=error,
+                )
+            return
+        except IntegrityError:
+            pass
+    Job.objects.filter(pk=job.pk).update(status="FAILED", finished_at=now, error=error)
+
+
+def recover():
+    # Retries or fails the jobs a stopped worker left RUNNING.
+    stale = list(
+        Job.objects.filter(status="RUNNING", started_at__lt=timezone.now() - LEASE)
+    )
+    for job in stale:
+        fail(job, "The worker stopped before the job finished.")
+    return len(stale)
+
+
+def purge(days):
+    cutoff = timezone.now() - timedelta(days=days)
+    return Job.objects.filter(
+        status__in=["DONE", "FAILED"], finished_at__lt=cutoff
+    ).delete()[0]
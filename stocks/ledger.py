@@ -0,0 +1,53 @@
+from django.db import transaction
+
+from stocks import caching, holdings, jobs, lots, snapshots
+from stocks.models import StockTransaction
+
+
+@transaction.atomic
+def add(trans):
+    trans.save()
+    holdings.apply_created([trans])
+    lots.apply_created([trans])
+    snapshots.mark_stale([(trans.user_id, trans.transaction_date)])
+    jobs.enqueue(jobs.SNAPSHOTS, [trans.user_id])
+    caching.invalidate(trans.user_id)
+    return trans
+
+
+@transaction.atomic
+def bulk_add(transactions, batch_size=None):
+    created = StockTransaction.objects.bulk_create(transactions, batch_size=batch_size)
+    holdings.apply_created(created)
+    lots.apply_created(created)
+    snapshots.mark_stale((trans.user_id, trans.transaction_date) for trans in created)
+    jobs.enqueue(jobs.SNAPSHOTS, {trans.user_id for trans in created})
+    caching.invalidate(*{trans.user_id for trans in created})
+    return created
+
+
+@transaction.atomic
+def update(trans):
+    previous = StockTransaction.objects.get(pk=trans.pk)
+    trans.save()
+    holdings.apply_updated(previous, trans)
+    lots.apply_updated(previous, trans)
+    snapshots.mark_stale(
+        [
+            (previous.user_id, previous.transaction_date),
+            (trans.user_id, trans.transaction_date),
+        ]
+    )
+    jobs.enqueue(jobs.SNAPSHOTS, [previous.user_id, trans.user_id])
+    caching.invalidate(previous.user_id, trans.user_id)
+    return trans
+
+
+@transaction.atomic
+def delete(trans):
+    holdings.apply_deleted(trans)
+    lots.apply_deleted(trans)
+    snapshots.mark_stale([(trans.user_id, trans.transaction_date)])
+    jobs.enqueue(jobs.SNAPSHOTS, [trans.user_id])
+    caching.invalidate(trans.user_id)
+    trans.delete()
@@ -0,0 +1,385 @@
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    DecimalField,
+    F,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from stocks import quotes, securities
+from stocks.models import Holding, LotSale, StockTransaction, TaxLot
+
+# Shares held for more than this are long-term when sold.
+LONG_TERM = timedelta(days=365)
+BATCH_SIZE = 500
+
+
+def _key(trans):
+    return trans.transaction_date, trans.pk
+
+
+def _since(date_field, id_field, since):
+    # (date, id) >= since, in a form the (user, security, date) indexes can use.
+    date, pk = since
+    return Q(**{f"{date_field}__gt": date}) | Q(
+        **{date_field: date, f"{id_field}__gte": pk}
+    )
+
+
+def _sale(sell, lot, quantity):
+    return LotSale(
+        user_id=sell.user_id,
+        security_id=sell.security_id,
+        sell_transaction_id=sell.pk,
+        lot=lot,
+        quantity=quantity,
+        buy_price=lot.price_per_share,
+        sell_price=sell.price_per_share,
+        acquired_at=lot.acquired_at,
+        sold_at=sell.transaction_date,
+        gain=quantity * (Decimal(sell.price_per_share) - lot.price_per_share),
+        long_term=sell.transaction_date - lot.acquired_at > LONG_TERM,
+    )
+
+
+def _replay(rows, open_lots, new_lots, new_sales):
+    # BUYs open lots, SELLs drain the oldest open lot first. Shares sold
+    # beyond what is held are left unmatched.
+    for trans in rows:
+        if trans.transaction_type == "BUY":
+            lot = TaxLot(
+                user_id=trans.user_id,
+                security_id=trans.security_id,
+                buy_transaction_id=trans.pk,
+                quantity=trans.quantity,
+                remaining=trans.quantity,
+                price_per_share=trans.price_per_share,
+                acquired_at=trans.transaction_date,
+            )
+            new_lots.append(lot)
+            open_lots.append(lot)
+            continue
+
+        quantity = trans.quantity
+        while quantity and open_lots:
+            lot = open_lots[0]
+            matched = min(quantity, lot.remaining)
+            lot.remaining -= matched
+            quantity -= matched
+            new_sales.append(_sale(trans, lot, matched))
+            if not lot.remaining:
+                open_lots.pop(0)
+
+
+@transaction.atomic
+def rematch(user_id, security_id, since, exclude=None):
+    # Undo the lots and sales of one (user, security) stream from `since`
+    # onwards and replay only that suffix. SELLs never consume later lots,
+    # so everything before `since` stays valid.
+    sales = LotSale.objects.filter(
+        _since("sold_at", "sell_transaction_id", since),
+        user_id=user_id,
+        security_id=security_id,
+    )
+    restored = {}
+    for lot_id, quantity in sales.values_list("lot_id", "quantity"):
+        restored[lot_id] = restored.get(lot_id, 0) + quantity
+    sales.delete()
+
+    lots = TaxLot.objects.filter(user_id=user_id, security_id=security_id)
+    lots.filter(_since("acquired_at", "buy_transaction_id", since)).delete()
+
+    # Earlier lots get back what the undone sales took from them.
+    earlier = list(
+        lots.filter(Q(remaining__gt=0) | Q(pk__in=restored)).order_by(
+            "acquired_at", "buy_transaction_id"
+        )
+    )
+    stored = {lot.pk: lot.remaining for lot in earlier}
+    for lot in earlier:
+        lot.remaining += restored.get(lot.pk, 0)
+
+    rows = (
+        StockTransaction.objects.filter(
+            _since("transaction_date", "id", since),
+            user_id=user_id,
+            security_id=security_id,
+        )
+        .exclude(pk=exclude)
+        .order_by("transaction_date", "id")
+    )
+    new_lots = []
+    new_sales = []
+    _replay(rows, [lot for lot in earlier if lot.remaining], new_lots, new_sales)
+
+    TaxLot.objects.bulk_update(
+        [lot for lot in earlier if lot.remaining != stored[lot.pk]],
+        ["remaining"],
+        batch_size=BATCH_SIZE,
+    )
+    TaxLot.objects.bulk_create(new_lots, batch_size=BATCH_SIZE)
+    LotSale.objects.bulk_create(new_sales, batch_size=BATCH_SIZE)
+
+
+def _later(groups, since, created):
+    # Streams with existing rows at or after their new rows. Ledger rows
+    # rather than lots and sales, since a SELL that matched nothing leaves
+    # neither yet must take shares from a backdated BUY.
+    first = min(since.values())
+    rows = StockTransaction.objects.filter(
+        _since("transaction_date", "id", first),
+        user_id__in={user_id for user_id, _ in groups},
+        security_id__in={security_id for _, security_id in groups},
+    ).values_list("user_id", "security_id", "transaction_date", "id")
+    return {
+        (user_id, security_id)
+        for user_id, security_id, date, pk in rows
+        if (user_id, security_id) in since
+        and (date, pk) >= since[(user_id, security_id)]
+        and pk not in created
+    }
+
+
+@transaction.atomic
+def apply_created(transactions):
+    # New rows normally come after everything already in their stream, so
+    # all streams are extended in one pass against their open lots. Streams
+    # with later rows, e.g. from backdated rows, are re-matched.
+    groups = {}
+    for trans in sorted(transactions, key=_key):
+        groups.setdefault((trans.user_id, trans.security_id), []).append(trans)
+    if not groups:
+        return
+    since = {group: _key(rows[0]) for group, rows in groups.items()}
+
+    created = {trans.pk for rows in groups.values() for trans in rows}
+    for user_id, security_id in _later(groups, since, created):
+        rematch(user_id, security_id, since.pop((user_id, security_id)))
+    if not since:
+        return
+
+    open_lots = {group: [] for group in since}
+    for lot in TaxLot.objects.filter(
+        user_id__in={user_id for user_id, _ in since},
+        security_id__in={security_id for _, security_id in since},
+        remaining__gt=0,
+    ).order_by("acquired_at", "buy_transaction_id"):
+        if (lot.user_id, lot.security_id) in open_lots:
+            open_lots[(lot.user_id, lot.security_id)].append(lot)
+    earlier = [lot for lots in open_lots.values() for lot in lots]
+    stored = {lot.pk: lot.remaining for lot in earlier}
+
+    new_lots = []
+    new_sales = []
+    for group, lots in open_lots.items():
+        _replay(groups[group], lots, new_lots, new_sales)
+
+    TaxLot.objects.bulk_update(
+        [lot for lot in earlier if lot.remaining != stored[lot.pk]],
+        ["remaining"],
+        batch_size=BATCH_SIZE,
+    )
+    TaxLot.objects.bulk_create(new_lots, batch_size=BATCH_SIZE)
+    LotSale.objects.bulk_create(new_sales, batch_size=BATCH_SIZE)
+
+
+@transaction.atomic
+def apply_updated(previous, trans):
+    if (previous.user_id, previous.security_id) != (
+        trans.user_id,
+        trans.security_id,
+    ):
+        rematch(previous.user_id, previous.security_id, _key(previous))
+        rematch(trans.user_id, trans.security_id, _key(trans))
+        return
+
+    rematch(trans.user_id, trans.security_id, min(_key(previous), _key(trans)))
+
+
+@transaction.atomic
+def apply_deleted(trans):
+    # Runs before the row is deleted; its lot and sales go with the suffix.
+    rematch(trans.user_id, trans.security_id, _key(trans), exclude=trans.pk)
+
+
+def _flush(new_lots, new_sales):
+    TaxLot.objects.bulk_create(new_lots, batch_size=BATCH_SIZE)
+    LotSale.objects.bulk_create(new_sales, batch_size=BATCH_SIZE)
+    new_lots.clear()
+    new_sales.clear()
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    # One pass over the ledger in stream order; a stream's lots are only
+    # written once all of its SELLs have been matched.
+    transactions = StockTransaction.objects.all()
+    lots = TaxLot.objects.all()
+    if user_ids:
+        transactions = transactions.filter(user_id__in=user_ids)
+        lots = lots.filter(user_id__in=user_ids)
+    LotSale.objects.filter(lot__in=lots).delete()
+    lots.delete()
+
+    count = 0
+    new_lots = []
+    new_sales = []
+    rows = transactions.order_by(
+        "user_id", "security_id", "transaction_date", "id"
+    ).iterator(chunk_size=2000)
+    for _, group in groupby(rows, key=lambda trans: (trans.user_id, trans.security_id)):
+        before = len(new_lots)
+        _replay(group, [], new_lots, new_sales)
+        count += len(new_lots) - before
+        if len(new_lots) + len(new_sales) >= BATCH_SIZE:
+            _flush(new_lots, new_sales)
+    _flush(new_lots, new_sales)
+    return count
+
+
+LOT_STATE = (
+    "buy_transaction_id",
+    "quantity",
+    "remaining",
+    "price_per_share",
+)
+SALE_STATE = ("sell_transaction_id", "lot__buy_transaction_id", "quantity", "gain")
+
+
+def _lot_state(lot):
+    return (lot.buy_transaction_id, lot.quantity, lot.remaining, lot.price_per_share)
+
+
+def _sale_state(sale):
+    return (sale.sell_transaction_id, sale.lot.buy_transaction_id) + (
+        sale.quantity,
+        sale.gain,
+    )
+
+
+def verify(user_ids=None):
+    # (user_id, security_id) streams whose stored lots and sales differ from
+    # a FIFO replay of the ledger. Nothing is written.
+    transactions = StockTransaction.objects.all()
+    stored_lots = TaxLot.objects.all()
+    stored_sales = LotSale.objects.all()
+    if user_ids:
+        transactions = transactions.filter(user_id__in=user_ids)
+        stored_lots = stored_lots.filter(user_id__in=user_ids)
+        stored_sales = stored_sales.filter(user_id__in=user_ids)
+
+    expected = {}
+    rows = transactions.order_by(
+        "user_id", "security_id", "transaction_date", "id"
+    ).iterator(chunk_size=2000)
+    for key, group in groupby(
+        rows, key=lambda trans: (trans.user_id, trans.security_id)
+    ):
+        new_lots = []
+        new_sales = []
+        _replay(group, [], new_lots, new_sales)
+        expected[key] = (
+            sorted(_lot_state(lot) for lot in new_lots),
+            sorted(_sale_state(sale) for sale in new_sales),
+        )
+
+    actual = {}
+    for index, (queryset, fields) in enumerate(
+        [(stored_lots, LOT_STATE), (stored_sales, SALE_STATE)]
+    ):
+        for user_id, security_id, *state in queryset.values_list(
+            "user_id", "security_id", *fields
+        ).iterator(chunk_size=2000):
+            stream = actual.setdefault((user_id, security_id), ([], []))
+            stream[index].append(tuple(state))
+    for lots, sales in actual.values():
+        lots.sort()
+        sales.sort()
+
+    # A stream of SELLs that matched nothing has no lots or sales stored.
+    empty = ([], [])
+    return sorted(
+        key
+        for key in expected.keys() | actual.keys()
+        if expected.get(key, empty) != actual.get(key, empty)
+    )
+
+
+def realized_gains(user, start=None, end=None, symbol=None):
+    # {symbol: (short term, long term)} from the matched sales.
+    sales = LotSale.objects.filter(user=user)
+    if start:
+        sales = sales.filter(sold_at__gte=start)
+    if end:
+        sales = sales.filter(sold_at__lte=end)
+    if symbol:
+        sales = sales.filter(security__symbol=symbol)
+
+    rows = list(
+        sales.values("security_id", "long_term")
+        .annotate(gain=Sum("gain"))
+        .values_list("security_id", "long_term", "gain")
+    )
+    names = securities.symbols(security_id for security_id, _, _ in rows)
+    gains = {}
+    for security_id, long_term, gain in rows:
+        name = names[security_id]
+        gain = gain.quantize(Decimal("0.01"))
+        short, long = gains.get(name, (Decimal("0.00"), Decimal("0.00")))
+        gains[name] = (short, long + gain) if long_term else (short + gain, long)
+    return gains
+
+
+def unrealized_gains(user, symbol=None):
+    # {symbol: (short term, long term)} for the open lots at the market price,
+    # split by whether each lot is older than LONG_TERM today.
+    holdings = Holding.objects.filter(user=user, latest_price__isnull=False)
+    open_lots = TaxLot.objects.filter(user=user, remaining__gt=0)
+    if symbol:
+        holdings = holdings.filter(security__symbol=symbol)
+        open_lots = open_lots.filter(security__symbol=symbol)
+    names = {}
+    market = {}
+    for security_id, name, price in holdings.values_list(
+        "security_id", "security__symbol", "latest_price"
+    ):
+        names[security_id] = name
+        market[name] = price
+    market.update(quotes.latest(market))
+
+    cutoff = timezone.now() - LONG_TERM
+    gains = {}
+    for security_id, long_term, remaining, cost in (
+        open_lots.filter(security_id__in=names)
+        .values("security_id")
+        .annotate(
+            long_term=Case(
+                When(acquired_at__lt=cutoff, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+        .values("security_id", "long_term")
+        .annotate(
+            shares=Sum("remaining"),
+            cost=Sum(
+                F("remaining") * F("price_per_share"),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            ),
+        )
+        .values_list("security_id", "long_term", "shares", "cost")
+    ):
+        name = names[security_id]
+        gain = (remaining * market[name] - cost).quantize(Decimal("0.01"))
+        short, long = gains.get(name, (Decimal("0.00"), Decimal("0.00")))
+        gains[name] = (short, long + gain) if long_term else (short + gain, long)
+    return gains
@@ -0,0 +1,302 @@
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from stocks import caching
+from stocks.engine import Positions
+from stocks.models import Holding, StockTransaction
+from stocks.synthetic import LedgerGenerator
+
+
+def decimal_loop_positions(transactions):
+    portfolio = {}
+    for trans in transactions.order_by("transaction_date", "id"):
+        key = (trans.user_id, trans.security_id)
+        if key not in portfolio:
+            portfolio[key] = {"quantity": 0, "total_cost": Decimal("0.00")}
+        sign = 1 if trans.transaction_type == "BUY" else -1
+        portfolio[key]["quantity"] += sign * trans.quantity
+        portfolio[key]["total_cost"] += sign * trans.quantity * trans.price_per_share
+        portfolio[key]["latest_price"] = trans.price_per_share
+
+    for data in portfolio.values():
+        if data["quantity"] > 0:
+            data["avg_price"] = data["total_cost"] / data["quantity"]
+            data["total_value"] = data["quantity"] * data["latest_price"]
+    return portfolio
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the stocks views and the CSV importer against synthetic "
+        "ledgers of increasing size, in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000",
+            help="Comma-separated transactions per user to benchmark at "
+            "(default: 1000,10000)",
+        )
+        parser.add_argument(
+            "--users", type=int, default=3, help="Number of users (default: 3)"
+        )
+        parser.add_argument(
+            "--symbols",
+            type=int,
+            default=50,
+            help="Number of distinct stock symbols (default: 50)",
+        )
+        parser.add_argument(
+            "--sell-ratio",
+            type=float,
+            default=0.3,
+            help="Share of transactions that are SELLs (default: 0.3)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Timed requests per view and size (default: 20)",
+        )
+        parser.add_argument(
+            "--import-rows",
+            type=int,
+            default=10000,
+            help="Rows in the CSV file used for the import benchmark "
+            "(default: 10000, 0 to skip)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed (default: 42)"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=0,
+            help="Also compare WSGI and ASGI throughput of home and portfolio "
+            "with this many requests in flight (default: 0, skip)",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep the dashboard cache between requests instead of "
+            "clearing it before each one",
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            sizes = sorted({int(size) for size in kwargs["sizes"].split(",")})
+        except ValueError:
+            raise CommandError("❌ --sizes must be a list of integers.")
+        if not sizes or sizes[0] <= 0 or kwargs["repeat"] <= 0:
+            raise CommandError("❌ --sizes and --repeat must be positive.")
+
+        self.repeat = kwargs["repeat"]
+        self.warm = kwargs["warm"]
+        self.concurrency = kwargs["concurrency"]
+        generator = LedgerGenerator(
+            users=kwargs["users"],
+            symbols=kwargs["symbols"],
+            sell_ratio=kwargs["sell_ratio"],
+            seed=kwargs["seed"],
+        )
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                for size in sizes:
+                    self.run_size(generator, size, kwargs["import_rows"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_size(self, generator, size, import_rows):
+        started = time.perf_counter()
+        users = generator.grow(size)
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"▶ {len(users)} users × {size} transactions × "
+                f"{len(generator.symbols)} symbols, "
+                f"{generator.sell_ratio:.0%} SELL "
+                f"(generated in {time.perf_counter() - started:.1f}s)"
+            )
+        )
+        self.stdout.write(
+            f"  {'benchmark':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'peak KiB':>10}"
+        )
+
+        user = users[0]
+        client = Client()
+        client.force_login(user)
+        holding = Holding.objects.filter(user=user).order_by("-quantity").first()
+        symbol = holding.symbol if holding else generator.symbols[0]
+
+        views = {
+            "home": lambda: client.get(reverse("home")),
+            "portfolio": lambda: client.get(reverse("portfolio")),
+            "transactions_list": lambda: client.get(reverse("transactions-list")),
+            "search_transactions": lambda: client.get(
+                reverse("search_transactions"), {"q": symbol}
+            ),
+            "avg_price_calculator": lambda: client.post(
+                reverse("avg_price_calculator"),
+                {"stock_symbol": symbol, "quantity[]": ["10"], "price[]": ["100"]},
+            ),
+        }
+        for name, request in views.items():
+            self.report(name, *self.measure(request, self.repeat))
+
+        # All-users position math: the per-row Decimal loop the views used to
+        # run against the column-wise engine.
+        transactions = StockTransaction.objects.all()
+        repeat = max(1, self.repeat // 5)
+        self.report(
+            "positions: Decimal loop",
+            *self.measure(lambda: decimal_loop_positions(transactions), repeat),
+        )
+        self.report(
+            "positions: NumPy engine",
+            *self.measure(
+                lambda: Positions.from_transactions(transactions).open(), repeat
+            ),
+        )
+
+        if self.concurrency > 0:
+            self.benchmark_throughput(client)
+        if import_rows:
+            self.benchmark_import(generator, import_rows)
+
+    def measure(self, run, repeat, setup=None):
+        def prepare():
+            if setup:
+                setup()
+            if not self.warm:
+                caching.get_cache().clear()
+
+        prepare()
+        response = run()
+        if getattr(response, "status_code", 200) >= 400:
+            raise CommandError(f"❌ Benchmark request failed: {response.status_code}")
+
+        timings = []
+        for _ in range(repeat):
+            prepare()
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+
+        # Counted with a wrapper rather than CaptureQueriesContext, whose log
+        # is reset by the request_started signal.
+        queries = []
+        prepare()
+        with connection.execute_wrapper(
+            lambda execute, sql, params, many, context: queries.append(sql)
+            or execute(sql, params, many, context)
+        ):
+            run()
+
+        # Peak memory is measured separately, tracemalloc slows everything down.
+        prepare()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return timings, len(queries), peak
+
+    def benchmark_throughput(self, client):
+        # The sync views through the WSGI handler on a thread pool against the
+        # async views through the ASGI handler on one event loop.
+        total = self.repeat * self.concurrency
+        self.stdout.write(
+            f"  {f'throughput ({self.concurrency} in flight)':<26}"
+            f"{'WSGI req/s':>13}{'ASGI req/s':>13}"
+        )
+        for name in ("home", "portfolio"):
+            wsgi = self.wsgi_throughput(client, reverse(name), total)
+            asgi = async_to_sync(self.asgi_throughput)(
+                client, reverse(f"{name}_async"), total
+            )
+            self.stdout.write(f"  {name:<26}{wsgi:>13.1f}{asgi:>13.1f}")
+
+    def wsgi_throughput(self, client, url, total):
+        local = threading.local()
+
+        def request(_):
+            # Test clients are not thread-safe, so each thread gets its own
+            # one sharing the logged-in session.
+            if not hasattr(local, "client"):
+                local.client = Client()
+                local.client.cookies = client.cookies
+            if not self.warm:
+                caching.get_cache().clear()
+            local.client.get(url)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            list(executor.map(request, range(total)))
+        return total / (time.perf_counter() - started)
+
+    async def asgi_throughput(self, client, url, total):
+        async_client = AsyncClient()
+        async_client.cookies = client.cookies
+        in_flight = asyncio.Semaphore(self.concurrency)
+
+        async def request():
+            async with in_flight:
+                if not self.warm:
+                    await caching.get_cache().aclear()
+                await async_client.get(url)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(total)))
+        return total / (time.perf_counter() - started)
+
+    def benchmark_import(self, generator, rows):
+        user, _ = User.objects.get_or_create(username="bench_import")
+
+        def cleanup():
+            Holding.objects.filter(user=user).delete()
+            StockTransaction.objects.filter(user=user).delete()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = generator.write_csv(Path(directory) / "transactions.csv", rows)
+            timings, queries, peak = self.measure(
+                lambda: call_command(
+                    "fetch_stocks", str(path), user=user.username, stdout=StringIO()
+                ),
+                max(1, self.repeat // 10),
+                setup=cleanup,
+            )
+        cleanup()
+        self.report(f"fetch_stocks ({rows} rows)", timings, queries, peak)
+
+    def report(self, name, timings, queries, peak):
+        timings = sorted(timing * 1000 for timing in timings)
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0]
+        self.stdout.write(
+            f"  {name:<26}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+            f"{queries:>9}{peak / 1024:>10,.0f}"
+        )
@@ -0,0 +1,96 @@
+import importlib.util
+import random
+import time
+import warnings
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks.templatetags import custom_filter
+
+
+def babel_currency(number):
+    # format_indian_currency as it was before the pure-Python formatter.
+    if not number:
+        return "₹0"
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            from babel.numbers import format_number
+
+            return "₹" + str(format_number(number, locale="en_IN"))
+    except Exception:
+        return "-"
+
+
+def uncached_currency(number):
+    return "₹" + custom_filter.indian_number(number)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare format_indian_currency against the babel formatter it "
+        "replaced, on table-like values"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--values",
+            type=int,
+            default=1000,
+            help="Rows per rendered table, three values each (default: 1000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Times each table is formatted (default: 20)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed (default: 42)"
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["values"] <= 0 or kwargs["repeat"] <= 0:
+            raise CommandError("❌ --values and --repeat must be positive.")
+        if importlib.util.find_spec("babel") is None:
+            raise CommandError("❌ babel is needed to compare against it.")
+
+        rng = random.Random(kwargs["seed"])
+        # Prices, quantity * price totals and the odd float, as in the tables.
+        values = []
+        for _ in range(kwargs["values"]):
+            price = Decimal(rng.randint(1, 500000)) / 100
+            values.append(price)
+            values.append(price * rng.randint(1, 5000))
+            values.append(float(price) * 1.0375)
+
+        mismatches = [
+            value
+            for value in values
+            if custom_filter.format_indian_currency(value) != babel_currency(value)
+        ]
+        if mismatches:
+            raise CommandError(f"❌ Output differs from babel for {mismatches[:5]!r}.")
+
+        filters = {
+            "babel": babel_currency,
+            "pure Python, uncached": uncached_currency,
+            "pure Python, cached": custom_filter.format_indian_currency,
+        }
+        self.stdout.write(f"{len(values)} values x {kwargs['repeat']} renders")
+        self.stdout.write(f"  {'filter':<24}{'µs/value':>10}{'speed-up':>10}")
+        baseline = None
+        for name, format_value in filters.items():
+            started = time.perf_counter()
+            for _ in range(kwargs["repeat"]):
+                for value in values:
+                    format_value(value)
+            per_value = (time.perf_counter() - started) / (
+                kwargs["repeat"] * len(values)
+            )
+            baseline = baseline or per_value
+            self.stdout.write(
+                f"  {name:<24}{per_value * 1e6:>10.2f}{baseline / per_value:>9.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Outputs are identical to babel."))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from stocks import snapshots
+from stocks.management.users import get_user
+from stocks.models import PortfolioSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the daily portfolio value snapshots missing since the last run, "
+        "and rebuild those invalidated by backdated edits or deletes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", help="Username or id to build for (default: all users)"
+        )
+        parser.add_argument(
+            "--until", help="Last day to build, YYYY-MM-DD (default: today)"
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop the existing snapshots and build them from scratch",
+        )
+
+    def handle(self, *args, **kwargs):
+        user_ids = None
+        if kwargs["user"]:
+            user_ids = [get_user(kwargs["user"]).pk]
+        until = None
+        if kwargs["until"]:
+            until = parse_date(kwargs["until"])
+            if until is None:
+                raise CommandError("❌ --until must be a YYYY-MM-DD date.")
+
+        started = time.perf_counter()
+        if kwargs["rebuild"]:
+            existing = PortfolioSnapshot.objects.all()
+            if user_ids is not None:
+                existing = existing.filter(user_id__in=user_ids)
+            existing.delete()
+        built = snapshots.build(user_ids, until)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {sum(built.values())} snapshot days built for {len(built)} "
+                f"users in {time.perf_counter() - started:.2f}s."
+            )
+        )
@@ -0,0 +1,99 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from stocks.db import pragma
+
+INCREMENTAL = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh SQLite planner statistics, return free pages to the file "
+        "system and checkpoint the WAL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--vacuum-pages",
+            type=int,
+            default=0,
+            help="Free pages to release with incremental vacuum (default: all)",
+        )
+        parser.add_argument(
+            "--enable-incremental-vacuum",
+            action="store_true",
+            help="Switch the database to incremental auto-vacuum; this rewrites "
+            "the whole file once with VACUUM",
+        )
+
+    def stats(self, cursor):
+        path = connection.settings_dict["NAME"]
+        wal = f"{path}-wal"
+        page_size = pragma(cursor, "page_size")
+        return {
+            "journal mode": pragma(cursor, "journal_mode"),
+            "pages": pragma(cursor, "page_count"),
+            "free pages": pragma(cursor, "freelist_count"),
+            "file MiB": os.path.getsize(path) / 2**20,
+            "WAL MiB": os.path.getsize(wal) / 2**20 if os.path.exists(wal) else 0,
+            "page size": page_size,
+        }
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != "sqlite":
+            raise CommandError("❌ db_maintenance only supports SQLite.")
+        if kwargs["vacuum_pages"] < 0:
+            raise CommandError("❌ --vacuum-pages cannot be negative.")
+
+        with connection.cursor() as cursor:
+            before = self.stats(cursor)
+            started = time.perf_counter()
+
+            if kwargs["enable_incremental_vacuum"]:
+                cursor.execute(f"PRAGMA auto_vacuum = {INCREMENTAL}")
+                cursor.execute("VACUUM")
+                self.stdout.write("Rewrote the database with incremental auto-vacuum.")
+
+            cursor.execute("ANALYZE")
+            # ANALYZE already gathered everything; optimize records it so
+            # later connections don't re-analyze on their own.
+            cursor.execute("PRAGMA optimize")
+
+            if pragma(cursor, "auto_vacuum") == INCREMENTAL:
+                cursor.execute(f"PRAGMA incremental_vacuum({kwargs['vacuum_pages']})")
+                cursor.fetchall()
+            elif before["free pages"]:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"⚠️ {before['free pages']} free pages stay in the file; "
+                        "rerun with --enable-incremental-vacuum to release them."
+                    )
+                )
+
+            if before["journal mode"] == "wal":
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                busy, _, _ = cursor.fetchone()
+                if busy:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            "⚠️ Checkpoint was blocked by an open reader; "
+                            "the WAL was not truncated."
+                        )
+                    )
+
+            after = self.stats(cursor)
+
+        self.stdout.write(f"{'':<14}{'Before':>12}{'After':>12}")
+        for name, value in before.items():
+            if isinstance(value, float):
+                self.stdout.write(f"{name:<14}{value:>12.2f}{after[name]:>12.2f}")
+            else:
+                self.stdout.write(f"{name:<14}{value!s:>12}{after[name]!s:>12}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Maintenance finished in {time.perf_counter() - started:.2f}s."
+            )
+        )
@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from stocks.management.users import get_user
+from stocks.models import Holding
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN QUERY PLAN for the queries issued by each stocks view"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username or id of the user whose pages are explained",
+        )
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != "sqlite":
+            raise CommandError("❌ EXPLAIN QUERY PLAN is only supported on SQLite.")
+        user = get_user(kwargs["user"])
+        holding = Holding.objects.filter(user=user).order_by("-quantity").first()
+        symbol = holding.symbol if holding else "TCS"
+
+        factory = RequestFactory()
+        requests = {
+            "home": factory.get(reverse("home")),
+            "portfolio": factory.get(reverse("portfolio")),
+            "chart_data": factory.get(reverse("chart_data")),
+            "transactions-list": factory.get(reverse("transactions-list")),
+            "search_transactions": factory.get(
+                reverse("search_transactions"), {"q": symbol}
+            ),
+            "avg_price_calculator": factory.post(
+                reverse("avg_price_calculator"),
+                {"stock_symbol": symbol, "quantity[]": ["1"], "price[]": ["1"]},
+            ),
+        }
+
+        problems = 0
+        for name, request in requests.items():
+            request.user = user
+            with CaptureQueriesContext(connection) as queries:
+                resolve(request.path).func(request)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({request.path})"))
+            # Identical statements (e.g. N+1 lookups) are explained once.
+            counts = {}
+            for query in queries.captured_queries:
+                if query["sql"].lstrip().upper().startswith("SELECT"):
+                    counts[query["sql"]] = counts.get(query["sql"], 0) + 1
+            for sql, count in counts.items():
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                    plan = [row[-1] for row in cursor.fetchall()]
+                problems += self.report(sql, count, plan)
+
+        if problems:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️ {problems} queries scan or sort without an index."
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ All queries use an index."))
+
+    def report(self, sql, count, plan):
+        if "sqlite_master" in sql:
+            # Schema introspection, e.g. the one-off search index check.
+            return False
+        full_scans = [
+            step
+            for step in plan
+            if step.startswith("SCAN ")
+            and "COVERING INDEX" not in step
+            and "VIRTUAL TABLE INDEX" not in step
+            # Window functions re-read their own materialized subqueries.
+            and not step.startswith("SCAN (subquery")
+        ]
+        temp_sorts = [step for step in plan if "USE TEMP B-TREE" in step]
+
+        if full_scans or temp_sorts:
+            style, verdict = self.style.WARNING, "⚠️ "
+            verdict += ", ".join(
+                (["full scan"] if full_scans else [])
+                + (["temporary B-tree"] if temp_sorts else [])
+            )
+        else:
+            style, verdict = self.style.SUCCESS, "✅ index"
+
+        repeated = f" (×{count})" if count > 1 else ""
+        self.stdout.write(f"  {sql[:160]}{repeated}")
+        for step in plan:
+            self.stdout.write(f"    {step}")
+        self.stdout.write(style(f"    {verdict}"))
+        return bool(full_scans or temp_sorts)
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from stocks import exports, holdings, search
+from stocks.management.users import get_user
+from stocks.models import StockTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Export a user's transactions, open holdings or search results as CSV "
+        "in the layout fetch_stocks imports"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", required=True, help="Username or id of the user to export"
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            "--holdings",
+            action="store_true",
+            help="Export open holdings as one BUY per symbol at average cost",
+        )
+        group.add_argument("--query", help="Export the results of this search")
+        parser.add_argument(
+            "--output", help="File to write to (default: standard output)"
+        )
+
+    def handle(self, *args, **kwargs):
+        user = get_user(kwargs["user"])
+        if kwargs["holdings"]:
+            chunks = exports.holdings_csv(holdings.open_holdings(user))
+        elif kwargs["query"]:
+            chunks = exports.ledger_csv(search.search(user, kwargs["query"]))
+        else:
+            chunks = exports.ledger_csv(
+                StockTransaction.objects.filter(user=user).order_by(
+                    "transaction_date", "id"
+                )
+            )
+
+        if not kwargs["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        rows = -1
+        with open(kwargs["output"], "w", newline="", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                rows += chunk.count("\n")
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {rows} rows exported to {kwargs['output']}.")
+        )
@@ -1,56 +1,192 @@
-import csv
-from datetime import datetime
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
 
-from django.contrib.auth.models import User
-from django.core.management.base import BaseCommand
+import django
+from django.core.management.base import BaseCommand, CommandError
 
+from stocks import jobs, ledger, securities
+from stocks.importer import batched, find_files, parse_chunk, plan_chunks, read_rows
+from stocks.management.users import get_user
 from stocks.models import StockTransaction
 
+# The options a queued import runs with; run_jobs passes only the source
+# and the user.
+QUEUED_DEFAULTS = {"batch_size": 1000, "dry_run": False, "workers": 1, "chunk_size": 16}
+
 
 class Command(BaseCommand):
-    help = "Import stock transactions from a CSV file"
+    help = "Import stock transactions from CSV files"
 
     def add_arguments(self, parser):
-        parser.add_argument("csv_file", type=str, help="Path to the CSV file")
+        parser.add_argument(
+            "source",
+            type=str,
+            help="Path to a CSV file, a directory of CSV files or a glob pattern",
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username or id of the user the transactions belong to",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=QUEUED_DEFAULTS["batch_size"],
+            help="Number of rows written per database transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Parse and validate the files without writing anything",
+        )
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="Queue the import for run_jobs instead of running it now; it "
+            "runs with the default options",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=QUEUED_DEFAULTS["workers"],
+            help="Number of processes parsing files in parallel (default: 1)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=QUEUED_DEFAULTS["chunk_size"],
+            help="Size in MB of the pieces large files are split into for the "
+            "parallel workers (default: 16)",
+        )
 
     def handle(self, *args, **kwargs):
-        csv_file = kwargs["csv_file"]
+        if min(kwargs["batch_size"], kwargs["workers"], kwargs["chunk_size"]) <= 0:
+            raise CommandError(
+                "❌ --batch-size, --workers and --chunk-size must be positive."
+            )
+        if kwargs["queue"]:
+            changed = [
+                "--" + option.replace("_", "-")
+                for option, default in QUEUED_DEFAULTS.items()
+                if kwargs[option] != default
+            ]
+            if changed:
+                raise CommandError(
+                    f"❌ {', '.join(changed)} cannot be combined with --queue."
+                )
+        user = get_user(kwargs["user"])
+        files = find_files(kwargs["source"])
+        if not files:
+            raise CommandError(f"❌ No CSV files found at {kwargs['source']!r}.")
 
-        try:
-            user = User.objects.get(id=2)
-        except User.DoesNotExist:
-            self.stdout.write(self.style.ERROR("❌ User with id=2 does not exist."))
+        if kwargs["queue"]:
+            # The worker may run from another directory.
+            source = str(Path(kwargs["source"]).resolve())
+            jobs.enqueue(jobs.IMPORT, [user.pk], key=source, delay=timedelta())
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Import of {source} queued for run_jobs.")
+            )
             return
-        with open(csv_file, newline="") as f:
-            reader = csv.DictReader(f)
-            created_count = 0
-            for raw_row in reader:
-                # Clean header keys and values
-                row = {key.strip(): value.strip() for key, value in raw_row.items()}
-                print(row)
-                symbol = row["Stock symbol"].strip()
-                price = float(row["Price per share"].strip())
-                trans_type = row["Transaction Type"].strip().upper()
-                quantity = int(row["Quantity"].strip())
-
-                if trans_type not in dict(StockTransaction.TRANSACTION_TYPES):
-                    self.stdout.write(
-                        self.style.WARNING(f"⚠️ Invalid transaction type: {trans_type}")
-                    )
-                    continue
-
-                StockTransaction.objects.create(
-                    user=user,
-                    stock_symbol=symbol,
-                    price_per_share=price,
-                    transaction_type=trans_type,
-                    quantity=quantity,
-                    transaction_date=datetime.now(),
+
+        self.dry_run = kwargs["dry_run"]
+        self.symbols = securities.SymbolMap()
+        self.verbosity = kwargs["verbosity"]
+        self.stats = {
+            str(path): {"rows": 0, "rejected": 0, "parse": 0.0, "elapsed": 0.0}
+            for path in files
+        }
+        started = time.perf_counter()
+
+        if kwargs["workers"] > 1:
+            parsed = self.parse_parallel(
+                files, kwargs["workers"], kwargs["chunk_size"] * 1024 * 1024
+            )
+        else:
+            parsed = self.parse_serial(files)
+
+        # All parsed rows funnel through this single writer so SQLite never
+        # sees concurrent write transactions.
+        for path, offset, rows, parse_seconds in parsed:
+            chunk_started = time.perf_counter()
+            stats = self.stats[path]
+            valid_rows = self.valid_rows(path, offset, rows)
+            for batch in batched(valid_rows, kwargs["batch_size"]):
+                if not self.dry_run:
+                    ledger.bulk_add(self.transactions(batch, user))
+                stats["rows"] += len(batch)
+                if self.verbosity > 1:
+                    self.stdout.write(f"… {path}: {stats['rows']} rows processed")
+            stats["parse"] += parse_seconds
+            stats["elapsed"] += time.perf_counter() - chunk_started
+
+        self.report(time.perf_counter() - started)
+
+    def parse_serial(self, files):
+        for path in files:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                yield str(path), None, read_rows(f), 0.0
+
+    def parse_parallel(self, files, workers, chunk_size):
+        chunks = (chunk for path in files for chunk in plan_chunks(path, chunk_size))
+        pending = deque()
+        with ProcessPoolExecutor(workers, initializer=django.setup) as executor:
+            # Keep a bounded window of chunks in flight and hand results to
+            # the writer in file order.
+            for chunk in chunks:
+                pending.append(executor.submit(parse_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def valid_rows(self, path, offset, rows):
+        # Line numbers of parallel chunks are relative to the chunk's offset.
+        location = path if offset is None else f"{path} (chunk at byte {offset})"
+        for line_num, row, error in rows:
+            if error:
+                self.stats[path]["rejected"] += 1
+                self.stdout.write(
+                    self.style.WARNING(f"⚠️ {location} line {line_num}: {error}")
                 )
-                created_count += 1
+                continue
+            yield row
 
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"✅ {created_count} transactions imported successfully."
+    def transactions(self, rows, user):
+        # Symbols are resolved for the whole batch against the in-memory map,
+        # so only symbols new to this run cost a query.
+        ids = self.symbols.resolve(symbol for symbol, _, _, _ in rows)
+        return [
+            StockTransaction(
+                user=user,
+                security_id=ids[symbol],
+                transaction_type=trans_type,
+                quantity=quantity,
+                price_per_share=price,
+            )
+            for symbol, trans_type, quantity, price in rows
+        ]
+
+    def report(self, elapsed):
+        if len(self.stats) > 1 or self.verbosity > 1:
+            for path, stats in self.stats.items():
+                rate = stats["rows"] / stats["elapsed"] if stats["elapsed"] else 0
+                parse = f"parse {stats['parse']:.2f}s, " if stats["parse"] else ""
+                self.stdout.write(
+                    f"{path}: {stats['rows']} rows, {stats['rejected']} rejected, "
+                    f"{parse}elapsed {stats['elapsed']:.2f}s ({rate:,.0f} rows/s)"
                 )
+
+        created_count = sum(stats["rows"] for stats in self.stats.values())
+        rejected_count = sum(stats["rejected"] for stats in self.stats.values())
+        rate = created_count / elapsed if elapsed else 0
+        verb = "validated" if self.dry_run else "imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {created_count} transactions {verb} successfully "
+                f"in {elapsed:.2f}s ({rate:,.0f} rows/s), "
+                f"{rejected_count} rejected."
             )
+        )
@@ -0,0 +1,63 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks import prices
+from stocks.importer import find_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Load end-of-day price bars from CSV files with Date, Open, High, Low, "
+        "Close and Volume columns and an optional Symbol column"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source",
+            type=str,
+            help="Path to a CSV file, a directory of CSV files or a glob pattern; "
+            "files without a Symbol column are named after their symbol",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of bars upserted per query (default: 1000)",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["batch_size"] <= 0:
+            raise CommandError("❌ --batch-size must be positive.")
+        files = find_files(kwargs["source"])
+        if not files:
+            raise CommandError(f"❌ No CSV files found at {kwargs['source']!r}.")
+
+        started = time.perf_counter()
+        self.rejected = 0
+        count = 0
+        for path in files:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                count += prices.load(
+                    self.valid_bars(path, prices.read_bars(f, Path(path).stem)),
+                    kwargs["batch_size"],
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {count} price bars loaded from {len(files)} files "
+                f"in {elapsed:.2f}s, {self.rejected} rejected."
+            )
+        )
+
+    def valid_bars(self, path, rows):
+        for line_num, bar, error in rows:
+            if error:
+                self.rejected += 1
+                self.stdout.write(
+                    self.style.WARNING(f"⚠️ {path} line {line_num}: {error}")
+                )
+                continue
+            yield bar
@@ -0,0 +1,131 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks.engine import Positions
+from stocks.models import Holding, StockTransaction
+
+
+class Command(BaseCommand):
+    help = "Report open positions, cost basis and unrealized P&L for all users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only report this username (can be repeated)",
+        )
+        parser.add_argument(
+            "--from-holdings",
+            action="store_true",
+            help="Read the materialized holdings, valued at market prices, instead "
+            "of replaying the ledger",
+        )
+        parser.add_argument(
+            "--positions",
+            action="store_true",
+            help="List every open position, not just the per-user totals",
+        )
+
+    def handle(self, *args, **kwargs):
+        users = User.objects.all()
+        if kwargs["usernames"]:
+            users = users.filter(username__in=kwargs["usernames"])
+            if users.count() != len(set(kwargs["usernames"])):
+                raise CommandError("❌ One or more users do not exist.")
+        usernames = dict(users.values_list("id", "username"))
+
+        started = time.perf_counter()
+        if kwargs["from_holdings"]:
+            rows = Holding.objects.filter(user_id__in=usernames)
+            positions = Positions.from_holdings(rows).at_market()
+        else:
+            rows = StockTransaction.objects.filter(user_id__in=usernames)
+            positions = Positions.from_transactions(rows)
+        positions = positions.open()
+        elapsed = time.perf_counter() - started
+
+        if kwargs["positions"]:
+            self.write_positions(positions, usernames)
+        self.write_totals(positions, usernames)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {len(positions)} open positions for {len(usernames)} users "
+                f"computed in {elapsed:.2f}s."
+            )
+        )
+
+    def write_table(self, columns, rows):
+        # columns are (title, alignment) pairs. Each column is as wide as its
+        # longest cell and columns are two spaces apart, so large values never
+        # run into each other.
+        widths = [
+            max([len(title)] + [len(row[index]) for row in rows])
+            for index, (title, _) in enumerate(columns)
+        ]
+        for cells in [[title for title, _ in columns]] + rows:
+            self.stdout.write(
+                "  ".join(
+                    f"{cell:{align}{width}}"
+                    for cell, (_, align), width in zip(cells, columns, widths)
+                ).rstrip()
+            )
+
+    def write_positions(self, positions, usernames):
+        average = positions.average_price()
+        unrealized = positions.unrealized()
+        percent = positions.percent_change()
+        rows = [
+            [
+                usernames[int(positions.user_ids[index])],
+                positions.symbols[index],
+                f"{int(positions.quantity[index])}",
+                f"{average[index] / 100:,.2f}",
+                f"{positions.latest_price[index] / 100:,.2f}",
+                f"{unrealized[index] / 100:,.2f}",
+                f"{percent[index]:.2f}%",
+            ]
+            for index in range(len(positions))
+        ]
+        self.write_table(
+            [
+                ("user", "<"),
+                ("symbol", "<"),
+                ("quantity", ">"),
+                ("avg price", ">"),
+                ("latest", ">"),
+                ("unrealized", ">"),
+                ("change", ">"),
+            ],
+            rows,
+        )
+
+    def write_totals(self, positions, usernames):
+        totals = positions.by_user()
+        rows = []
+        for user_id, username in sorted(usernames.items(), key=lambda item: item[1]):
+            count, cost, value = totals.get(user_id, (0, 0, 0))
+            change = (value - cost) / cost * 100 if cost > 0 else 0.0
+            rows.append(
+                [
+                    username,
+                    f"{count}",
+                    f"{cost / 100:,.2f}",
+                    f"{value / 100:,.2f}",
+                    f"{(value - cost) / 100:,.2f}",
+                    f"{change:.2f}%",
+                ]
+            )
+        self.write_table(
+            [
+                ("user", "<"),
+                ("positions", ">"),
+                ("invested", ">"),
+                ("market value", ">"),
+                ("unrealized", ">"),
+                ("change", ">"),
+            ],
+            rows,
+        )
@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks import holdings, lots, securities
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized holdings and tax lots from the transaction "
+        "ledger, or verify them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only process this username (can be repeated)",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compare holdings and tax lots with the ledger without writing "
+            "anything",
+        )
+
+    def handle(self, *args, **kwargs):
+        user_ids = None
+        if kwargs["usernames"]:
+            user_ids = list(
+                User.objects.filter(username__in=kwargs["usernames"]).values_list(
+                    "id", flat=True
+                )
+            )
+            if len(user_ids) != len(set(kwargs["usernames"])):
+                raise CommandError("❌ One or more users do not exist.")
+
+        if kwargs["verify"]:
+            mismatches = holdings.verify(user_ids)
+            streams = lots.verify(user_ids)
+            names = securities.symbols(
+                [security_id for (_, security_id), _, _ in mismatches]
+                + [security_id for _, security_id in streams]
+            )
+            for (user_id, security_id), expected, actual in mismatches:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"⚠️ user={user_id} {names[security_id]}: "
+                        f"ledger={expected} holding={actual}"
+                    )
+                )
+            for user_id, security_id in streams:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"⚠️ user={user_id} {names[security_id]}: tax lots differ "
+                        "from a FIFO replay of the ledger"
+                    )
+                )
+            if mismatches or streams:
+                raise CommandError(
+                    f"❌ {len(mismatches)} holdings and {len(streams)} tax lot "
+                    "streams out of sync."
+                )
+            self.stdout.write(
+                self.style.SUCCESS("✅ Holdings and tax lots match the ledger.")
+            )
+            return
+
+        count = holdings.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"✅ {count} holdings rebuilt."))
+        count = lots.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"✅ {count} tax lots rebuilt."))
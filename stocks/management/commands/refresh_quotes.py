@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks import quotes
+from stocks.models import Holding
+
+
+class Command(BaseCommand):
+    help = "Fetch market quotes for every symbol held by any user and cache them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            help="File or directory for the directory provider "
+            "(default: STOCKS_QUOTE_SOURCE)",
+        )
+
+    def handle(self, *args, **kwargs):
+        symbols = set(
+            Holding.objects.filter(quantity__gt=0)
+            .values_list("security__symbol", flat=True)
+            .distinct()
+        )
+        if not symbols:
+            self.stdout.write(self.style.WARNING("⚠️ No open holdings to quote."))
+            return
+
+        provider = None
+        if kwargs["source"]:
+            provider = quotes.DirectoryProvider(kwargs["source"])
+        started = time.perf_counter()
+        try:
+            fetched = quotes.refresh(symbols, provider)
+        except OSError as exc:
+            raise CommandError(f"❌ Could not read quotes: {exc}")
+
+        missing = len(symbols) - len(fetched)
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️ {missing} symbols had no quote and keep their latest close."
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {len(fetched)} quotes refreshed in "
+                f"{time.perf_counter() - started:.2f}s."
+            )
+        )
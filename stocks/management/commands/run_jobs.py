@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from stocks import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (snapshot rebuilds after ledger writes, "
+        "queued imports), retrying failures"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no job is due instead of waiting for more",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2,
+            help="Seconds to wait between polls of an empty queue (default: 2)",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Days finished jobs are kept for the status page (default: 7)",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["interval"] <= 0 or kwargs["keep_days"] < 0:
+            raise CommandError(
+                "❌ --interval must be positive and --keep-days not negative."
+            )
+
+        recovered = jobs.recover()
+        if recovered:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️ {recovered} jobs left running by a stopped worker."
+                )
+            )
+        purged = jobs.purge(kwargs["keep_days"])
+        if purged:
+            self.stdout.write(f"{purged} finished jobs purged.")
+
+        self.done = self.failed = 0
+        try:
+            self.work(kwargs["once"], kwargs["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("⚠️ Interrupted."))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {self.done} jobs done, {self.failed} failed.")
+        )
+
+    def work(self, once, interval):
+        while True:
+            # The worker outlives CONN_MAX_AGE; drop connections past it.
+            close_old_connections()
+            job = jobs.claim()
+            if job is None:
+                if once:
+                    return
+                time.sleep(interval)
+                continue
+
+            started = time.perf_counter()
+            try:
+                succeeded = jobs.run(job)
+            except KeyboardInterrupt:
+                jobs.fail(job, "The worker was interrupted.")
+                raise
+            elapsed = time.perf_counter() - started
+            if succeeded:
+                self.done += 1
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ {job.kind} for user {job.user_id} in {elapsed:.2f}s."
+                    )
+                )
+            else:
+                self.failed += 1
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"❌ {job.kind} for user {job.user_id} failed "
+                        f"(attempt {job.attempts})."
+                    )
+                )
@@ -0,0 +1,56 @@
+from datetime import datetime, time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from stocks import lots
+
+
+def _day(value, end=False):
+    day = parse_date(value) if value else None
+    if value and day is None:
+        raise CommandError(f"❌ Invalid date: {value}")
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.max if end else time.min))
+
+
+class Command(BaseCommand):
+    help = "Report realized and unrealized gains split into short and long term"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username to report")
+        parser.add_argument("--from", dest="start", help="First sale date (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", help="Last sale date (YYYY-MM-DD)")
+        parser.add_argument("--symbol", help="Only report this stock symbol")
+
+    def handle(self, *args, **kwargs):
+        user = User.objects.filter(username=kwargs["user"]).first()
+        if user is None:
+            raise CommandError(f"❌ User {kwargs['user']} does not exist.")
+        symbol = kwargs["symbol"].upper() if kwargs["symbol"] else None
+
+        realized = lots.realized_gains(
+            user, _day(kwargs["start"]), _day(kwargs["end"], end=True), symbol
+        )
+        unrealized = lots.unrealized_gains(user, symbol)
+
+        self.stdout.write(
+            f"{'symbol':<12}{'realized short':>18}{'realized long':>18}"
+            f"{'unrealized short':>18}{'unrealized long':>18}"
+        )
+        totals = [0, 0, 0, 0]
+        for name in sorted(realized.keys() | unrealized.keys()):
+            values = realized.get(name, (0, 0)) + unrealized.get(name, (0, 0))
+            totals = [total + value for total, value in zip(totals, values)]
+            self.stdout.write(
+                f"{name:<12}" + "".join(f"{value:>18,.2f}" for value in values)
+            )
+        self.stdout.write(
+            f"{'total':<12}" + "".join(f"{value:>18,.2f}" for value in totals)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Tax report for {user.username} generated.")
+        )
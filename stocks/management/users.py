@@ -0,0 +1,11 @@
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+
+
+def get_user(value):
+    # The --user of the commands: a user id or a username.
+    lookup = {"id": value} if value.isdigit() else {"username": value}
+    try:
+        return User.objects.get(**lookup)
+    except User.DoesNotExist:
+        raise CommandError(f"❌ User {value!r} does not exist.")
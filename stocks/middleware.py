@@ -1,80 +1,161 @@
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import ExitStack
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from stocks import performance
+
+NavLink = namedtuple(
+    "NavLink", ["name", "url_name", "icon", "url", "is_active", "font_semibold"]
+)
+
+ANONYMOUS_LINKS = (
+    ("Login", "login", "fa-sign-in-alt"),
+    ("Sign Up", "signup", "fa-user-plus"),
+)
+USER_LINKS = (
+    ("Dashboard", "home", "fa-home"),
+    ("Portfolio", "portfolio", "fa-chart-line"),
+    ("Transactions", "transactions-list", "fa-exchange-alt"),
+    ("Calculator", "avg_price_calculator", "fa-calculator"),
+    ("Jobs", "job_status", "fa-tasks"),
+)
+STAFF_LINKS = (("Admin", "admin:index", "fa-cog"),)
+LOGOUT_LINKS = (("Logout", "logout", "fa-sign-out-alt"),)
+
+# Views that highlight another view's link.
+ACTIVE_ALIASES = {"home_async": "home", "portfolio_async": "portfolio"}
+
+VARIANTS = {
+    "anonymous": ANONYMOUS_LINKS,
+    "user": USER_LINKS + LOGOUT_LINKS,
+    "staff": USER_LINKS + STAFF_LINKS + LOGOUT_LINKS,
+}
+
+
+@lru_cache(maxsize=None)
+def nav_links(variant):
+    # Every (variant, active page) combination is built once as a tuple, so a
+    # request only has to look up its own.
+    links = tuple(
+        NavLink(name, url_name, icon, reverse(url_name), False, url_name == "home")
+        for name, url_name, icon in VARIANTS[variant]
+    )
+    return {
+        active: tuple(
+            link._replace(is_active=link.url_name == active) for link in links
+        )
+        for active in [None] + [link.url_name for link in links]
+    }
 
 
 class SidebarMiddleware:
+    # Sync and async capable, so an async view under ASGI is not pushed onto
+    # a thread just for this middleware.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        nav_links = []
-
-        if request.user.is_authenticated:
-            nav_links = [
-                {
-                    "name": "Dashboard",
-                    "url_name": "home",
-                    "icon": "fa-home",
-                    "font_semibold": True,
-                },
-                {"name": "Portfolio", "url_name": "portfolio", "icon": "fa-chart-line"},
-                {
-                    "name": "Transactions",
-                    "url_name": "transactions-list",
-                    "icon": "fa-exchange-alt",
-                },
-                {
-                    "name": "Calculator",
-                    "url_name": "avg_price_calculator",
-                    "icon": "fa-calculator",
-                },
-            ]
-
-            if request.user.is_staff:
-                nav_links.append(
-                    {
-                        "name": "Admin",
-                        "url_name": "admin:index",
-                        "icon": "fa-cog",
-                    }
-                )
-
-            nav_links.append(
-                {
-                    "name": "Logout",
-                    "url_name": "logout",
-                    "icon": "fa-sign-out-alt",
-                }
-            )
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.attach(request)
+        return await self.get_response(request)
+
+    def attach(self, request):
+        # Lazy, so requests that never render the sidebar (static files,
+        # redirects, JSON) do not load the user. Evaluated at render time,
+        # when resolver_match is set.
+        request.sidebar_nav_links = SimpleLazyObject(lambda: self.get_links(request))
+        request.sidebar_user = SimpleLazyObject(lambda: self.get_user(request))
+
+    def get_links(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            variant = "anonymous"
+        elif user.is_staff:
+            variant = "staff"
         else:
-            nav_links = [
-                {
-                    "name": "Login",
-                    "url_name": "login",
-                    "icon": "fa-sign-in-alt",
-                },
-                {
-                    "name": "Sign Up",
-                    "url_name": "signup",
-                    "icon": "fa-user-plus",
-                },
-            ]
-
-        current_url_name = (
-            request.resolver_match.url_name if request.resolver_match else None
-        )
-        for link in nav_links:
-            link["url"] = reverse(link["url_name"])
-            link["is_active"] = link["url_name"] == current_url_name
-
-        request.sidebar_nav_links = nav_links
-        request.sidebar_user = (
-            {
-                "name": request.user.get_full_name() or request.user.username,
-                "is_staff": request.user.is_staff,
-            }
-            if request.user.is_authenticated
-            else None
+            variant = "user"
+
+        links = nav_links(variant)
+        match = request.resolver_match
+        current = match.view_name if match else None
+        current = ACTIVE_ALIASES.get(current, current)
+        return links.get(current, links[None])
+
+    def get_user(self, request):
+        if not request.user.is_authenticated:
+            return None
+        return {
+            "name": request.user.get_full_name() or request.user.username,
+            "is_staff": request.user.is_staff,
+        }
+
+
+class PerformanceMiddleware:
+    # Records SQL, view, template and (optionally) allocation figures for each
+    # request, sends them as a Server-Timing header and aggregates them per
+    # view for the staff stats page.
+    def __init__(self, get_response):
+        if not getattr(settings, "STOCKS_PERFORMANCE_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request = getattr(settings, "STOCKS_SLOW_REQUEST_MS", 500) / 1000
+        self.top_queries = getattr(settings, "STOCKS_SLOW_REQUEST_TOP_QUERIES", 5)
+        self.trace_allocations = getattr(
+            settings, "STOCKS_PERFORMANCE_TRACE_ALLOCATIONS", False
         )
+        performance.install_template_timer()
 
-        response = self.get_response(request)
+    def __call__(self, request):
+        metrics, token = performance.start()
+        request.performance_metrics = metrics
+        if self.trace_allocations:
+            # Process-wide, so concurrent requests share the peak.
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute))
+                response = self.get_response(request)
+        finally:
+            performance.finish(token)
+
+        if metrics.view_started is not None:
+            metrics.view_time = time.perf_counter() - metrics.view_started
+        if self.trace_allocations:
+            metrics.allocated = tracemalloc.get_traced_memory()[1] - baseline
+        total = time.perf_counter() - metrics.started
+
+        match = request.resolver_match
+        view_name = match.view_name if match else "(unresolved)"
+        performance.record(view_name, metrics, total)
+        if total >= self.slow_request:
+            performance.log_slow(request, metrics, total, self.top_queries)
+
+        response["Server-Timing"] = metrics.server_timing(total)
         return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.performance_metrics.view_started = time.perf_counter()
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:18
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_holdings(apps, schema_editor):
+    StockTransaction = apps.get_model("stocks", "StockTransaction")
+    Holding = apps.get_model("stocks", "Holding")
+
+    positions = {}
+    for trans in StockTransaction.objects.order_by("transaction_date", "id"):
+        key = (trans.user_id, trans.stock_symbol)
+        holding = positions.setdefault(
+            key,
+            Holding(user_id=key[0], stock_symbol=key[1], total_cost=Decimal("0.00")),
+        )
+        sign = 1 if trans.transaction_type == "BUY" else -1
+        holding.quantity += sign * trans.quantity
+        holding.total_cost += sign * trans.quantity * trans.price_per_share
+        holding.latest_price = trans.price_per_share
+        holding.latest_date = trans.transaction_date
+        holding.latest_transaction_id = trans.id
+
+    Holding.objects.bulk_create(positions.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("stocks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Holding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stock_symbol", models.CharField(max_length=10)),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "total_cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                (
+                    "latest_price",
+                    models.DecimalField(decimal_places=2, max_digits=10, null=True),
+                ),
+                ("latest_date", models.DateTimeField(null=True)),
+                (
+                    "latest_transaction",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="stocks.stocktransaction",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="holding",
+            constraint=models.UniqueConstraint(
+                fields=("user", "stock_symbol"), name="unique_user_holding"
+            ),
+        ),
+        migrations.RunPython(populate_holdings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("stocks", "0002_holding"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="stocktransaction",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["user", "transaction_date"], name="stocks_txn_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["user", "stock_symbol", "transaction_date"],
+                name="stocks_txn_user_sym_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["user", "stock_symbol", "transaction_type"],
+                name="stocks_txn_user_sym_type_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+FTS_TABLE = "stocks_transaction_fts"
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        owner, stock_symbol, transaction_type,
+        tokenize="unicode61 tokenchars '&-.'", prefix='1 2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON stocks_stocktransaction
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, owner, stock_symbol, transaction_type)
+        VALUES (new.id, 'u' || new.user_id, new.stock_symbol, new.transaction_type);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update
+    AFTER UPDATE OF user_id, stock_symbol, transaction_type
+    ON stocks_stocktransaction
+    BEGIN
+        UPDATE {FTS_TABLE}
+        SET owner = 'u' || new.user_id,
+            stock_symbol = new.stock_symbol,
+            transaction_type = new.transaction_type
+        WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON stocks_stocktransaction
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, owner, stock_symbol, transaction_type)
+    SELECT id, 'u' || user_id, stock_symbol, transaction_type
+    FROM stocks_stocktransaction
+    """,
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends fall back to plain lookups in stocks.search.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0003_stocktransaction_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
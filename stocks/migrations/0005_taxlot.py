@@ -0,0 +1,185 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:51
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_lots(apps, schema_editor):
+    StockTransaction = apps.get_model("stocks", "StockTransaction")
+    TaxLot = apps.get_model("stocks", "TaxLot")
+    LotSale = apps.get_model("stocks", "LotSale")
+
+    lots = []
+    sales = []
+    open_lots = {}
+    rows = StockTransaction.objects.order_by("transaction_date", "id")
+    for trans in rows.iterator(chunk_size=2000):
+        queue = open_lots.setdefault((trans.user_id, trans.stock_symbol), [])
+        if trans.transaction_type == "BUY":
+            lot = TaxLot(
+                user_id=trans.user_id,
+                stock_symbol=trans.stock_symbol,
+                buy_transaction_id=trans.id,
+                quantity=trans.quantity,
+                remaining=trans.quantity,
+                price_per_share=trans.price_per_share,
+                acquired_at=trans.transaction_date,
+            )
+            lots.append(lot)
+            queue.append(lot)
+            continue
+
+        quantity = trans.quantity
+        while quantity and queue:
+            lot = queue[0]
+            matched = min(quantity, lot.remaining)
+            lot.remaining -= matched
+            quantity -= matched
+            sales.append(
+                LotSale(
+                    user_id=trans.user_id,
+                    stock_symbol=trans.stock_symbol,
+                    sell_transaction_id=trans.id,
+                    lot=lot,
+                    quantity=matched,
+                    buy_price=lot.price_per_share,
+                    sell_price=trans.price_per_share,
+                    acquired_at=lot.acquired_at,
+                    sold_at=trans.transaction_date,
+                    gain=matched * (trans.price_per_share - lot.price_per_share),
+                    long_term=trans.transaction_date - lot.acquired_at
+                    > timedelta(days=365),
+                )
+            )
+            if not lot.remaining:
+                queue.pop(0)
+
+    TaxLot.objects.bulk_create(lots, batch_size=500)
+    LotSale.objects.bulk_create(sales, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("stocks", "0004_transaction_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaxLot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stock_symbol", models.CharField(max_length=10)),
+                ("quantity", models.PositiveIntegerField()),
+                ("remaining", models.PositiveIntegerField()),
+                (
+                    "price_per_share",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("acquired_at", models.DateTimeField()),
+                (
+                    "buy_transaction",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lot",
+                        to="stocks.stocktransaction",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LotSale",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stock_symbol", models.CharField(max_length=10)),
+                ("quantity", models.PositiveIntegerField()),
+                ("buy_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("sell_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("acquired_at", models.DateTimeField()),
+                ("sold_at", models.DateTimeField()),
+                ("gain", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("long_term", models.BooleanField()),
+                (
+                    "lot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sales",
+                        to="stocks.taxlot",
+                    ),
+                ),
+                (
+                    "sell_transaction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lot_sales",
+                        to="stocks.stocktransaction",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="taxlot",
+            index=models.Index(
+                fields=["user", "stock_symbol", "acquired_at"],
+                name="stocks_lot_user_sym_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taxlot",
+            index=models.Index(
+                condition=models.Q(("remaining__gt", 0)),
+                fields=["user", "stock_symbol", "acquired_at"],
+                name="stocks_lot_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lotsale",
+            index=models.Index(
+                fields=["user", "sold_at"], name="stocks_sale_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lotsale",
+            index=models.Index(
+                fields=["user", "stock_symbol", "sold_at"],
+                name="stocks_sale_user_sym_date_idx",
+            ),
+        ),
+        migrations.RunPython(populate_lots, migrations.RunPython.noop),
+    ]
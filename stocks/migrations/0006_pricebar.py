@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0005_taxlot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceBar",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField(max_length=10)),
+                ("date", models.DateField()),
+                ("open", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("high", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("low", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("close", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("volume", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="pricebar",
+            constraint=models.UniqueConstraint(
+                fields=("symbol", "date"), name="unique_symbol_price_bar"
+            ),
+        ),
+    ]
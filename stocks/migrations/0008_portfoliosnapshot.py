@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("stocks", "0007_ingestkey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaleSnapshot",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("since", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PortfolioSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("invested", models.DecimalField(decimal_places=2, max_digits=15)),
+                ("market_value", models.DecimalField(decimal_places=2, max_digits=15)),
+                ("breakdown", models.JSONField(default=dict)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="portfoliosnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("user", "date"), name="unique_user_snapshot_date"
+            ),
+        ),
+    ]
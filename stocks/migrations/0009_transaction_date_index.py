@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0008_portfoliosnapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(fields=["transaction_date"], name="stocks_txn_date_idx"),
+        ),
+    ]
@@ -0,0 +1,450 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:33
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Trim, Upper
+import django.db.models.deletion
+
+FTS_TABLE = "stocks_transaction_fts"
+LEDGER_MODELS = ("StockTransaction", "Holding", "TaxLot", "LotSale")
+
+# The 0004 triggers read stock_symbol, which this migration removes; the
+# replacements look the symbol up in stocks_security.
+SYMBOL_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON stocks_stocktransaction
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, owner, stock_symbol, transaction_type)
+        VALUES (new.id, 'u' || new.user_id, new.stock_symbol, new.transaction_type);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update
+    AFTER UPDATE OF user_id, stock_symbol, transaction_type
+    ON stocks_stocktransaction
+    BEGIN
+        UPDATE {FTS_TABLE}
+        SET owner = 'u' || new.user_id,
+            stock_symbol = new.stock_symbol,
+            transaction_type = new.transaction_type
+        WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON stocks_stocktransaction
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+
+SECURITY_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON stocks_stocktransaction
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, owner, stock_symbol, transaction_type)
+        VALUES (
+            new.id,
+            'u' || new.user_id,
+            (SELECT symbol FROM stocks_security WHERE id = new.security_id),
+            new.transaction_type
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update
+    AFTER UPDATE OF user_id, security_id, transaction_type
+    ON stocks_stocktransaction
+    BEGIN
+        UPDATE {FTS_TABLE}
+        SET owner = 'u' || new.user_id,
+            stock_symbol = (
+                SELECT symbol FROM stocks_security WHERE id = new.security_id
+            ),
+            transaction_type = new.transaction_type
+        WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON stocks_stocktransaction
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_rename AFTER UPDATE OF symbol ON stocks_security
+    BEGIN
+        UPDATE {FTS_TABLE} SET stock_symbol = new.symbol
+        WHERE rowid IN (
+            SELECT id FROM stocks_stocktransaction WHERE security_id = new.id
+        );
+    END
+    """,
+]
+
+DROP_TRIGGERS_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_rename",
+]
+
+# Rows whose symbol changed case or lost surrounding spaces.
+RENORMALIZE_FTS_SQL = f"""
+    UPDATE {FTS_TABLE}
+    SET stock_symbol = (
+        SELECT s.symbol
+        FROM stocks_stocktransaction t JOIN stocks_security s ON s.id = t.security_id
+        WHERE t.id = {FTS_TABLE}.rowid
+    )
+    WHERE rowid IN (
+        SELECT t.id
+        FROM stocks_stocktransaction t JOIN stocks_security s ON s.id = t.security_id
+        WHERE t.stock_symbol != s.symbol
+    )
+"""
+
+
+def _has_search_index(schema_editor):
+    connection = schema_editor.connection
+    return (
+        connection.vendor == "sqlite"
+        and FTS_TABLE in connection.introspection.table_names()
+    )
+
+
+def _run(schema_editor, statements):
+    if _has_search_index(schema_editor):
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def drop_triggers(apps, schema_editor):
+    # Remaking stocks_stocktransaction below would drop them anyway.
+    _run(schema_editor, DROP_TRIGGERS_SQL)
+
+
+def create_symbol_triggers(apps, schema_editor):
+    _run(schema_editor, SYMBOL_TRIGGERS_SQL)
+
+
+def create_security_triggers(apps, schema_editor):
+    _run(schema_editor, SECURITY_TRIGGERS_SQL)
+
+
+def _rebuild_stream(apps, user_id, security_id):
+    # Holding and FIFO lots of a stream whose rows were spread over several
+    # spellings of its symbol, replayed as in 0005_taxlot.
+    StockTransaction = apps.get_model("stocks", "StockTransaction")
+    Holding = apps.get_model("stocks", "Holding")
+    TaxLot = apps.get_model("stocks", "TaxLot")
+    LotSale = apps.get_model("stocks", "LotSale")
+
+    LotSale.objects.filter(user_id=user_id, security_id=security_id).delete()
+    TaxLot.objects.filter(user_id=user_id, security_id=security_id).delete()
+    Holding.objects.filter(user_id=user_id, security_id=security_id).delete()
+
+    holding = Holding(user_id=user_id, security_id=security_id)
+    lots = []
+    sales = []
+    queue = []
+    rows = StockTransaction.objects.filter(
+        user_id=user_id, security_id=security_id
+    ).order_by("transaction_date", "id")
+    for trans in rows:
+        sign = 1 if trans.transaction_type == "BUY" else -1
+        holding.quantity += sign * trans.quantity
+        holding.total_cost += sign * trans.quantity * Decimal(trans.price_per_share)
+        holding.latest_price = trans.price_per_share
+        holding.latest_date = trans.transaction_date
+        holding.latest_transaction_id = trans.id
+        if trans.transaction_type == "BUY":
+            lot = TaxLot(
+                user_id=user_id,
+                security_id=security_id,
+                buy_transaction_id=trans.id,
+                quantity=trans.quantity,
+                remaining=trans.quantity,
+                price_per_share=trans.price_per_share,
+                acquired_at=trans.transaction_date,
+            )
+            lots.append(lot)
+            queue.append(lot)
+            continue
+
+        quantity = trans.quantity
+        while quantity and queue:
+            lot = queue[0]
+            matched = min(quantity, lot.remaining)
+            lot.remaining -= matched
+            quantity -= matched
+            sales.append(
+                LotSale(
+                    user_id=user_id,
+                    security_id=security_id,
+                    sell_transaction_id=trans.id,
+                    lot=lot,
+                    quantity=matched,
+                    buy_price=lot.price_per_share,
+                    sell_price=trans.price_per_share,
+                    acquired_at=lot.acquired_at,
+                    sold_at=trans.transaction_date,
+                    gain=matched * (trans.price_per_share - lot.price_per_share),
+                    long_term=trans.transaction_date - lot.acquired_at
+                    > timedelta(days=365),
+                )
+            )
+            if not lot.remaining:
+                queue.pop(0)
+
+    holding.save()
+    TaxLot.objects.bulk_create(lots, batch_size=500)
+    LotSale.objects.bulk_create(sales, batch_size=500)
+
+
+def populate_securities(apps, schema_editor):
+    Security = apps.get_model("stocks", "Security")
+    StockTransaction = apps.get_model("stocks", "StockTransaction")
+    PortfolioSnapshot = apps.get_model("stocks", "PortfolioSnapshot")
+
+    # One security per symbol, however it was spelled.
+    symbols = set()
+    for name in LEDGER_MODELS:
+        symbols.update(
+            apps.get_model("stocks", name)
+            .objects.annotate(normalized=Upper(Trim("stock_symbol")))
+            .values_list("normalized", flat=True)
+            .distinct()
+        )
+    Security.objects.bulk_create(
+        [Security(symbol=symbol) for symbol in sorted(symbols)], batch_size=500
+    )
+    security_id = Subquery(
+        Security.objects.filter(symbol=Upper(Trim(OuterRef("stock_symbol")))).values(
+            "id"
+        )[:1]
+    )
+    for name in LEDGER_MODELS:
+        apps.get_model("stocks", name).objects.update(security_id=security_id)
+
+    if _has_search_index(schema_editor):
+        schema_editor.execute(RENORMALIZE_FTS_SQL)
+
+    # Streams that were split over several spellings now share a security:
+    # their holdings are merged and their lots matched again in date order.
+    merged = (
+        StockTransaction.objects.values("user_id", "security_id")
+        .annotate(spellings=Count("stock_symbol", distinct=True))
+        .filter(spellings__gt=1)
+        .values_list("user_id", "security_id")
+    )
+    users = set()
+    for user_id, security_id in merged:
+        _rebuild_stream(apps, user_id, security_id)
+        users.add(user_id)
+    # Their breakdowns are keyed by the old spellings; build_snapshots
+    # starts these users over.
+    PortfolioSnapshot.objects.filter(user_id__in=users).delete()
+
+
+def restore_symbols(apps, schema_editor):
+    # The original spelling is gone; every row gets the normalized symbol.
+    Security = apps.get_model("stocks", "Security")
+    symbol = Subquery(
+        Security.objects.filter(id=OuterRef("security_id")).values("symbol")[:1]
+    )
+    for name in LEDGER_MODELS:
+        apps.get_model("stocks", name).objects.update(stock_symbol=symbol)
+
+
+def _security(null):
+    return models.ForeignKey(
+        db_index=False,
+        null=null,
+        on_delete=django.db.models.deletion.PROTECT,
+        to="stocks.security",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0009_transaction_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Security",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField(max_length=10, unique=True)),
+                ("name", models.CharField(blank=True, max_length=100)),
+                ("exchange", models.CharField(blank=True, max_length=10)),
+                (
+                    "isin",
+                    models.CharField(blank=True, max_length=12, verbose_name="ISIN"),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "securities",
+            },
+        ),
+        migrations.RunPython(drop_triggers, create_symbol_triggers),
+        migrations.RemoveConstraint(
+            model_name="holding",
+            name="unique_user_holding",
+        ),
+        migrations.RemoveIndex(
+            model_name="lotsale",
+            name="stocks_sale_user_sym_date_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="stocktransaction",
+            name="stocks_txn_user_sym_date_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="stocktransaction",
+            name="stocks_txn_user_sym_type_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="taxlot",
+            name="stocks_lot_user_sym_date_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="taxlot",
+            name="stocks_lot_open_idx",
+        ),
+        migrations.AddField(
+            model_name="stocktransaction",
+            name="security",
+            field=_security(null=True),
+        ),
+        migrations.AddField(
+            model_name="holding",
+            name="security",
+            field=_security(null=True),
+        ),
+        migrations.AddField(
+            model_name="taxlot",
+            name="security",
+            field=_security(null=True),
+        ),
+        migrations.AddField(
+            model_name="lotsale",
+            name="security",
+            field=_security(null=True),
+        ),
+        # Nullable before they are removed, so that unapplying can add the
+        # columns back empty for restore_symbols to fill.
+        migrations.AlterField(
+            model_name="stocktransaction",
+            name="stock_symbol",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name="holding",
+            name="stock_symbol",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name="taxlot",
+            name="stock_symbol",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name="lotsale",
+            name="stock_symbol",
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.RunPython(populate_securities, restore_symbols),
+        migrations.RemoveField(
+            model_name="stocktransaction",
+            name="stock_symbol",
+        ),
+        migrations.RemoveField(
+            model_name="holding",
+            name="stock_symbol",
+        ),
+        migrations.RemoveField(
+            model_name="taxlot",
+            name="stock_symbol",
+        ),
+        migrations.RemoveField(
+            model_name="lotsale",
+            name="stock_symbol",
+        ),
+        migrations.AlterField(
+            model_name="stocktransaction",
+            name="security",
+            field=_security(null=False),
+        ),
+        migrations.AlterField(
+            model_name="holding",
+            name="security",
+            field=_security(null=False),
+        ),
+        migrations.AlterField(
+            model_name="taxlot",
+            name="security",
+            field=_security(null=False),
+        ),
+        migrations.AlterField(
+            model_name="lotsale",
+            name="security",
+            field=_security(null=False),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["user", "security", "transaction_date"],
+                name="stocks_txn_user_sym_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransaction",
+            index=models.Index(
+                fields=["user", "security", "transaction_type"],
+                name="stocks_txn_user_sym_type_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="holding",
+            constraint=models.UniqueConstraint(
+                fields=("user", "security"), name="unique_user_holding"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taxlot",
+            index=models.Index(
+                fields=["user", "security", "acquired_at"],
+                name="stocks_lot_user_sym_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taxlot",
+            index=models.Index(
+                condition=models.Q(("remaining__gt", 0)),
+                fields=["user", "security", "acquired_at"],
+                name="stocks_lot_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lotsale",
+            index=models.Index(
+                fields=["user", "security", "sold_at"],
+                name="stocks_sale_user_sym_date_idx",
+            ),
+        ),
+        migrations.RunPython(create_security_triggers, drop_triggers),
+    ]
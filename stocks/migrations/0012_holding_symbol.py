@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_symbols(apps, schema_editor):
+    Holding = apps.get_model("stocks", "Holding")
+    Security = apps.get_model("stocks", "Security")
+    Holding.objects.update(
+        symbol=Subquery(
+            Security.objects.filter(pk=OuterRef("security_id")).values("symbol")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stocks", "0011_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="holding",
+            name="symbol",
+            field=models.CharField(default="", max_length=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_symbols, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="holding",
+            index=models.Index(
+                fields=["user", "symbol"], name="stocks_holding_user_sym_idx"
+            ),
+        ),
+    ]
@@ -2,17 +2,250 @@ from django.contrib.auth.models import User
 from django.db import models
 
 
+class Security(models.Model):
+    # One row per traded symbol. Ledger tables reference it by integer id, so
+    # their rows and (user, security) indexes stay narrow and grouping compares
+    # integers instead of strings.
+    symbol = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=100, blank=True)
+    exchange = models.CharField(max_length=10, blank=True)
+    isin = models.CharField("ISIN", max_length=12, blank=True)
+
+    class Meta:
+        verbose_name_plural = "securities"
+
+    def __str__(self):
+        return self.symbol
+
+
 class StockTransaction(models.Model):
     TRANSACTION_TYPES = (
         ("BUY", "Buy"),
         ("SELL", "Sell"),
     )
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    stock_symbol = models.CharField(max_length=10)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    security = models.ForeignKey(Security, on_delete=models.PROTECT, db_index=False)
     transaction_type = models.CharField(max_length=4, choices=TRANSACTION_TYPES)
     quantity = models.PositiveIntegerField()
     price_per_share = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # The user indexes serve every page; the plain user_id and security_id
+        # indexes would only duplicate their prefix or go unused. The date
+        # index serves the admin, which lists and drills down across users.
+        indexes = [
+            models.Index(
+                fields=["user", "transaction_date"], name="stocks_txn_user_date_idx"
+            ),
+            models.Index(
+                fields=["user", "security", "transaction_date"],
+                name="stocks_txn_user_sym_date_idx",
+            ),
+            models.Index(
+                fields=["user", "security", "transaction_type"],
+                name="stocks_txn_user_sym_type_idx",
+            ),
+            models.Index(fields=["transaction_date"], name="stocks_txn_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.security} - {self.transaction_type} - {self.quantity} shares"
+
+
+class Holding(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    security = models.ForeignKey(Security, on_delete=models.PROTECT, db_index=False)
+    # Copied from the security so the holdings pages can seek through the
+    # (user, symbol) index in symbol order; renames are propagated.
+    symbol = models.CharField(max_length=10)
+    quantity = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    latest_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    latest_date = models.DateTimeField(null=True)
+    latest_transaction = models.ForeignKey(
+        StockTransaction, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "security"], name="unique_user_holding"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["user", "symbol"], name="stocks_holding_user_sym_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.symbol} - {self.quantity} shares"
+
+
+class TaxLot(models.Model):
+    # Shares opened by one BUY; SELLs consume lots first-in, first-out.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    security = models.ForeignKey(Security, on_delete=models.PROTECT, db_index=False)
+    buy_transaction = models.OneToOneField(
+        StockTransaction, on_delete=models.CASCADE, related_name="lot"
+    )
+    quantity = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+    price_per_share = models.DecimalField(max_digits=10, decimal_places=2)
+    acquired_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "security", "acquired_at"],
+                name="stocks_lot_user_sym_date_idx",
+            ),
+            models.Index(
+                fields=["user", "security", "acquired_at"],
+                condition=models.Q(remaining__gt=0),
+                name="stocks_lot_open_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.security} - {self.remaining}/{self.quantity} shares"
+
+
+class LotSale(models.Model):
+    # The part of one SELL matched against one lot.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    security = models.ForeignKey(Security, on_delete=models.PROTECT, db_index=False)
+    sell_transaction = models.ForeignKey(
+        StockTransaction, on_delete=models.CASCADE, related_name="lot_sales"
+    )
+    lot = models.ForeignKey(TaxLot, on_delete=models.CASCADE, related_name="sales")
+    quantity = models.PositiveIntegerField()
+    buy_price = models.DecimalField(max_digits=10, decimal_places=2)
+    sell_price = models.DecimalField(max_digits=10, decimal_places=2)
+    acquired_at = models.DateTimeField()
+    sold_at = models.DateTimeField()
+    gain = models.DecimalField(max_digits=20, decimal_places=2)
+    long_term = models.BooleanField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "sold_at"], name="stocks_sale_user_date_idx"),
+            models.Index(
+                fields=["user", "security", "sold_at"],
+                name="stocks_sale_user_sym_date_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.security} - {self.quantity} shares sold"
+
+
+class PriceBar(models.Model):
+    # End-of-day market data for one symbol.
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        # Also serves the latest-bar-per-symbol lookups.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["symbol", "date"], name="unique_symbol_price_bar"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} - {self.date} - {self.close}"
+
+
+class IngestKey(models.Model):
+    # Client-chosen idempotency key of an ingested transaction, so a retried
+    # batch does not insert it twice.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=64)
+    transaction = models.ForeignKey(
+        StockTransaction, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_user_ingest_key"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+class PortfolioSnapshot(models.Model):
+    # A user's portfolio at the end of one day, built by build_snapshots.
+    # breakdown maps every symbol ever traded to [quantity, net cost, price],
+    # with the amounts as strings; the next day's build resumes from it.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    invested = models.DecimalField(max_digits=15, decimal_places=2)
+    market_value = models.DecimalField(max_digits=15, decimal_places=2)
+    breakdown = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date"], name="unique_user_snapshot_date"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date} - {self.market_value}"
+
+
+class StaleSnapshot(models.Model):
+    # The earliest day whose snapshot a ledger write has invalidated; the next
+    # build_snapshots run rebuilds the user's snapshots from there.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    since = models.DateField()
+
+    def __str__(self):
+        return f"{self.user_id} - {self.since}"
+
+
+class Job(models.Model):
+    # Background work run by run_jobs. At most one job per (kind, user, key)
+    # waits in the queue: enqueueing another while it waits coalesces into it,
+    # so a burst of writes costs one run.
+    STATUSES = (
+        ("QUEUED", "Queued"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    )
+    kind = models.CharField(max_length=20)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=7, choices=STATUSES, default="QUEUED")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "user", "key"],
+                condition=models.Q(status="QUEUED"),
+                name="unique_queued_job",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="stocks_job_queue_idx"),
+            models.Index(fields=["user", "created_at"], name="stocks_job_user_idx"),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.stock_symbol} - {self.transaction_type} - {self.quantity} shares"
+        return f"{self.kind} - {self.user_id} - {self.status}"
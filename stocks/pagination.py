@@ -0,0 +1,144 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+
+from stocks import db
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    # Seek pagination over a unique ordering such as ("-transaction_date",
+    # "-id"): each page filters on the last row of the previous one, so deep
+    # pages cost the same as the first and no COUNT(*) is needed.
+    def __init__(self, queryset, ordering, per_page=10, transform=None):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.transform = transform
+        self.fields = [name.lstrip("-") for name in ordering]
+
+    def _field(self, name):
+        # Orderings may follow foreign keys, e.g. "security__symbol".
+        model = self.queryset.model
+        *relations, name = name.split(LOOKUP_SEP)
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name), relations
+
+    def _value(self, item, name):
+        field, relations = self._field(name)
+        for relation in relations:
+            item = getattr(item, relation)
+        return field.value_to_string(item)
+
+    def encode_cursor(self, item, direction):
+        values = [self._value(item, field) for field in self.fields]
+        data = json.dumps({"d": direction, "k": values}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded))
+            direction, values = data["d"], data["k"]
+            if direction not in ("n", "p") or len(values) != len(self.fields):
+                return None
+            return direction, [
+                self._field(field)[0].to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, KeyError, ValidationError):
+            return None
+
+    def _seek(self, values, reverse):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            clause = Q(**{f"{self.fields[index]}__{lookup}": values[index]})
+            for field, value in zip(self.fields[:index], values):
+                clause &= Q(**{field: value})
+            condition |= clause
+        return condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        queryset = self.queryset.order_by(*self.ordering)
+
+        if decoded is None:
+            items = list(queryset[: self.per_page + 1])
+            has_more, has_before = len(items) > self.per_page, False
+            items = items[: self.per_page]
+        elif decoded[0] == "n":
+            items = list(
+                queryset.filter(self._seek(decoded[1], False))[: self.per_page + 1]
+            )
+            has_more, has_before = len(items) > self.per_page, True
+            items = items[: self.per_page]
+        else:
+            reversed_ordering = [
+                name[1:] if name.startswith("-") else f"-{name}"
+                for name in self.ordering
+            ]
+            items = list(
+                self.queryset.order_by(*reversed_ordering).filter(
+                    self._seek(decoded[1], True)
+                )[: self.per_page + 1]
+            )
+            has_more, has_before = True, len(items) > self.per_page
+            items = items[: self.per_page][::-1]
+
+        next_cursor = self.encode_cursor(items[-1], "n") if items and has_more else None
+        previous_cursor = (
+            self.encode_cursor(items[0], "p") if items and has_before else None
+        )
+        # The transform gets the whole page so it can batch its lookups.
+        if self.transform:
+            items = self.transform(items)
+        return KeysetPage(items, next_cursor, previous_cursor)
+
+
+class EstimatedCountPaginator(Paginator):
+    # Admin changelists count exactly up to exact_limit rows, with a COUNT
+    # that stops there. Past it, the unfiltered list uses the table estimate
+    # from the last ANALYZE (an exact count without one) and a filtered list
+    # is cut at the limit.
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        counted = queryset[: self.exact_limit + 1].count()
+        if counted <= self.exact_limit:
+            return counted
+        if queryset.query.has_filters():
+            return self.exact_limit
+        estimate = db.estimated_rows(queryset.model)
+        return max(estimate, counted) if estimate else queryset.count()
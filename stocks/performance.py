@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.template.backends.django import Template
+
+logger = logging.getLogger("stocks.performance")
+
+# Recent request durations kept per view for the percentiles.
+SAMPLE_SIZE = 200
+
+_current = ContextVar("stocks_request_metrics", default=None)
+_views = {}
+_views_lock = threading.Lock()
+_template_render = None
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+        self.allocated = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.sql_time += duration
+            self.queries.append((duration, sql))
+
+    def top_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+    def server_timing(self, total):
+        metrics = [
+            f'db;dur={self.sql_time * 1000:.1f};desc="{len(self.queries)} queries"',
+            f"view;dur={self.view_time * 1000:.1f}",
+            f"tpl;dur={self.template_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ]
+        if self.allocated is not None:
+            metrics.append(f'alloc;desc="{self.allocated // 1024} KiB peak"')
+        return ", ".join(metrics)
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def install_template_timer():
+    # Render time is attributed to the request being measured; the backend
+    # Template wraps the top-level render of render() and render_to_string().
+    global _template_render
+    if _template_render is not None:
+        return
+    _template_render = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return _template_render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return _template_render(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+    Template.render = render
+
+
+def record(view_name, metrics, total):
+    with _views_lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = {
+                "requests": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "queries": 0,
+                "sql_time": 0.0,
+                "template_time": 0.0,
+                "max_allocated": 0,
+                "samples": deque(maxlen=SAMPLE_SIZE),
+            }
+        stats["requests"] += 1
+        stats["total_time"] += total
+        stats["max_time"] = max(stats["max_time"], total)
+        stats["queries"] += len(metrics.queries)
+        stats["sql_time"] += metrics.sql_time
+        stats["template_time"] += metrics.template_time
+        stats["max_allocated"] = max(stats["max_allocated"], metrics.allocated or 0)
+        stats["samples"].append(total)
+
+
+def log_slow(request, metrics, total, top_count):
+    lines = [
+        f"Slow request {request.method} {request.get_full_path()}: "
+        f"{total * 1000:.0f} ms, {len(metrics.queries)} queries "
+        f"({metrics.sql_time * 1000:.0f} ms), "
+        f"template {metrics.template_time * 1000:.0f} ms"
+    ]
+    for duration, sql in metrics.top_queries(top_count):
+        lines.append(f"  {duration * 1000:8.1f} ms  {sql}")
+    logger.warning("\n".join(lines))
+
+
+def view_stats():
+    # Per-process aggregates, slowest views first.
+    with _views_lock:
+        snapshot = {name: dict(stats) for name, stats in _views.items()}
+
+    rows = []
+    for name, stats in snapshot.items():
+        samples = sorted(stats.pop("samples"))
+        requests = stats["requests"]
+        rows.append(
+            {
+                "view": name,
+                "requests": requests,
+                "avg_ms": stats["total_time"] / requests * 1000,
+                "p95_ms": samples[int(len(samples) * 0.95)] * 1000 if samples else 0,
+                "max_ms": stats["max_time"] * 1000,
+                "avg_queries": stats["queries"] / requests,
+                "avg_sql_ms": stats["sql_time"] / requests * 1000,
+                "avg_template_ms": stats["template_time"] / requests * 1000,
+                "max_allocated_kib": stats["max_allocated"] // 1024,
+            }
+        )
+    return sorted(rows, key=lambda row: row["avg_ms"] * row["requests"], reverse=True)
+
+
+def reset():
+    with _views_lock:
+        _views.clear()
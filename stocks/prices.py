@@ -0,0 +1,105 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date
+
+from stocks import caching
+from stocks.importer import SYMBOL_MAX_LENGTH, batched, max_decimal
+from stocks.models import PriceBar
+
+PRICE_FIELDS = ("open", "high", "low", "close")
+MAX_PRICES = {
+    field: max_decimal(PriceBar._meta.get_field(field)) for field in PRICE_FIELDS
+}
+# PositiveBigIntegerField's upper bound.
+MAX_VOLUME = 9223372036854775807
+LOOKUP_BATCH_SIZE = 500
+
+
+def parse_bar(row, symbol=None):
+    # Accepts a Symbol column or, for one-file-per-symbol downloads, the
+    # symbol taken from the file name.
+    row = {
+        (key or "").strip().lower(): (value or "").strip() for key, value in row.items()
+    }
+
+    symbol = (row.get("symbol") or symbol or "").upper()
+    if not symbol or len(symbol) > SYMBOL_MAX_LENGTH:
+        raise ValueError(f"Invalid stock symbol: {symbol!r}")
+
+    date = parse_date(row.get("date", "")[:10])
+    if date is None:
+        raise ValueError(f"Invalid date: {row.get('date')!r}")
+
+    try:
+        prices = {
+            field: Decimal(row[field]).quantize(Decimal("0.01"))
+            for field in PRICE_FIELDS
+        }
+        volume = int(float(row.get("volume") or 0))
+    except (InvalidOperation, KeyError, OverflowError, ValueError):
+        raise ValueError("Invalid price or volume")
+    # NaN survives quantize() but cannot be compared.
+    if not all(price.is_finite() for price in prices.values()):
+        raise ValueError("Invalid price or volume")
+    if min(prices.values()) <= 0 or volume < 0:
+        raise ValueError("Prices must be positive")
+    if volume > MAX_VOLUME or any(
+        price > MAX_PRICES[field] for field, price in prices.items()
+    ):
+        raise ValueError("Price or volume is too large")
+
+    return PriceBar(symbol=symbol, date=date, volume=volume, **prices)
+
+
+def read_bars(f, symbol=None):
+    reader = csv.DictReader(f)
+    for raw_row in reader:
+        try:
+            yield reader.line_num, parse_bar(raw_row, symbol), None
+        except ValueError as exc:
+            yield reader.line_num, None, str(exc)
+
+
+@transaction.atomic
+def load(bars, batch_size=1000):
+    # Upserts on (symbol, date), so reloading a file corrects earlier bars.
+    count = 0
+    for batch in batched(bars, batch_size):
+        PriceBar.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["symbol", "date"],
+            update_fields=[*PRICE_FIELDS, "volume"],
+        )
+        count += len(batch)
+    if count:
+        caching.invalidate_all()
+        caching.invalidate_quotes()
+    return count
+
+
+def latest_prices(symbols):
+    # {symbol: close} of the newest bar of each symbol: one row per wanted
+    # symbol, each a single backwards seek on the (symbol, date) index.
+    # Filtering the bars on symbol instead would visit every bar of each.
+    symbols = sorted(set(symbols))
+    table = connection.ops.quote_name(PriceBar._meta.db_table)
+    closes = {}
+    with connection.cursor() as cursor:
+        for batch in batched(symbols, LOOKUP_BATCH_SIZE):
+            values = ", ".join(["(%s)"] * len(batch))
+            cursor.execute(
+                f"WITH wanted(symbol) AS (VALUES {values}) "
+                f"SELECT symbol, (SELECT close FROM {table} "
+                f"WHERE {table}.symbol = wanted.symbol "
+                "ORDER BY date DESC LIMIT 1) FROM wanted",
+                batch,
+            )
+            closes.update(
+                (symbol, Decimal(str(close)).quantize(Decimal("0.01")))
+                for symbol, close in cursor.fetchall()
+                if close is not None
+            )
+    return closes
@@ -0,0 +1,148 @@
+import csv
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from stocks import caching, prices
+from stocks.importer import SYMBOL_MAX_LENGTH, find_files
+
+
+class QuoteProvider:
+    # A price feed: fetch() returns {symbol: price} for the symbols it knows.
+    def fetch(self, symbols):
+        raise NotImplementedError
+
+
+class DirectoryProvider(QuoteProvider):
+    # Stand-in feed reading Symbol,Price CSV files from a file or directory;
+    # files later in name order override earlier ones.
+    def __init__(self, source=None):
+        self.source = str(source or settings.STOCKS_QUOTE_SOURCE)
+
+    def fetch(self, symbols):
+        wanted = set(symbols)
+        quotes = {}
+        for path in find_files(self.source):
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    row = {
+                        (key or "").strip().lower(): (value or "").strip()
+                        for key, value in row.items()
+                    }
+                    symbol = row.get("symbol", "").upper()
+                    if symbol not in wanted or len(symbol) > SYMBOL_MAX_LENGTH:
+                        continue
+                    try:
+                        price = Decimal(row.get("price", "")).quantize(Decimal("0.01"))
+                    except InvalidOperation:
+                        continue
+                    if price.is_finite() and price > 0:
+                        quotes[symbol] = price
+        return quotes
+
+
+class QuoteCache:
+    # A small per-process LRU in front of the shared Django cache. Entries
+    # carry their expiry time, so a local copy never outlives the shared one,
+    # and the quote version, so a price load retires them everywhere. A None
+    # price records a symbol with neither a quote nor a bar.
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, symbol, version):
+        return f"stocks:quote:{version}:{symbol}"
+
+    def get_many(self, symbols):
+        # {symbol: price or None} for the symbols cached under this version.
+        now = time.time()
+        version = caching.quote_version()
+        found = {}
+        missing = []
+        with self._lock:
+            for symbol in symbols:
+                entry = self._local.get(symbol)
+                if entry and entry[1] > now and entry[2] == version:
+                    self._local.move_to_end(symbol)
+                    found[symbol] = entry[0]
+                else:
+                    missing.append(symbol)
+
+        if missing:
+            shared = caching.get_cache().get_many(
+                [self.key(symbol, version) for symbol in missing]
+            )
+            with self._lock:
+                for symbol in missing:
+                    entry = shared.get(self.key(symbol, version))
+                    if entry and entry[1] > now:
+                        self._remember(symbol, entry)
+                        found[symbol] = entry[0]
+        return found
+
+    def set_many(self, quotes):
+        expires = time.time() + self.timeout
+        version = caching.quote_version()
+        entries = {
+            symbol: (price, expires, version) for symbol, price in quotes.items()
+        }
+        caching.get_cache().set_many(
+            {self.key(symbol, version): entry for symbol, entry in entries.items()},
+            self.timeout,
+        )
+        with self._lock:
+            for symbol, entry in entries.items():
+                self._remember(symbol, entry)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _remember(self, symbol, entry):
+        self._local[symbol] = entry
+        self._local.move_to_end(symbol)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+
+@lru_cache
+def get_quote_cache():
+    return QuoteCache(
+        getattr(settings, "STOCKS_QUOTE_TIMEOUT", 300),
+        getattr(settings, "STOCKS_QUOTE_LOCAL_ENTRIES", 10000),
+    )
+
+
+def get_provider():
+    return import_string(settings.STOCKS_QUOTE_PROVIDER)()
+
+
+def latest(symbols):
+    # {symbol: price} for every symbol with a quote or a price bar: cached
+    # quotes first, then one query for the latest closes of the rest.
+    symbols = set(symbols)
+    cache = get_quote_cache()
+    found = cache.get_many(symbols)
+    missing = symbols - found.keys()
+    if missing:
+        closes = prices.latest_prices(missing)
+        # Symbols without a bar are cached too, so they are not looked up
+        # again on every miss.
+        cache.set_many({symbol: closes.get(symbol) for symbol in missing})
+        found.update(closes)
+    return {symbol: price for symbol, price in found.items() if price is not None}
+
+
+def refresh(symbols, provider=None):
+    # One batched fetch for all symbols; returns the quotes that were cached.
+    quotes = (provider or get_provider()).fetch(sorted(set(symbols)))
+    get_quote_cache().set_many(quotes)
+    caching.invalidate_all()
+    return quotes
@@ -0,0 +1,123 @@
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from stocks.models import StockTransaction
+
+# FTS5 shadow table maintained by triggers on stocks_stocktransaction, see
+# migrations 0004_transaction_search and 0010_security.
+FTS_TABLE = "stocks_transaction_fts"
+
+NUMBER = re.compile(r"^\d+(\.\d+)?$")
+FIELD_TERM = re.compile(r"^(qty|quantity|price):(<=|>=|<|>|=)?(\d+(?:\.\d+)?)$")
+LOOKUPS = {"<": "lt", "<=": "lte", ">": "gt", ">=": "gte", "=": "exact", None: "exact"}
+DATE_FORMATS = (("%Y-%m-%d", "day"), ("%d-%m-%Y", "day"), ("%Y-%m", "month"))
+# SQLite binds integers as signed 64-bit; larger ones would raise.
+MAX_INTEGER = 2**63 - 1
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+def _date_range(term):
+    for fmt, period in DATE_FORMATS:
+        try:
+            start = datetime.strptime(term, fmt)
+        except ValueError:
+            continue
+        if period == "day":
+            end = start + timedelta(days=1)
+        else:
+            end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return timezone.make_aware(start), timezone.make_aware(end)
+    return None
+
+
+def _field_filter(term):
+    field, operator, value = FIELD_TERM.match(term).groups()
+    if field == "price":
+        return Q(**{f"price_per_share__{LOOKUPS[operator]}": Decimal(value)})
+    if "." in value:
+        return None
+    return _quantity_filter(LOOKUPS[operator], int(value))
+
+
+def _quantity_filter(lookup, value):
+    if value > MAX_INTEGER:
+        # Above every stored quantity.
+        return Q() if lookup in ("lt", "lte") else Q(pk__in=[])
+    return Q(**{f"quantity__{lookup}": value})
+
+
+def _number_filter(term):
+    value = Decimal(term)
+    if "." in term:
+        return Q(price_per_share=value)
+    return _quantity_filter("exact", int(value)) | Q(
+        price_per_share__gte=value, price_per_share__lt=value + 1
+    )
+
+
+def parse_query(query):
+    # Numbers, dates and qty:/price: terms become indexed range lookups; all
+    # other words are prefix-matched against the symbol and type.
+    words = []
+    filters = Q()
+    for term in query.split():
+        date_range = _date_range(term)
+        if date_range:
+            filters &= Q(
+                transaction_date__gte=date_range[0], transaction_date__lt=date_range[1]
+            )
+        elif FIELD_TERM.match(term.lower()):
+            field_filter = _field_filter(term.lower())
+            if field_filter is None:
+                return None, None
+            filters &= field_filter
+        elif NUMBER.match(term):
+            filters &= _number_filter(term)
+        else:
+            words.append(term)
+    return words, filters
+
+
+def search(user, query):
+    words, filters = parse_query(query)
+    if words is None:
+        return StockTransaction.objects.none()
+
+    transactions = StockTransaction.objects.filter(filters, user=user)
+    if words and fts_available():
+        match = " AND ".join(
+            [f'owner:"u{user.pk}"']
+            + [
+                '{stock_symbol transaction_type}:"%s"*' % word.replace('"', '""')
+                for word in words
+            ]
+        )
+        transactions = transactions.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        )
+    else:
+        for word in words:
+            transactions = transactions.filter(
+                Q(security__symbol__istartswith=word)
+                | Q(transaction_type__istartswith=word)
+            )
+    return transactions.select_related("security").order_by("-transaction_date", "-id")
@@ -0,0 +1,63 @@
+from stocks.models import Security
+
+BATCH_SIZE = 900
+
+
+def normalize(symbol):
+    return str(symbol or "").strip().upper()
+
+
+def get(symbol):
+    return Security.objects.get_or_create(symbol=normalize(symbol))[0]
+
+
+def symbols(ids):
+    # {id: symbol}, fetched in batches to stay under the bound-parameter limit.
+    ids = list(set(ids))
+    names = {}
+    for start in range(0, len(ids), BATCH_SIZE):
+        names.update(
+            Security.objects.filter(id__in=ids[start : start + BATCH_SIZE]).values_list(
+                "id", "symbol"
+            )
+        )
+    return names
+
+
+def _ids(symbols):
+    ids = {}
+    for start in range(0, len(symbols), BATCH_SIZE):
+        ids.update(
+            Security.objects.filter(
+                symbol__in=symbols[start : start + BATCH_SIZE]
+            ).values_list("symbol", "id")
+        )
+    return ids
+
+
+class SymbolMap:
+    # In-memory symbol -> Security id for bulk writers. Each resolve() only
+    # goes to the database for symbols it has not seen: a read for the known
+    # ones and an insert for the new ones, instead of a lookup per row.
+    def __init__(self):
+        self.ids = {}
+
+    def resolve(self, symbols):
+        missing = set(symbols) - self.ids.keys()
+        if not missing:
+            return self.ids
+        missing = sorted(missing)
+        self.ids.update(_ids(missing))
+        new = [symbol for symbol in missing if symbol not in self.ids]
+        if new:
+            # Another writer may add the same symbols in between.
+            Security.objects.bulk_create(
+                [Security(symbol=symbol) for symbol in new],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            self.ids.update(_ids(new))
+        return self.ids
+
+    def id(self, symbol):
+        return self.resolve([symbol])[symbol]
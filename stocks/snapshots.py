@@ -0,0 +1,232 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from stocks.models import (
+    PortfolioSnapshot,
+    PriceBar,
+    Security,
+    StaleSnapshot,
+    StockTransaction,
+)
+
+BATCH_SIZE = 200
+
+
+def _day(moment):
+    return timezone.localdate(moment)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def mark_stale(changes):
+    # Ledger hook: changes are (user_id, transaction_date) pairs of written or
+    # deleted rows. Only the earliest day per user is kept.
+    earliest = {}
+    for user_id, moment in changes:
+        day = _day(moment)
+        if user_id not in earliest or day < earliest[user_id]:
+            earliest[user_id] = day
+    if not earliest:
+        return
+    StaleSnapshot.objects.bulk_create(
+        [
+            StaleSnapshot(user_id=user_id, since=day)
+            for user_id, day in earliest.items()
+        ],
+        ignore_conflicts=True,
+    )
+    for user_id, day in earliest.items():
+        StaleSnapshot.objects.filter(user_id=user_id, since__gt=day).update(since=day)
+
+
+def mark_renamed(security_id):
+    # Breakdowns are keyed by symbol, so every user who traded a renamed
+    # security is rebuilt from the day they first traded it. Returns their ids.
+    firsts = list(
+        StockTransaction.objects.filter(security_id=security_id)
+        .values("user_id")
+        .annotate(first=Min("transaction_date"))
+        .values_list("user_id", "first")
+    )
+    mark_stale(firsts)
+    return [user_id for user_id, _ in firsts]
+
+
+def _save(batch):
+    # An upsert, so a build racing another one for the same user overwrites
+    # its days instead of failing on (user, date).
+    PortfolioSnapshot.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["user", "date"],
+        update_fields=["invested", "market_value", "breakdown"],
+    )
+
+
+def _load(breakdown):
+    return {
+        symbol: [quantity, Decimal(cost), Decimal(price)]
+        for symbol, (quantity, cost, price) in breakdown.items()
+    }
+
+
+def _snapshot(user_id, day, state):
+    invested = market_value = Decimal("0.00")
+    for quantity, cost, price in state.values():
+        if quantity > 0:
+            invested += cost
+            market_value += quantity * price
+    return PortfolioSnapshot(
+        user_id=user_id,
+        date=day,
+        invested=invested.quantize(Decimal("0.01")),
+        market_value=market_value.quantize(Decimal("0.01")),
+        breakdown={
+            symbol: [quantity, str(cost), str(price)]
+            for symbol, (quantity, cost, price) in state.items()
+        },
+    )
+
+
+def _replay(user_id, start, end, state):
+    # One snapshot per calendar day from start to end. Each day applies its
+    # trades, which also set the symbol's price, then the day's closing bars.
+    traded = Security.objects.filter(
+        id__in=StockTransaction.objects.filter(user_id=user_id).values("security_id")
+    )
+    names = dict(traded.values_list("id", "symbol"))
+    ledger = groupby(
+        StockTransaction.objects.filter(
+            user_id=user_id, transaction_date__gte=_day_start(start)
+        )
+        .order_by("transaction_date", "id")
+        .values_list(
+            "security_id",
+            "transaction_type",
+            "quantity",
+            "price_per_share",
+            "transaction_date",
+        )
+        .iterator(),
+        key=lambda row: _day(row[4]),
+    )
+    bars = groupby(
+        PriceBar.objects.filter(
+            symbol__in=traded.values("symbol"),
+            date__gte=start,
+            date__lte=end,
+        )
+        .order_by("date")
+        .values_list("date", "symbol", "close")
+        .iterator(),
+        key=lambda row: row[0],
+    )
+    next_trades = next(ledger, None)
+    next_bars = next(bars, None)
+
+    day = start
+    while day <= end:
+        while next_trades and next_trades[0] <= day:
+            for security_id, trans_type, quantity, price, _ in next_trades[1]:
+                position = state.setdefault(
+                    names[security_id], [0, Decimal("0.00"), price]
+                )
+                if trans_type == "SELL":
+                    quantity = -quantity
+                position[0] += quantity
+                position[1] += quantity * price
+                position[2] = price
+            next_trades = next(ledger, None)
+        while next_bars and next_bars[0] <= day:
+            for _, symbol, close in next_bars[1]:
+                if symbol in state:
+                    state[symbol][2] = close
+            next_bars = next(bars, None)
+        yield _snapshot(user_id, day, state)
+        day += timedelta(days=1)
+
+
+def build(user_ids=None, until=None):
+    # Builds the snapshots missing up to until (default today) for each user
+    # with transactions, rebuilding from the stale day of backdated writes.
+    # Returns {user_id: days built}.
+    until = until or timezone.localdate()
+    users = StockTransaction.objects.values("user_id").annotate(
+        first=Min("transaction_date")
+    )
+    if user_ids is not None:
+        users = users.filter(user_id__in=user_ids)
+
+    built = {}
+    for row in users.order_by("user_id"):
+        user_id = row["user_id"]
+        first = _day(row["first"])
+        snapshots = PortfolioSnapshot.objects.filter(user_id=user_id)
+        stale = StaleSnapshot.objects.filter(user_id=user_id).first()
+        last = snapshots.aggregate(last=Max("date"))["last"]
+
+        start = first if last is None else last + timedelta(days=1)
+        if stale and stale.since < start:
+            start = stale.since
+        start = max(start, first)
+
+        with transaction.atomic():
+            snapshots.filter(date__gte=start).delete()
+            # Left over from before a deleted first transaction.
+            snapshots.filter(date__lt=first).delete()
+            previous = (
+                snapshots.filter(date__lt=start)
+                .order_by("-date")
+                .only("breakdown")
+                .first()
+            )
+            state = _load(previous.breakdown) if previous else {}
+            count = 0
+            batch = []
+            for snapshot in _replay(user_id, start, until, state):
+                batch.append(snapshot)
+                if len(batch) == BATCH_SIZE:
+                    _save(batch)
+                    count += len(batch)
+                    batch = []
+            _save(batch)
+            count += len(batch)
+            if stale:
+                # Unless a write during the build moved the mark earlier.
+                StaleSnapshot.objects.filter(
+                    user_id=user_id, since__gte=stale.since
+                ).delete()
+        built[user_id] = count
+
+    # Users whose ledger is now empty.
+    orphans = PortfolioSnapshot.objects.exclude(
+        user_id__in=StockTransaction.objects.values("user_id")
+    )
+    if user_ids is not None:
+        orphans = orphans.filter(user_id__in=user_ids)
+    orphans.delete()
+    StaleSnapshot.objects.exclude(
+        user_id__in=StockTransaction.objects.values("user_id")
+    ).delete()
+    return built
+
+
+def history(user, start=None, end=None):
+    snapshots = PortfolioSnapshot.objects.filter(user=user)
+    if start is not None:
+        snapshots = snapshots.filter(date__gte=start)
+    if end is not None:
+        snapshots = snapshots.filter(date__lte=end)
+    return [
+        {"t": day.isoformat(), "invested": float(invested), "value": float(value)}
+        for day, invested, value in snapshots.order_by("date").values_list(
+            "date", "invested", "market_value"
+        )
+    ]
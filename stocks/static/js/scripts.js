@@ -16,8 +16,8 @@ document.addEventListener('DOMContentLoaded', () => {
         const ctx = portfolioChartCanvas.getContext('2d');
         let chart;
 
-        const transactions = window.transactionsData || [];
-        console.log("Transactions Data:", transactions); // Debug: Verify data received
+        let transactions = [];
+        let bucket = 'day';
 
         if (!window.Chart) {
             console.error("Chart.js is not loaded");
@@ -98,7 +98,7 @@ document.addEventListener('DOMContentLoaded', () => {
                             x: {
                                 type: chartType === 'line' ? 'time' : 'category',
                                 time: chartType === 'line' ? {
-                                    unit: 'day',
+                                    unit: bucket,
                                     tooltipFormat: 'MMM d, yyyy'
                                 } : undefined,
                                 title: {
@@ -130,11 +130,88 @@ document.addEventListener('DOMContentLoaded', () => {
             updateChart(graphFilter.value);
         });
 
-        updateChart('all');
+        // Series are bucketed server-side; each bucket is plotted at its close.
+        const params = new URLSearchParams({ symbols: portfolioChartCanvas.dataset.symbols || '' });
+        fetch(`${portfolioChartCanvas.dataset.url}?${params}`, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                bucket = data.bucket;
+                transactions = Object.entries(data.series).flatMap(([symbol, points]) =>
+                    points.map(point => ({
+                        stock_symbol: symbol,
+                        price_per_share: point.close,
+                        transaction_date: point.t
+                    }))
+                );
+                updateChart(graphFilter.value);
+            })
+            .catch(error => {
+                console.error("Chart data error:", error);
+                const parent = ctx.canvas.parentElement;
+                parent.innerHTML = '<p class="text-center text-red-600 mt-4">Error loading chart data.</p>';
+            });
     } else {
         console.error("Chart canvas or filter element not found");
     }
 
+    // Portfolio Value History
+    const historyCanvas = document.getElementById('historyChart');
+    if (historyCanvas && window.Chart) {
+        const showMessage = (message, color) => {
+            historyCanvas.parentElement.innerHTML = `<p class="text-center ${color} mt-4">${message}</p>`;
+        };
+        fetch(historyCanvas.dataset.url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                if (!data.series.length) {
+                    showMessage('No snapshots yet. They are built daily by build_snapshots.', 'text-gray-600');
+                    return;
+                }
+                new Chart(historyCanvas.getContext('2d'), {
+                    type: 'line',
+                    data: {
+                        datasets: [
+                            {
+                                label: 'Market Value',
+                                data: data.series.map(point => ({ x: point.t, y: point.value })),
+                                borderColor: '#4F46E5',
+                                backgroundColor: '#4F46E533',
+                                tension: 0.3,
+                                fill: true,
+                                pointRadius: 0
+                            },
+                            {
+                                label: 'Invested',
+                                data: data.series.map(point => ({ x: point.t, y: point.invested })),
+                                borderColor: '#6B7280',
+                                borderDash: [6, 4],
+                                pointRadius: 0
+                            }
+                        ]
+                    },
+                    options: {
+                        responsive: true,
+                        maintainAspectRatio: false,
+                        plugins: { legend: { position: 'top' } },
+                        scales: {
+                            x: { type: 'time', time: { unit: 'month', tooltipFormat: 'MMM d, yyyy' } },
+                            y: { title: { display: true, text: 'Value (₹)' } }
+                        }
+                    }
+                });
+            })
+            .catch(error => {
+                console.error("History data error:", error);
+                showMessage('Error loading portfolio history.', 'text-red-600');
+            });
+    }
+
     // Average Price Calculator Dynamic Rows
     const addRowBtn = document.getElementById('addRow');
     const container = document.getElementById('transactionsContainer');
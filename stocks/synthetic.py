@@ -0,0 +1,116 @@
+import csv
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from stocks import holdings, ledger, lots, securities, snapshots
+from stocks.importer import COLUMNS, batched
+from stocks.models import StockTransaction
+
+START_DATE = datetime(2015, 1, 1, 9, 15)
+
+
+class LedgerGenerator:
+    # Deterministic synthetic ledgers: the same seed always produces the same
+    # users, symbols, rows and dates, and grow() continues the same stream so
+    # a run can step through increasing data sizes.
+    def __init__(self, users=3, symbols=50, sell_ratio=0.3, seed=42):
+        self.rng = random.Random(seed)
+        self.sell_ratio = sell_ratio
+        self.symbols = [f"SYM{index:04d}" for index in range(symbols)]
+        self.prices = {
+            symbol: Decimal(self.rng.randint(1000, 500000)) / 100
+            for symbol in self.symbols
+        }
+        self.usernames = [f"bench_user_{index}" for index in range(users)]
+        self.held = {username: {} for username in self.usernames}
+        self.clock = {username: START_DATE for username in self.usernames}
+        self.count = 0
+
+    def rows(self, username, count):
+        # Yields (date, symbol, type, quantity, price); SELLs never exceed the
+        # quantity held so positions stay valid.
+        held = self.held[username]
+        for _ in range(count):
+            symbol = self.rng.choice(self.symbols)
+            price = self.prices[symbol] * Decimal(1 + self.rng.uniform(-0.02, 0.02))
+            price = max(price.quantize(Decimal("0.01")), Decimal("0.01"))
+            self.prices[symbol] = price
+
+            if held.get(symbol) and self.rng.random() < self.sell_ratio:
+                trans_type = "SELL"
+                quantity = self.rng.randint(1, held[symbol])
+                held[symbol] -= quantity
+            else:
+                trans_type = "BUY"
+                quantity = self.rng.randint(1, 500)
+                held[symbol] = held.get(symbol, 0) + quantity
+
+            self.clock[username] += timedelta(minutes=self.rng.randint(5, 60))
+            yield self.clock[username], symbol, trans_type, quantity, price
+
+    def grow(self, per_user, batch_size=2000):
+        # Adds transactions until every user has per_user of them.
+        added = per_user - self.count
+        users = []
+        for username in self.usernames:
+            user, _ = User.objects.get_or_create(username=username)
+            users.append(user)
+            if added > 0:
+                self.insert(user, self.rows(username, added), batch_size)
+        if added > 0:
+            self.count = per_user
+            holdings.rebuild([user.pk for user in users])
+            lots.rebuild([user.pk for user in users])
+        return users
+
+    @transaction.atomic
+    def insert(self, user, rows, batch_size):
+        symbols = securities.SymbolMap()
+        for batch in batched(rows, batch_size):
+            ids = symbols.resolve(row[1] for row in batch)
+            created = ledger.bulk_add(
+                [
+                    StockTransaction(
+                        user=user,
+                        security_id=ids[symbol],
+                        transaction_type=trans_type,
+                        quantity=quantity,
+                        price_per_share=price,
+                    )
+                    for _, symbol, trans_type, quantity, price in batch
+                ]
+            )
+            # transaction_date is auto_now_add, so the generated dates are
+            # written afterwards.
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE stocks_stocktransaction SET transaction_date = %s "
+                    "WHERE id = %s",
+                    [
+                        (
+                            connection.ops.adapt_datetimefield_value(
+                                timezone.make_aware(row[0])
+                            ),
+                            trans.pk,
+                        )
+                        for row, trans in zip(batch, created)
+                    ],
+                )
+            snapshots.mark_stale(
+                (user.pk, timezone.make_aware(row[0])) for row in batch
+            )
+
+    def write_csv(self, path, count, username="bench_import"):
+        self.held.setdefault(username, {})
+        self.clock.setdefault(username, START_DATE)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for _, symbol, trans_type, quantity, price in self.rows(username, count):
+                writer.writerow([symbol, price, trans_type, quantity])
+        return path
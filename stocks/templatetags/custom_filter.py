@@ -1,10 +1,16 @@
+from decimal import Decimal
+from functools import lru_cache
 from math import isnan
 
-from babel.numbers import format_number
 from django import template
 
 register = template.Library()
 
+# Distinct values remembered by format_indian_currency; a page repeats a small
+# set of prices and totals.
+FORMAT_CACHE_SIZE = 4096
+THOUSANDTH = Decimal("0.001")
+
 
 @register.filter(name="format_big_number")
 def format_big_number(number):
@@ -26,12 +32,46 @@ def format_big_number(number):
     return f"{sign}₹{number}Cr"
 
 
+def babel_indian_number(number):
+    # The reference implementation, used for values the fast path doesn't
+    # handle; babel is only imported when it is needed.
+    from babel.numbers import format_decimal
+
+    return format_decimal(number, locale="en_IN")
+
+
+def indian_number(number):
+    # Same output as babel's en_IN pattern "#,##,##0.###": at most three
+    # decimals rounded half-even, trailing zeros dropped, the last three
+    # integer digits grouped and then every two.
+    if not isinstance(number, Decimal):
+        number = Decimal(str(number))
+    if not number.is_finite():
+        return babel_indian_number(number)
+    sign = "-" if number.is_signed() else ""
+    integer, _, fraction = (
+        f"{abs(number).normalize().quantize(THOUSANDTH):f}".partition(".")
+    )
+    fraction = fraction.rstrip("0")
+
+    head, groups = integer[:-3], [integer[-3:]]
+    while head:
+        groups.append(head[-2:])
+        head = head[:-2]
+    grouped = ",".join(reversed(groups))
+    return f"{sign}{grouped}.{fraction}" if fraction else f"{sign}{grouped}"
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE, typed=True)
+def _indian_currency(number):
+    return "₹" + indian_number(number)
+
+
 @register.filter(name="format_indian_currency")
 def format_indian_currency(number):
     if not number or (isinstance(number, float) and isnan(number)):
         return "₹0"
     try:
-        indian_currency_format = format_number(number, locale="en_IN")
+        return _indian_currency(number)
     except Exception:
         return "-"
-    return "₹" + str(indian_currency_format)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.utils import timezone
+
+register = template.Library()
+
+
+def _next(moment, kind):
+    if kind == "year":
+        return moment.replace(year=moment.year + 1)
+    if kind == "month":
+        if moment.month == 12:
+            return moment.replace(year=moment.year + 1, month=1)
+        return moment.replace(month=moment.month + 1)
+    return moment + timedelta(days=1)
+
+
+def _truncate(moment, kind):
+    moment = timezone.localtime(moment)
+    day = datetime(moment.year, moment.month, moment.day)
+    if kind == "year":
+        day = day.replace(month=1, day=1)
+    elif kind == "month":
+        day = day.replace(day=1)
+    return timezone.make_aware(day)
+
+
+class IndexedDates:
+    # Stands in for the changelist queryset in the admin date hierarchy.
+    # Instead of a DISTINCT over a truncation of every row, each year, month
+    # or day between the first and last date is probed with an EXISTS on the
+    # transaction_date index.
+    def __init__(self, queryset, field_name):
+        self.queryset = queryset
+        self.field_name = field_name
+
+    def _edge(self, ordering):
+        return (
+            self.queryset.order_by(ordering)
+            .values_list(self.field_name, flat=True)
+            .first()
+        )
+
+    def aggregate(self, **kwargs):
+        # The first and last dates the hierarchy asks for, as two index
+        # lookups; SQLite scans the table for a MIN and a MAX in one query.
+        return {
+            "first": self._edge(self.field_name),
+            "last": self._edge(f"-{self.field_name}"),
+        }
+
+    def datetimes(self, field_name, kind, **kwargs):
+        bounds = self.aggregate()
+        if bounds["first"] is None:
+            return []
+        buckets = []
+        moment = _truncate(bounds["first"], kind)
+        while moment <= bounds["last"]:
+            following = _next(moment, kind)
+            in_bucket = {
+                f"{field_name}__gte": moment,
+                f"{field_name}__lt": following,
+            }
+            if self.queryset.filter(**in_bucket).exists():
+                buckets.append(moment)
+            moment = following
+        return buckets
+
+
+class IndexedChangeList:
+    def __init__(self, changelist):
+        self.changelist = changelist
+        self.queryset = IndexedDates(changelist.queryset, changelist.date_hierarchy)
+
+    def __getattr__(self, name):
+        return getattr(self.changelist, name)
+
+
+@register.inclusion_tag("admin/date_hierarchy.html")
+def indexed_date_hierarchy(changelist):
+    return date_hierarchy(IndexedChangeList(changelist))
@@ -1,3 +1,1239 @@
+import base64
+import copy
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from stocks import (
+    caching,
+    engine,
+    forms,
+    holdings,
+    importer,
+    jobs,
+    ledger,
+    lots,
+    prices,
+    quotes,
+    search,
+    securities,
+    snapshots,
+    synthetic,
+    whatif,
+)
+from stocks.pagination import EstimatedCountPaginator, KeysetPaginator
+from stocks.templatetags import custom_filter, stocks_admin
+from stocks.models import (
+    Holding,
+    Job,
+    LotSale,
+    PortfolioSnapshot,
+    PriceBar,
+    StaleSnapshot,
+    StockTransaction,
+    TaxLot,
+)
+
+START = timezone.make_aware(datetime(2024, 1, 1, 10))
+SYMBOLS = ("INFY", "TCS", "WIPRO")
+
+
+class LedgerTestCase(TestCase):
+    def setUp(self):
+        # User pks repeat between tests; cached entries must not.
+        caching.get_cache().clear()
+        self.user = User.objects.create_user("trader")
+        self.other = User.objects.create_user("other")
+
+    def transaction(self, symbol, trans_type, quantity, price, user=None):
+        return StockTransaction(
+            user=user or self.user,
+            security=securities.get(symbol),
+            transaction_type=trans_type,
+            quantity=quantity,
+            price_per_share=Decimal(price),
+        )
+
+    def at(self, day):
+        # transaction_date is auto_now_add; rows are dated by freezing now.
+        return mock.patch(
+            "django.utils.timezone.now", return_value=START + timedelta(days=day)
+        )
+
+    def add(self, symbol, trans_type, quantity, price, day=0, user=None):
+        with self.at(day):
+            return ledger.add(
+                self.transaction(symbol, trans_type, quantity, price, user)
+            )
+
+    def bulk_add(self, rows, day=0):
+        with self.at(day):
+            return ledger.bulk_add([self.transaction(*row) for row in rows])
+
+    def edit(self, trans, **changes):
+        trans = StockTransaction.objects.get(pk=trans.pk)
+        if "symbol" in changes:
+            trans.security = securities.get(changes.pop("symbol"))
+        if "day" in changes:
+            trans.transaction_date = START + timedelta(days=changes.pop("day"))
+        for field, value in changes.items():
+            setattr(trans, field, value)
+        return ledger.update(trans)
+
+    def delete(self, trans):
+        ledger.delete(StockTransaction.objects.get(pk=trans.pk))
+
+    def random_ledger(self, seed, steps):
+        # Adds, bulk adds, edits (some backdated or moved to another symbol)
+        # and deletes for two users, yielding after each step.
+        rng = random.Random(seed)
+        rows = []
+        for step in range(steps):
+            action = rng.choice(["add", "add", "add", "bulk", "edit", "delete"])
+            if action in ("edit", "delete") and not rows:
+                action = "add"
+            if action == "add":
+                user = rng.choice([self.user, self.other])
+                day = step if rng.random() < 0.7 else rng.randrange(step + 1)
+                rows.append(
+                    self.add(
+                        rng.choice(SYMBOLS),
+                        rng.choice(["BUY", "BUY", "SELL"]),
+                        rng.randint(1, 50),
+                        f"{rng.randint(100, 5000)}.{rng.randint(0, 99):02d}",
+                        day=day,
+                        user=user,
+                    )
+                )
+            elif action == "bulk":
+                rows.extend(
+                    self.bulk_add(
+                        [
+                            (
+                                rng.choice(SYMBOLS),
+                                rng.choice(["BUY", "SELL"]),
+                                rng.randint(1, 50),
+                                f"{rng.randint(100, 5000)}.25",
+                            )
+                            for _ in range(rng.randint(1, 5))
+                        ],
+                        day=rng.randrange(step + 1),
+                    )
+                )
+            elif action == "edit":
+                trans = rng.choice(rows)
+                changes = rng.choice(
+                    [
+                        {"quantity": rng.randint(1, 50)},
+                        {"price_per_share": Decimal(f"{rng.randint(100, 5000)}.50")},
+                        {"transaction_type": rng.choice(["BUY", "SELL"])},
+                        {"symbol": rng.choice(SYMBOLS)},
+                        {"day": rng.randrange(step + 1)},
+                    ]
+                )
+                rows[rows.index(trans)] = self.edit(trans, **changes)
+            else:
+                trans = rows.pop(rng.randrange(len(rows)))
+                self.delete(trans)
+            yield step
+
+
+class HoldingMaintenanceTests(LedgerTestCase):
+    def holding_rows(self):
+        return sorted(
+            Holding.objects.values_list(
+                "user_id",
+                "security_id",
+                "quantity",
+                "total_cost",
+                "latest_price",
+                "latest_transaction_id",
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(holdings.verify(), [])
+        incremental = self.holding_rows()
+        holdings.rebuild()
+        self.assertEqual(self.holding_rows(), incremental)
+
+    def test_add_accumulates_quantity_and_cost(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 5, "130.00", day=1)
+        sell = self.add("INFY", "SELL", 3, "150.00", day=2)
+
+        holding = Holding.objects.get(user=self.user, security__symbol="INFY")
+        self.assertEqual(holding.quantity, 12)
+        self.assertEqual(holding.total_cost, Decimal("1200.00"))
+        self.assertEqual(holding.latest_price, Decimal("150.00"))
+        self.assertEqual(holding.latest_transaction_id, sell.pk)
+        self.assertMatchesRebuild()
+
+    def test_bulk_add_updates_existing_and_creates_new_holdings(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        created = self.bulk_add(
+            [
+                ("INFY", "BUY", 5, "110.00"),
+                ("INFY", "SELL", 2, "120.00"),
+                ("TCS", "BUY", 7, "3000.00"),
+            ],
+            day=1,
+        )
+
+        infy = Holding.objects.get(user=self.user, security__symbol="INFY")
+        self.assertEqual(infy.quantity, 13)
+        self.assertEqual(infy.latest_transaction_id, created[1].pk)
+        self.assertTrue(Holding.objects.filter(security__symbol="TCS").exists())
+        self.assertMatchesRebuild()
+
+    def test_update_moves_the_delta(self):
+        buy = self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 5, "120.00", day=1)
+
+        self.edit(buy, quantity=4, price_per_share=Decimal("90.00"))
+        self.assertMatchesRebuild()
+        self.edit(buy, transaction_type="SELL")
+        self.assertMatchesRebuild()
+        self.edit(buy, symbol="TCS")
+        self.assertMatchesRebuild()
+
+    def test_update_of_the_latest_row_updates_latest_price(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        latest = self.add("INFY", "BUY", 5, "120.00", day=1)
+
+        self.edit(latest, price_per_share=Decimal("125.00"))
+        holding = Holding.objects.get(user=self.user, security__symbol="INFY")
+        self.assertEqual(holding.latest_price, Decimal("125.00"))
+        self.assertMatchesRebuild()
+
+    def test_backdated_rows_do_not_become_latest(self):
+        latest = self.add("INFY", "BUY", 10, "100.00", day=10)
+        self.add("INFY", "BUY", 5, "80.00", day=2)
+        moved = self.add("INFY", "SELL", 2, "90.00", day=11)
+        self.edit(moved, day=1)
+
+        holding = Holding.objects.get(user=self.user, security__symbol="INFY")
+        self.assertEqual(holding.latest_transaction_id, latest.pk)
+        self.assertMatchesRebuild()
+
+    def test_delete_refreshes_latest_and_drops_empty_holdings(self):
+        first = self.add("INFY", "BUY", 10, "100.00", day=0)
+        latest = self.add("INFY", "BUY", 5, "120.00", day=1)
+        only = self.add("TCS", "BUY", 1, "3000.00", day=2)
+
+        self.delete(latest)
+        holding = Holding.objects.get(user=self.user, security__symbol="INFY")
+        self.assertEqual(holding.latest_transaction_id, first.pk)
+        self.delete(only)
+        self.assertFalse(Holding.objects.filter(security__symbol="TCS").exists())
+        self.assertMatchesRebuild()
+
+    def test_security_rename_updates_holdings(self):
+        self.add("INFY", "BUY", 10, "100.00")
+        security = securities.get("INFY")
+        self.client.force_login(User.objects.create_superuser("admin"))
+        self.client.post(
+            f"/admin/stocks/security/{security.pk}/change/",
+            {"symbol": "INFOSYS", "name": "", "exchange": "", "isin": ""},
+        )
+        self.assertEqual(Holding.objects.get().symbol, "INFOSYS")
+        self.assertMatchesRebuild()
+
+    def test_engine_positions_read_symbols_from_holdings(self):
+        self.add("TCS", "BUY", 2, "3000.00")
+        self.add("INFY", "BUY", 10, "100.00")
+
+        with self.assertNumQueries(1):
+            positions = engine.Positions.from_holdings(
+                holdings.open_holdings(self.user)
+            )
+        self.assertEqual(sorted(positions.symbols), ["INFY", "TCS"])
+        self.assertEqual(positions.total_value(), Decimal("7000.00"))
+
+    def test_random_ledger_matches_rebuild(self):
+        for step in self.random_ledger(seed=1, steps=150):
+            if step % 25 == 0:
+                self.assertEqual(holdings.verify(), [], f"after step {step}")
+        self.assertMatchesRebuild()
+
+
+class ImporterTests(TestCase):
+    def row(self, price):
+        return {
+            "Stock symbol": "abc",
+            "Price per share": price,
+            "Transaction Type": "Buy",
+            "Quantity": "5",
+        }
+
+    def test_parse_row(self):
+        self.assertEqual(
+            importer.parse_row(self.row(" 10.5 ")),
+            ("ABC", "BUY", 5, Decimal("10.50")),
+        )
+
+    def test_non_finite_prices_are_rejected(self):
+        for price in ("NaN", "nan", "sNaN", "Infinity", "-inf"):
+            with self.subTest(price=price):
+                with self.assertRaises(ValueError):
+                    importer.parse_row(self.row(price))
+
+    def test_values_beyond_the_columns_are_rejected(self):
+        self.assertEqual(
+            importer.parse_row(self.row("99999999.99"))[3], importer.MAX_PRICE
+        )
+        for price, quantity in (
+            ("99999999999", "5"),
+            ("100000000.00", "5"),
+            ("10", "99999999999999999999999"),
+            ("10", "2147483648"),
+        ):
+            with self.subTest(price=price, quantity=quantity):
+                with self.assertRaises(ValueError):
+                    importer.parse_row({**self.row(price), "Quantity": quantity})
+
+    def test_fetch_stocks_skips_oversized_rows(self):
+        user = User.objects.create_user("trader")
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "trades.csv")
+            path.write_text(
+                "Stock symbol,Price per share,Transaction Type,Quantity\n"
+                "AAA,10,BUY,1\n"
+                "BBB,99999999999,BUY,1\n"
+                "CCC,10,BUY,99999999999999999999999\n"
+                "DDD,20,BUY,2\n"
+            )
+            call_command(
+                "fetch_stocks",
+                str(path),
+                user="trader",
+                batch_size=1,
+                stdout=StringIO(),
+            )
+        self.assertEqual(
+            sorted(
+                StockTransaction.objects.filter(user=user).values_list(
+                    "security__symbol", flat=True
+                )
+            ),
+            ["AAA", "DDD"],
+        )
+
+    def test_fetch_stocks_rejects_empty_chunks(self):
+        User.objects.create_user("trader")
+        for chunk_size in (0, -1):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        "fetch_stocks",
+                        "trades.csv",
+                        user="trader",
+                        workers=2,
+                        chunk_size=chunk_size,
+                    )
+
+
+class PriceBarTests(TestCase):
+    def row(self, **fields):
+        return {
+            "Date": "2024-01-02",
+            "Open": "10",
+            "High": "12",
+            "Low": "9",
+            "Close": "11",
+            "Volume": "100",
+            **fields,
+        }
+
+    def test_values_beyond_the_columns_are_rejected(self):
+        self.assertEqual(prices.parse_bar(self.row(), "infy").close, Decimal("11.00"))
+        for fields in (
+            {"Open": "99999999999"},
+            {"Close": "100000000"},
+            {"Volume": "1e20"},
+            {"High": "NaN"},
+        ):
+            with self.subTest(**fields):
+                with self.assertRaises(ValueError):
+                    prices.parse_bar(self.row(**fields), "INFY")
+
+    def test_load_prices_skips_oversized_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "INFY.csv")
+            path.write_text(
+                "Date,Open,High,Low,Close,Volume\n"
+                "2024-01-02,10,12,9,11,100\n"
+                "2024-01-03,99999999999,12,9,11,100\n"
+            )
+            out = StringIO()
+            call_command("load_prices", str(path), stdout=out)
+        self.assertEqual(PriceBar.objects.count(), 1)
+        self.assertIn("line 3", out.getvalue())
+
+
+class QuoteTests(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+
+    def load(self, close):
+        bar = PriceBar(
+            symbol="INFY",
+            date=datetime(2024, 1, 2).date(),
+            open=close,
+            high=close,
+            low=close,
+            close=close,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            prices.load([bar])
+
+    def test_symbols_without_prices_are_cached(self):
+        self.assertEqual(quotes.latest(["INFY", "TCS"]), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(quotes.latest(["INFY", "TCS"]), {})
+
+    def test_a_price_load_replaces_cached_closes(self):
+        self.assertEqual(quotes.latest(["INFY"]), {})
+        self.load(Decimal("10.00"))
+        self.assertEqual(quotes.latest(["INFY"]), {"INFY": Decimal("10.00")})
+        self.load(Decimal("11.00"))
+        self.assertEqual(quotes.latest(["INFY"]), {"INFY": Decimal("11.00")})
+        with self.assertNumQueries(0):
+            quotes.latest(["INFY"])
+
+    def test_refreshed_quotes_win_over_closes(self):
+        self.load(Decimal("10.00"))
+        provider = mock.Mock(fetch=mock.Mock(return_value={"INFY": Decimal("12.00")}))
+        quotes.refresh(["INFY"], provider)
+        self.assertEqual(quotes.latest(["INFY"]), {"INFY": Decimal("12.00")})
+
+
+class SearchTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add("INFY", "BUY", 10, "100.00")
+        self.add("TCS", "SELL", 3, "3500.00")
+
+    def test_quantity_and_price_terms(self):
+        self.assertEqual(search.search(self.user, "qty:>5").count(), 1)
+        self.assertEqual(search.search(self.user, "price:>=3500").count(), 1)
+        self.assertEqual(search.search(self.user, "3").count(), 1)
+
+    def test_numbers_beyond_64_bits_do_not_overflow(self):
+        huge = "99999999999999999999999"
+        self.assertEqual(search.search(self.user, huge).count(), 0)
+        self.assertEqual(search.search(self.user, f"qty:{huge}").count(), 0)
+        self.assertEqual(search.search(self.user, f"qty:>={huge}").count(), 0)
+        self.assertEqual(search.search(self.user, f"qty:<{huge}").count(), 2)
+
+        self.client.force_login(self.user)
+        response = self.client.get("/search/", {"q": f"qty:>{huge}"})
+        self.assertEqual(response.status_code, 200)
+
+
+class TaxLotMatchingTests(LedgerTestCase):
+    def lot_rows(self):
+        return (
+            sorted(
+                TaxLot.objects.values_list(
+                    "user_id",
+                    "security_id",
+                    "buy_transaction_id",
+                    "quantity",
+                    "remaining",
+                    "price_per_share",
+                    "acquired_at",
+                )
+            ),
+            sorted(
+                LotSale.objects.values_list(
+                    "user_id",
+                    "security_id",
+                    "sell_transaction_id",
+                    "lot__buy_transaction_id",
+                    "quantity",
+                    "gain",
+                    "long_term",
+                )
+            ),
+        )
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(lots.verify(), [])
+        incremental = self.lot_rows()
+        self.assertEqual(lots.rebuild(), TaxLot.objects.count())
+        self.assertEqual(self.lot_rows(), incremental)
+
+    def remaining(self, buy):
+        return TaxLot.objects.get(buy_transaction_id=buy.pk).remaining
+
+    def test_sells_drain_the_oldest_lot_first(self):
+        first = self.add("INFY", "BUY", 10, "100.00", day=0)
+        second = self.add("INFY", "BUY", 10, "120.00", day=1)
+        self.add("INFY", "SELL", 15, "150.00", day=2)
+
+        self.assertEqual(self.remaining(first), 0)
+        self.assertEqual(self.remaining(second), 5)
+        self.assertMatchesRebuild()
+
+    def test_backdated_buy_is_matched_first(self):
+        later = self.add("INFY", "BUY", 10, "120.00", day=5)
+        self.add("INFY", "SELL", 4, "150.00", day=6)
+        earlier = self.add("INFY", "BUY", 10, "100.00", day=1)
+
+        self.assertEqual(self.remaining(earlier), 6)
+        self.assertEqual(self.remaining(later), 10)
+        self.assertMatchesRebuild()
+
+    def test_backdated_buy_fills_an_unmatched_sell(self):
+        self.add("INFY", "SELL", 5, "150.00", day=3)
+        buy = self.add("INFY", "BUY", 10, "100.00", day=1)
+        (bulk_buy,) = self.bulk_add([("TCS", "BUY", 4, "3000.00")], day=1)
+        self.add("TCS", "SELL", 1, "3100.00", day=0)
+        self.add("TCS", "SELL", 3, "3200.00", day=2)
+
+        self.assertEqual(self.remaining(buy), 5)
+        self.assertEqual(self.remaining(bulk_buy), 1)
+        self.assertMatchesRebuild()
+
+    def test_backdated_sell_rematches_later_sells(self):
+        buy = self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 10, "110.00", day=2)
+        self.add("INFY", "SELL", 8, "150.00", day=4)
+        self.add("INFY", "SELL", 5, "140.00", day=1)
+
+        self.assertEqual(self.remaining(buy), 0)
+        self.assertMatchesRebuild()
+
+    def test_edits_rematch_the_stream(self):
+        buy = self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 10, "110.00", day=2)
+        sell = self.add("INFY", "SELL", 12, "150.00", day=4)
+
+        self.edit(buy, quantity=4)
+        self.assertMatchesRebuild()
+        self.edit(sell, price_per_share=Decimal("90.00"))
+        self.assertMatchesRebuild()
+        self.edit(sell, day=1)
+        self.assertMatchesRebuild()
+        self.edit(sell, transaction_type="BUY")
+        self.assertMatchesRebuild()
+        self.edit(buy, symbol="TCS")
+        self.assertMatchesRebuild()
+
+    def test_deletes_rematch_the_stream(self):
+        first = self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 10, "110.00", day=1)
+        sell = self.add("INFY", "SELL", 12, "150.00", day=2)
+        self.add("INFY", "SELL", 3, "160.00", day=3)
+
+        self.delete(first)
+        self.assertMatchesRebuild()
+        self.delete(sell)
+        self.assertMatchesRebuild()
+
+    def test_random_ledger_matches_rebuild(self):
+        for step in self.random_ledger(seed=7, steps=150):
+            if step % 30 == 0:
+                self.assertMatchesRebuild()
+        self.assertMatchesRebuild()
+
+
+class IngestTests(LedgerTestCase):
+    def post(self, items):
+        return self.client.post(
+            "/api/transactions/batch/",
+            {"transactions": items},
+            content_type="application/json",
+        )
+
+    def item(self, price, **fields):
+        return {
+            "stock_symbol": "infy",
+            "transaction_type": "BUY",
+            "quantity": 5,
+            "price_per_share": price,
+            **fields,
+        }
+
+    def test_creates_transactions(self):
+        self.client.force_login(self.user)
+        response = self.post([self.item("100.50"), self.item(99)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 2)
+        self.assertEqual(holdings.verify(), [])
+
+    def test_non_finite_prices_are_item_errors(self):
+        self.client.force_login(self.user)
+        response = self.post(
+            [self.item("100.00"), self.item("NaN"), self.item("-Infinity")]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [result["index"] for result in response.json()["results"]], [1, 2]
+        )
+        self.assertFalse(StockTransaction.objects.exists())
+
+    def test_values_beyond_the_columns_are_item_errors(self):
+        self.client.force_login(self.user)
+        response = self.post(
+            [
+                self.item("100.00"),
+                self.item("100.00", quantity=99999999999999999999999),
+                self.item("99999999999"),
+                self.item(str(importer.MAX_PRICE), quantity=importer.MAX_QUANTITY),
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [result["index"] for result in response.json()["results"]], [1, 2]
+        )
+        self.assertFalse(StockTransaction.objects.exists())
+
+
+class WhatIfTests(LedgerTestCase):
+    def evaluate(self, quantity, cost, *items):
+        return whatif.evaluate(quantity, Decimal(cost), *whatif.ladders(list(items)))
+
+    def test_buys_average_in_and_sells_keep_the_average(self):
+        outcome = self.evaluate(10, "1000.00", [[10, 200], [-5, 300]])
+        self.assertTrue(outcome["valid"][0])
+        self.assertEqual(outcome["quantity"][0], 15)
+        self.assertAlmostEqual(outcome["avg_price"][0], 150)
+        self.assertAlmostEqual(outcome["break_even"][0], 1500 / 15)
+        self.assertAlmostEqual(outcome["capital_required"][0], 2000)
+
+    def test_a_sell_that_closes_the_position(self):
+        outcome = self.evaluate(3, "100.00", [[-3, 40]], [[-4, 40]])
+        self.assertEqual(outcome["valid"].tolist(), [True, False])
+        self.assertEqual(outcome["quantity"].tolist(), [0, -1])
+        self.assertTrue(np.isnan(outcome["avg_price"]).all())
+        self.assertTrue(np.isnan(outcome["break_even"]).all())
+        self.assertEqual(outcome["capital_required"][0], 0)
+
+    def test_basis_keeps_fractions_of_a_paisa(self):
+        # Selling one of three shares leaves a basis of 66.666..., which is
+        # carried unrounded into the next BUY.
+        outcome = self.evaluate(3, "100.00", [[-1, 50], [2, "10.01"]])
+        self.assertAlmostEqual(outcome["avg_price"][0], (200 / 3 + 20.02) / 4)
+        self.assertAlmostEqual(outcome["break_even"][0], 17.505)
+        outcome = self.evaluate(0, "0.00", [[3, "333.37"]])
+        self.assertAlmostEqual(outcome["avg_price"][0], 333.37)
+
+    def test_step_and_scenario_limits(self):
+        whatif.ladders([[[1, 10]] * whatif.MAX_STEPS])
+        whatif.grid([1] * 100, [10] * (whatif.MAX_SCENARIOS // 100))
+        for items in (
+            [],
+            [[]],
+            [[[1, 10]] * (whatif.MAX_STEPS + 1)],
+            [[[1, 10]]] * (whatif.MAX_SCENARIOS + 1),
+            [[[1.5, 10]]],
+            [[[whatif.MAX_QUANTITY + 1, 10]]],
+            [[[1, 0]]],
+            [[[1, whatif.MAX_PRICE + 1]]],
+            [[[1, 10, 3]]],
+        ):
+            with self.subTest(items=str(items)[:40]):
+                with self.assertRaises(ValueError):
+                    whatif.ladders(items)
+        with self.assertRaises(ValueError):
+            whatif.grid([1] * 101, [10] * 100)
+
+    def test_scenarios_start_from_the_holding(self):
+        self.add("INFY", "BUY", 10, "100.00")
+        self.add("INFY", "SELL", 4, "120.00")
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/calculator/what-if/",
+            {"symbol": "infy", "grid": {"quantities": [2, -6], "prices": [50]}},
+            content_type="application/json",
+        )
+        data = response.json()
+        self.assertEqual(data["position"]["quantity"], 6)
+        self.assertEqual(data["results"]["quantity"], [8, 0])
+        self.assertEqual(data["results"]["avg_price"], [(520 + 100) / 8, None])
+
+
+class AveragePriceCalculatorTests(LedgerTestCase):
+    def post(self, rows):
+        self.client.force_login(self.user)
+        return self.client.post(
+            "/calculator/",
+            {
+                "stock_symbol": "infy",
+                "quantity[]": [quantity for quantity, _ in rows],
+                "price[]": [price for _, price in rows],
+            },
+        )
+
+    def test_existing_position_without_new_rows(self):
+        self.add("INFY", "BUY", 3, "100.00")
+        result = self.post([]).context["result"]
+        self.assertEqual(result["total_shares"], 3)
+        self.assertEqual(result["avg_price"], Decimal("100.00"))
+        self.assertEqual(result["capital_required"], 0)
+
+    def test_many_rows_average_in_decimal(self):
+        self.add("INFY", "BUY", 3, "100.00")
+        result = self.post([(1, "0.01")] * 25).context["result"]
+        self.assertEqual(result["total_shares"], 28)
+        self.assertEqual(result["total_cost"], Decimal("300.25"))
+        self.assertEqual(result["avg_price"], Decimal("300.25") / 28)
+        self.assertEqual(result["capital_required"], Decimal("0.25"))
+
+
+class SnapshotTests(LedgerTestCase):
+    def day(self, day):
+        return START.date() + timedelta(days=day)
+
+    def snapshot_rows(self):
+        return list(
+            PortfolioSnapshot.objects.order_by("user_id", "date").values_list(
+                "user_id", "date", "invested", "market_value", "breakdown"
+            )
+        )
+
+    def assertMatchesFullBuild(self, until):
+        incremental = self.snapshot_rows()
+        PortfolioSnapshot.objects.all().delete()
+        StaleSnapshot.objects.all().delete()
+        snapshots.build(until=self.day(until))
+        self.assertEqual(self.snapshot_rows(), incremental)
+
+    def test_builds_one_snapshot_per_day_at_closing_prices(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "SELL", 4, "120.00", day=2)
+        PriceBar.objects.create(
+            symbol="INFY", date=self.day(1), open=1, high=1, low=1, close=110
+        )
+
+        self.assertEqual(snapshots.build(until=self.day(3)), {self.user.pk: 4})
+        values = PortfolioSnapshot.objects.order_by("date").values_list(
+            "invested", "market_value"
+        )
+        self.assertEqual(
+            list(values),
+            [
+                (Decimal("1000.00"), Decimal("1000.00")),
+                (Decimal("1000.00"), Decimal("1100.00")),
+                (Decimal("520.00"), Decimal("720.00")),
+                (Decimal("520.00"), Decimal("720.00")),
+            ],
+        )
+        self.assertFalse(StaleSnapshot.objects.exists())
+
+    def test_later_builds_only_add_the_new_days(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        snapshots.build(until=self.day(3))
+        self.add("TCS", "BUY", 2, "3000.00", day=5)
+
+        self.assertEqual(snapshots.build(until=self.day(6)), {self.user.pk: 3})
+        self.assertEqual(snapshots.build(until=self.day(6)), {self.user.pk: 0})
+        self.assertMatchesFullBuild(6)
+
+    def test_backdated_writes_rebuild_from_the_stale_day(self):
+        buy = self.add("INFY", "BUY", 10, "100.00", day=0)
+        self.add("INFY", "BUY", 5, "110.00", day=4, user=self.other)
+        snapshots.build(until=self.day(6))
+        self.add("TCS", "BUY", 2, "3000.00", day=2)
+        self.edit(buy, quantity=20)
+
+        self.assertEqual(StaleSnapshot.objects.get().since, self.day(0))
+        self.assertEqual(
+            snapshots.build(until=self.day(6)), {self.user.pk: 7, self.other.pk: 0}
+        )
+        self.assertFalse(StaleSnapshot.objects.exists())
+        self.assertMatchesFullBuild(6)
+
+    def test_emptied_ledgers_drop_their_snapshots(self):
+        buy = self.add("INFY", "BUY", 10, "100.00", day=0)
+        snapshots.build(until=self.day(2))
+        self.delete(buy)
+
+        self.assertEqual(snapshots.build(until=self.day(2)), {})
+        self.assertFalse(PortfolioSnapshot.objects.exists())
+
+    def test_security_rename_rebuilds_breakdowns(self):
+        self.add("WIPRO", "BUY", 1, "400.00", day=0)
+        self.add("INFY", "BUY", 10, "100.00", day=2)
+        snapshots.build(until=self.day(3))
+        Job.objects.all().delete()
+        security = securities.get("INFY")
+        self.client.force_login(User.objects.create_superuser("admin"))
+        self.client.post(
+            f"/admin/stocks/security/{security.pk}/change/",
+            {"symbol": "INFOSYS", "name": "", "exchange": "", "isin": ""},
+        )
+
+        self.assertEqual(StaleSnapshot.objects.get().since, self.day(2))
+        self.assertEqual(Job.objects.get().user_id, self.user.pk)
+        snapshots.build(until=self.day(3))
+        breakdown = PortfolioSnapshot.objects.get(date=self.day(3)).breakdown
+        self.assertEqual(sorted(breakdown), ["INFOSYS", "WIPRO"])
+        self.assertMatchesFullBuild(3)
+
+    def test_a_concurrent_build_of_the_same_days_is_overwritten(self):
+        self.add("INFY", "BUY", 10, "100.00", day=0)
+        replay = snapshots._replay
+
+        def racing(user_id, start, end, state):
+            # Another worker commits the same days while this one replays.
+            rows = replay(user_id, start, end, copy.deepcopy(state))
+            PortfolioSnapshot.objects.bulk_create(list(rows))
+            yield from replay(user_id, start, end, state)
+
+        with mock.patch("stocks.snapshots._replay", racing):
+            self.assertEqual(snapshots.build(until=self.day(2)), {self.user.pk: 3})
+        self.assertMatchesFullBuild(2)
+
+
+class KeysetPaginationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        # Several rows share each date, so pages must break ties on id.
+        for index in range(23):
+            self.add(SYMBOLS[index % 3], "BUY", index + 1, "100.00", day=index // 4)
+        self.transactions = StockTransaction.objects.filter(user=self.user)
+        self.ordering = ["-transaction_date", "-id"]
+
+    def paginator(self, ordering=None):
+        return KeysetPaginator(self.transactions, ordering or self.ordering, 5)
+
+    def walk(self, paginator):
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return pages
+
+    def test_pages_cover_the_ordering_once(self):
+        pages = self.walk(self.paginator())
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual(
+            [trans.pk for page in pages for trans in page],
+            list(
+                self.transactions.order_by(*self.ordering).values_list("pk", flat=True)
+            ),
+        )
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(all(page.has_previous() for page in pages[1:]))
+
+    def test_previous_cursors_return_the_same_pages(self):
+        paginator = self.paginator()
+        pages = self.walk(paginator)
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_cursors_through_a_relation(self):
+        ordering = ["security__symbol", "-id"]
+        pages = self.walk(self.paginator(ordering))
+        self.assertEqual(
+            [trans.pk for page in pages for trans in page],
+            list(self.transactions.order_by(*ordering).values_list("pk", flat=True)),
+        )
+
+    def test_invalid_cursors_fall_back_to_the_first_page(self):
+        paginator = self.paginator()
+        first = list(paginator.get_page())
+
+        def encode(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        for bad in (
+            "!!!",
+            encode([]),
+            encode({"d": "x", "k": ["2024-01-02T10:00:00+00:00", "3"]}),
+            encode({"d": "n", "k": ["2024-01-02T10:00:00+00:00"]}),
+            encode({"d": "n", "k": ["yesterday", "3"]}),
+        ):
+            with self.subTest(cursor=bad):
+                self.assertIsNone(paginator.decode_cursor(bad))
+                self.assertEqual(list(paginator.get_page(bad)), first)
+
+    def test_holdings_pages_follow_their_cursors(self):
+        for symbol in ("ACC", "BEL", "CIPLA", "DLF", "ITC", "LT", "MRF", "SBIN"):
+            self.add(symbol, "BUY", 1, "10.00")
+        self.client.force_login(self.user)
+        symbols = []
+        cursor = ""
+        while cursor is not None:
+            page = self.client.get("/transaction/", {"cursor": cursor}).context[
+                "page_obj"
+            ]
+            symbols += [position["symbol"] for position in page]
+            cursor = page.next_cursor
+        self.assertEqual(symbols, sorted(symbols))
+        self.assertEqual(len(symbols), 11)
+
+    def test_transform_gets_the_whole_page(self):
+        paginator = KeysetPaginator(
+            self.transactions,
+            self.ordering,
+            5,
+            transform=lambda items: [len(items)] * len(items),
+        )
+        self.assertEqual(list(paginator.get_page()), [5] * 5)
+
+
+class DashboardCacheTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.computed = []
+
+    def cached(self, user, value, *parts):
+        def compute():
+            self.computed.append(value)
+            return value
+
+        return caching.cached(user, "summary", compute, *parts)
+
+    def test_values_are_computed_once_per_key(self):
+        self.assertEqual(self.cached(self.user, 1), 1)
+        self.assertEqual(self.cached(self.user, 2), 1)
+        self.assertEqual(self.cached(self.user, 3, "page-2"), 3)
+        self.assertEqual(self.cached(self.other, 4), 4)
+        self.assertEqual(self.computed, [1, 3, 4])
+
+    def test_writes_invalidate_their_user_after_commit(self):
+        self.cached(self.user, 1)
+        self.cached(self.other, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add("INFY", "BUY", 1, "10.00")
+            # Until the write commits, readers keep the old entry.
+            self.assertEqual(self.cached(self.user, 2), 1)
+        self.assertEqual(self.cached(self.user, 3), 3)
+        self.assertEqual(self.cached(self.other, 4), 1)
+
+    def test_rolled_back_writes_keep_the_cache(self):
+        self.cached(self.user, 1)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    self.add("INFY", "BUY", 1, "10.00")
+                    raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.cached(self.user, 2), 1)
+
+    def test_invalidate_all_reaches_every_user(self):
+        self.cached(self.user, 1)
+        self.cached(self.other, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.invalidate_all()
+        self.assertEqual(self.cached(self.user, 2), 2)
+        self.assertEqual(self.cached(self.other, 3), 3)
+
+    def test_async_entries_share_the_versions(self):
+        async def compute():
+            return "async"
+
+        self.assertEqual(
+            async_to_sync(caching.acached)(self.user, "summary", compute), "async"
+        )
+        self.assertEqual(self.cached(self.user, "sync"), "async")
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.invalidate(self.user.pk)
+        self.assertEqual(
+            async_to_sync(caching.acached)(self.user, "summary", compute), "async"
+        )
+        self.assertEqual(self.computed, [])
+
+    def test_home_shows_a_new_transaction(self):
+        self.client.force_login(self.user)
+        self.add("INFY", "BUY", 1, "10.00")
+        self.assertEqual(
+            len(self.client.get("/home/").context["recent_transactions"]), 1
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add("TCS", "BUY", 1, "10.00")
+        recent = self.client.get("/home/").context["recent_transactions"]
+        self.assertEqual(len(recent), 2)
+        with self.assertNumQueries(2):
+            # Only the session and the user; the summary is cached.
+            self.client.get("/home/")
+
+
+class LedgerGeneratorTests(TestCase):
+    def test_the_same_seed_gives_the_same_rows(self):
+        first = synthetic.LedgerGenerator(seed=3)
+        second = synthetic.LedgerGenerator(seed=3)
+        rows = list(first.rows("bench_user_0", 200))
+        self.assertEqual(list(second.rows("bench_user_0", 200)), rows)
+        self.assertNotEqual(
+            list(synthetic.LedgerGenerator(seed=4).rows("bench_user_0", 200)), rows
+        )
+
+    def test_sells_never_exceed_the_position(self):
+        generator = synthetic.LedgerGenerator(symbols=5, sell_ratio=0.6, seed=1)
+        held = {}
+        dates = []
+        for date, symbol, trans_type, quantity, price in generator.rows(
+            "bench_user_0", 2000
+        ):
+            held[symbol] = held.get(symbol, 0) + (
+                quantity if trans_type == "BUY" else -quantity
+            )
+            self.assertGreaterEqual(held[symbol], 0)
+            self.assertGreater(price, 0)
+            dates.append(date)
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(
+            held, {s: q for s, q in generator.held["bench_user_0"].items()}
+        )
+
+    def test_grow_extends_every_ledger(self):
+        generator = synthetic.LedgerGenerator(users=2, symbols=4, seed=5)
+        users = generator.grow(30)
+        generator.grow(50)
+        generator.grow(40)
+        for user in users:
+            self.assertEqual(StockTransaction.objects.filter(user=user).count(), 50)
+        self.assertEqual(holdings.verify(), [])
+        self.assertEqual(lots.verify(), [])
+        self.assertFalse(Holding.objects.filter(quantity__lt=0).exists())
+
+    def test_csv_files_import_cleanly(self):
+        generator = synthetic.LedgerGenerator(seed=6)
+        with tempfile.TemporaryDirectory() as directory:
+            path = generator.write_csv(Path(directory, "bench.csv"), 100)
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(importer.read_rows(f))
+        self.assertEqual(len(rows), 100)
+        self.assertEqual([error for _, _, error in rows if error], [])
+
+
+class IndianCurrencyTests(TestCase):
+    def test_groups_lakhs_and_crores(self):
+        for number, expected in (
+            (0, "0"),
+            (999, "999"),
+            (1000, "1,000"),
+            (123456, "1,23,456"),
+            (12345678, "1,23,45,678"),
+            (Decimal("1234567.8915"), "12,34,567.892"),
+            (Decimal("12345.6785"), "12,345.678"),
+            (Decimal("-1234.50"), "-1,234.5"),
+            (Decimal("0.0005"), "0"),
+        ):
+            with self.subTest(number=number):
+                self.assertEqual(custom_filter.indian_number(number), expected)
+
+    def test_matches_babel(self):
+        rng = random.Random(20)
+        numbers = [Decimal("NaN"), Decimal("Infinity"), 1e21, -0.0, 2.5]
+        for _ in range(2000):
+            digits = rng.randint(1, 16)
+            places = rng.randint(0, 5)
+            numbers.append(
+                Decimal(rng.randrange(-(10**digits), 10**digits)).scaleb(-places)
+            )
+            numbers.append(rng.uniform(-1e9, 1e9))
+        for number in numbers:
+            self.assertEqual(
+                custom_filter.indian_number(number),
+                custom_filter.babel_indian_number(number),
+                number,
+            )
+
+    def test_filter_handles_empty_and_invalid_values(self):
+        fmt = custom_filter.format_indian_currency
+        self.assertEqual(fmt(Decimal("150000.25")), "₹1,50,000.25")
+        self.assertEqual(fmt(None), "₹0")
+        self.assertEqual(fmt(float("nan")), "₹0")
+        self.assertEqual(fmt("abc"), "-")
+
+
+class TransactionAdminTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(12):
+            self.add(SYMBOLS[index % 3], "BUY", 1, "10.00", day=index * 20)
+        self.add("INFY", "BUY", 1, "10.00", day=3, user=self.other)
+        self.transactions = StockTransaction.objects.order_by("-id")
+
+    def count(self, queryset, limit=5):
+        with mock.patch.object(EstimatedCountPaginator, "exact_limit", limit):
+            return EstimatedCountPaginator(queryset, 2).count
+
+    def test_counts_exactly_up_to_the_limit(self):
+        self.assertEqual(self.count(self.transactions, limit=20), 13)
+        self.assertEqual(self.count(self.transactions.filter(user=self.user)), 5)
+        # Without statistics an unfiltered list falls back to COUNT(*).
+        self.assertEqual(self.count(self.transactions.all()), 13)
+
+    def test_uses_the_analyze_estimate_past_the_limit(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '5000' || substr(stat, instr(stat, ' '))"
+                " WHERE tbl = %s",
+                [StockTransaction._meta.db_table],
+            )
+        self.assertEqual(self.count(self.transactions.all()), 5000)
+
+    def test_date_buckets_match_the_orm(self):
+        dates = stocks_admin.IndexedDates(self.transactions, "transaction_date")
+        for kind in ("year", "month", "day"):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    dates.datetimes("transaction_date", kind),
+                    list(self.transactions.datetimes("transaction_date", kind)),
+                )
+        self.assertEqual(
+            stocks_admin.IndexedDates(
+                StockTransaction.objects.none(), "transaction_date"
+            ).datetimes("transaction_date", "month"),
+            [],
+        )
+
+    def test_changelist_filters_by_username_and_symbol(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        url = "/admin/stocks/stocktransaction/"
+        response = self.client.get(url, {"username": "trader", "symbol": "infy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 4)
+        response = self.client.get(
+            url, {"transaction_date__year": "2024", "transaction_date__month": "1"}
+        )
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+    def test_admin_form_adds_for_a_username(self):
+        form = forms.AdminStockTransactionForm(
+            {
+                "user_id": "other",
+                "stock_symbol": "tcs",
+                "transaction_type": "BUY",
+                "quantity": 3,
+                "price_per_share": "3000.00",
+            }
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["user_id"], self.other)
+        form = forms.AdminStockTransactionForm({"user_id": "nobody"})
+        self.assertFalse(form.is_valid())
+        self.assertIn("user_id", form.errors)
+
+
+class JobQueueTests(LedgerTestCase):
+    def due(self):
+        # Skips the coalescing delay.
+        Job.objects.filter(status="QUEUED").update(run_after=timezone.now())
+
+    def test_writes_coalesce_into_one_queued_job(self):
+        self.add("INFY", "BUY", 1, "10.00")
+        self.add("TCS", "BUY", 1, "10.00")
+        self.bulk_add([("INFY", "BUY", 1, "10.00"), ("WIPRO", "BUY", 2, "20.00")])
+        self.add("INFY", "BUY", 1, "10.00", user=self.other)
+
+        queued = Job.objects.filter(status="QUEUED").order_by("user_id")
+        self.assertEqual(
+            list(queued.values_list("kind", "user_id")),
+            [(jobs.SNAPSHOTS, self.user.pk), (jobs.SNAPSHOTS, self.other.pk)],
+        )
+
+        # Not due until the coalescing delay has passed.
+        Job.objects.all().delete()
+        jobs.enqueue(jobs.SNAPSHOTS, [self.user.pk])
+        self.assertIsNone(jobs.claim())
+
+    def test_a_write_during_a_run_queues_another_job(self):
+        self.add("INFY", "BUY", 1, "10.00")
+        self.due()
+        job = jobs.claim()
+        self.assertEqual((job.status, job.attempts), ("RUNNING", 1))
+        self.assertIsNone(jobs.claim())
+        self.add("TCS", "BUY", 1, "10.00")
+
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "DONE")
+        self.assertTrue(PortfolioSnapshot.objects.exists())
+        self.assertEqual(Job.objects.filter(status="QUEUED").count(), 1)
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        self.add("INFY", "BUY", 1, "10.00")
+        with mock.patch("stocks.snapshots.build", side_effect=RuntimeError("boom")):
+            for attempt in range(1, jobs.MAX_ATTEMPTS[jobs.SNAPSHOTS] + 1):
+                self.due()
+                started = timezone.now()
+                job = jobs.claim()
+                self.assertEqual(job.attempts, attempt)
+                self.assertFalse(jobs.run(job))
+                job.refresh_from_db()
+                self.assertIn("boom", job.error)
+                if job.status == "QUEUED":
+                    self.assertGreaterEqual(
+                        job.run_after - started,
+                        jobs.RETRY_DELAY * 2 ** (attempt - 1),
+                    )
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(job.attempts, jobs.MAX_ATTEMPTS[jobs.SNAPSHOTS])
+
+    def test_a_retry_defers_to_a_newer_queued_job(self):
+        self.add("INFY", "BUY", 1, "10.00")
+        self.due()
+        job = jobs.claim()
+        self.add("TCS", "BUY", 1, "10.00")
+        jobs.fail(job, "boom")
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "FAILED")
+        self.assertEqual(Job.objects.filter(status="QUEUED").count(), 1)
+
+    def test_imports_are_not_retried(self):
+        jobs.enqueue(jobs.IMPORT, [self.user.pk], key="/missing.csv")
+        self.due()
+        job = jobs.claim()
+        self.assertFalse(jobs.run(job))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "FAILED")
+
+    def test_recover_and_purge(self):
+        self.add("INFY", "BUY", 1, "10.00")
+        self.due()
+        job = jobs.claim()
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - jobs.LEASE - timedelta(minutes=1)
+        )
+        self.assertEqual(jobs.recover(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, "QUEUED")
+
+        Job.objects.update(
+            status="DONE", finished_at=timezone.now() - timedelta(days=8)
+        )
+        self.assertEqual(jobs.purge(7), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_jobs_once_and_the_status_page(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "trades.csv")
+            path.write_text(
+                "Stock symbol,Price per share,Transaction Type,Quantity\n"
+                "AAA,10,BUY,1\n"
+            )
+            call_command(
+                "fetch_stocks", str(path), user="trader", queue=True, stdout=StringIO()
+            )
+            out = StringIO()
+            call_command("run_jobs", once=True, stdout=out)
+        self.assertIn("1 jobs done, 0 failed", out.getvalue())
+        self.assertEqual(StockTransaction.objects.get().security.symbol, "AAA")
 
-# Create your tests here.
+        self.client.force_login(self.other)
+        self.assertEqual(list(self.client.get("/jobs/").context["jobs"]), [])
+        self.client.force_login(self.user)
+        kinds = [job.kind for job in self.client.get("/jobs/").context["jobs"]]
+        self.assertEqual(sorted(kinds), [jobs.IMPORT, jobs.SNAPSHOTS])
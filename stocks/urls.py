@@ -5,13 +5,28 @@ from . import views
 urlpatterns = [
     path("home/", views.home, name="home"),
     path("portfolio/", views.portfolio, name="portfolio"),
+    path("home/async/", views.home_async, name="home_async"),
+    path("portfolio/async/", views.portfolio_async, name="portfolio_async"),
+    path("portfolio/chart-data/", views.chart_data, name="chart_data"),
+    path("portfolio/history/", views.portfolio_history, name="portfolio_history"),
     path("transaction/", views.transactions_list, name="transactions-list"),
     path("transaction/add/", views.add_transaction, name="add-transaction"),
+    path("transaction/export/", views.export_transactions, name="export_transactions"),
+    path("holdings/export/", views.export_holdings, name="export_holdings"),
+    path(
+        "api/transactions/batch/",
+        views.ingest_transactions,
+        name="ingest_transactions",
+    ),
     path("", views.user_login, name="login"),
     path("logout/", views.user_logout, name="logout"),
     path("signup/", views.signup, name="signup"),
     path("calculator/", views.avg_price_calculator, name="avg_price_calculator"),
+    path("calculator/what-if/", views.what_if, name="what_if"),
     path("search/", views.search_transactions, name="search_transactions"),
+    path("search/export/", views.export_search, name="export_search"),
+    path("performance/", views.performance_stats, name="performance_stats"),
+    path("jobs/", views.job_status, name="job_status"),
     path("transaction/<int:pk>/edit/", views.edit_transaction, name="edit_transaction"),
     path(
         "transaction/<int:pk>/delete/",
@@ -1,262 +1,267 @@
+import asyncio
 import json
-from collections import defaultdict
 from decimal import Decimal
+from functools import wraps
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.db.models import Case, DecimalField, F, IntegerField, Max, Q, Sum, When
+from django.contrib.auth.views import redirect_to_login
+from django.db import connections
+from django.db.models import Count, F
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_POST
+
+from stocks import (
+    caching,
+    charts,
+    exports,
+    holdings,
+    ingest,
+    ledger,
+    performance,
+    search,
+    securities,
+    snapshots,
+    whatif,
+)
 from stocks.forms import (
     AdminStockTransactionForm,
     LoginForm,
     SignUpForm,
     StockTransactionForm,
 )
-from stocks.models import StockTransaction
+from stocks.models import Job, StockTransaction
+from stocks.pagination import KeysetPaginator
+
+CHART_POINTS = 120
+CHART_MAX_POINTS = 1000
+CHART_MAX_SYMBOLS = 20
+JOB_PAGE_SIZE = 100
+
+
+def async_login_required(view):
+    # login_required for async views; the user is loaded from the session on
+    # a thread.
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _in_thread(func):
+    # Runs blocking ORM or NumPy work on a worker thread of its own so
+    # independent queries overlap; the thread's connection is closed after.
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def _alist(queryset):
+    return [item async for item in queryset]
+
+
+def _portfolio_page(user, cursor):
+    return KeysetPaginator(
+        holdings.open_holdings(user),
+        ["symbol"],
+        transform=holdings.valued,
+    ).get_page(cursor)
+
+
+def _portfolio_totals(user):
+    positions = holdings.market_positions(user)
+    return {
+        "total_value": positions.total_value(),
+        "top_10_stocks": positions.rows(positions.top(10)),
+    }
+
+
+def _portfolio_summary(user, cursor):
+    return {"page_obj": _portfolio_page(user, cursor), **_portfolio_totals(user)}
+
+
+async def _aportfolio_summary(user, cursor):
+    page_obj, totals = await asyncio.gather(
+        _in_thread(_portfolio_page)(user, cursor),
+        _in_thread(_portfolio_totals)(user),
+    )
+    return {"page_obj": page_obj, **totals}
 
 
 @login_required
 def portfolio(request):
-    transactions = StockTransaction.objects.filter(user=request.user).select_related('user').order_by('transaction_date')
-
-    portfolio_data = transactions.values('stock_symbol').annotate(
-        total_quantity=Sum(
-            Case(
-                When(transaction_type='BUY', then=F('quantity')),
-                When(transaction_type='SELL', then=-F('quantity')),
-                output_field=IntegerField(),
-                default=0
-            )
-        ),
-        total_cost=Sum(
-            Case(
-                When(transaction_type='BUY', then=F('quantity') * F('price_per_share')),
-                When(transaction_type='SELL', then=-F('quantity') * F('price_per_share')),
-                output_field=DecimalField(),
-                default=Decimal("0.00")
-            )
-        ),
-        latest_price=Max('price_per_share'),
-        latest_date=Max('transaction_date'),
-        latest_pk=Max('id')
-    ).filter(total_quantity__gt=0)
-
-    portfolio = []
-    total_value = Decimal("0.00")
-    for data in portfolio_data:
-        avg_price = data['total_cost'] / data['total_quantity'] if data['total_quantity'] > 0 else Decimal("0.00")
-        percent_change = (
-            ((data['latest_price'] - avg_price) / avg_price * 100)
-            if avg_price > 0 else Decimal("0.00")
-        )
-        portfolio.append({
-            "symbol": data['stock_symbol'],
-            "quantity": data['total_quantity'],
-            "avg_price": avg_price,
-            "latest_price": data['latest_price'],
-            "total_value": data['total_quantity'] * data['latest_price'],
-            "percent_change": percent_change,
-            "latest_pk": data['latest_pk'],
-        })
-        total_value += data['total_quantity'] * data['latest_price']
-
-    top_10_stocks = sorted(portfolio, key=lambda x: x['percent_change'], reverse=True)[:10]
-    top_10_symbols = [stock['symbol'] for stock in top_10_stocks]
-
-    transactions_json = [
-        {
-            "stock_symbol": trans.stock_symbol,
-            "price_per_share": float(trans.price_per_share),
-            "transaction_date": trans.transaction_date.strftime('%Y-%m-%d'),
-        }
-        for trans in transactions if not top_10_symbols or trans.stock_symbol in top_10_symbols
-    ]
-    paginator = Paginator(portfolio, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get("cursor") or ""
+    context = caching.cached(
+        request.user,
+        "portfolio",
+        lambda: _portfolio_summary(request.user, cursor),
+        cursor,
+    )
+    chart_symbols = ",".join(stock["symbol"] for stock in context["top_10_stocks"])
 
     return render(
-        request,
-        "portfolio.html",
-        {
-            "page_obj": page_obj,
-            "total_value": total_value,
-            "top_10_stocks": top_10_stocks,
-            "transactions_json": json.dumps(transactions_json),
-        }
+        request, "portfolio.html", {**context, "chart_symbols": chart_symbols}
     )
 
 
-@login_required
-def home(request):
-    portfolio = {}
-    total_value = Decimal("0.00")
-    recent_transactions = []
-    top_performer = None
-    worst_performer = None
-    transactions_json = []
+@async_login_required
+async def portfolio_async(request):
+    cursor = request.GET.get("cursor") or ""
+    context = await caching.acached(
+        request.user,
+        "portfolio",
+        lambda: _aportfolio_summary(request.user, cursor),
+        cursor,
+    )
+    chart_symbols = ",".join(stock["symbol"] for stock in context["top_10_stocks"])
 
-    if request.user.is_authenticated:
-        # Fetch transactions
-        transactions = StockTransaction.objects.filter(user=request.user).order_by(
-            "transaction_date"
-        )
-        recent_transactions = transactions.order_by("-transaction_date")[:5].annotate(
-            total_cost=F("quantity") * F("price_per_share")
-        )
+    return await sync_to_async(render)(
+        request, "portfolio.html", {**context, "chart_symbols": chart_symbols}
+    )
 
-        # Prepare transactions for Chart.js
-        transactions_json = [
-            {
-                "stock_symbol": trans.stock_symbol,
-                "price_per_share": float(trans.price_per_share),
-                "transaction_date": trans.transaction_date.isoformat(),
-            }
-            for trans in transactions
-        ]
 
-        # Calculate portfolio
-        for trans in transactions:
-            symbol = trans.stock_symbol
-            if symbol not in portfolio:
-                portfolio[symbol] = {
-                    "quantity": 0,
-                    "total_cost": Decimal("0.00"),
-                    "latest_price": trans.price_per_share,
-                }
+def _parse_day(value):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
 
-            if trans.transaction_type == "BUY":
-                portfolio[symbol]["quantity"] += trans.quantity
-                portfolio[symbol]["total_cost"] += (
-                    trans.quantity * trans.price_per_share
-                )
-            else:  # SELL
-                portfolio[symbol]["quantity"] -= trans.quantity
-                portfolio[symbol]["total_cost"] -= (
-                    trans.quantity * trans.price_per_share
-                )
-            portfolio[symbol]["latest_price"] = trans.price_per_share
-
-        # Calculate average prices and performance
-        for symbol, data in list(portfolio.items()):
-            if data["quantity"] > 0:
-                data["avg_price"] = data["total_cost"] / data["quantity"]
-                total_value += data["quantity"] * data["latest_price"]
-                # Calculate percentage gain/loss
-                if data["avg_price"] > 0:
-                    data["percent_change"] = (
-                        (data["latest_price"] - data["avg_price"]) / data["avg_price"]
-                    ) * 100
-                else:
-                    data["percent_change"] = Decimal("0.00")
-            else:
-                del portfolio[symbol]
 
-        # Identify top and worst performers
-        if portfolio:
-            top_performer = max(
-                portfolio.items(), key=lambda x: x[1]["percent_change"], default=None
-            )
-            worst_performer = min(
-                portfolio.items(), key=lambda x: x[1]["percent_change"], default=None
-            )
-            if top_performer:
-                top_performer = {
-                    "symbol": top_performer[0],
-                    "gain_percent": (
-                        top_performer[1]["percent_change"]
-                        if top_performer[1]["percent_change"] > 0
-                        else None
-                    ),
-                    "avg_price": top_performer[1]["avg_price"],
-                    "current_price": top_performer[1]["latest_price"],
-                }
-            if worst_performer:
-                worst_performer = {
-                    "symbol": worst_performer[0],
-                    "loss_percent": (
-                        abs(worst_performer[1]["percent_change"])
-                        if worst_performer[1]["percent_change"] < 0
-                        else None
-                    ),
-                    "avg_price": worst_performer[1]["avg_price"],
-                    "current_price": worst_performer[1]["latest_price"],
-                }
+@login_required
+def chart_data(request):
+    try:
+        start = _parse_day(request.GET.get("start"))
+        end = _parse_day(request.GET.get("end"))
+        points = int(request.GET.get("points", CHART_POINTS))
+    except ValueError:
+        return JsonResponse(
+            {"error": "Use YYYY-MM-DD dates and an integer point count."}, status=400
+        )
+    points = min(max(points, 1), CHART_MAX_POINTS)
 
-    return render(
-        request,
-        "home.html",
-        {
-            "portfolio": portfolio,
-            "total_value": total_value,
-            "recent_transactions": recent_transactions,
-            "top_performer": top_performer,
-            "worst_performer": worst_performer,
-            "transactions_json": json.dumps(transactions_json),
-        },
-    )
+    symbols = [
+        symbol.strip().upper()
+        for symbol in request.GET.get("symbols", "").split(",")
+        if symbol.strip()
+    ][:CHART_MAX_SYMBOLS]
+    if not symbols:
+        symbols = [stock["symbol"] for stock in holdings.top_positions(request.user)]
+
+    bucket, series = charts.price_series(request.user, symbols, start, end, points)
+    return JsonResponse({"bucket": bucket, "series": series})
 
 
 @login_required
-def transactions_list(request):
-    transactions = StockTransaction.objects.filter(user=request.user)
-    portfolio = defaultdict(
-        lambda: {
-            "quantity": 0,
-            "total_cost": Decimal("0.00"),
-            "latest_transaction": None,
-        }
+def portfolio_history(request):
+    # Daily invested amount and market value from the snapshots written by the
+    # snapshots job or build_snapshots; one row per day whatever the size of
+    # the ledger.
+    try:
+        start = _parse_day(request.GET.get("start"))
+        end = _parse_day(request.GET.get("end"))
+    except ValueError:
+        return JsonResponse({"error": "Use YYYY-MM-DD dates."}, status=400)
+    return JsonResponse({"series": snapshots.history(request.user, start, end)})
+
+
+def _recent_transactions(user):
+    return (
+        StockTransaction.objects.filter(user=user)
+        .select_related("security")
+        .order_by("-transaction_date")[:5]
+        .annotate(total_cost=F("quantity") * F("price_per_share"))
     )
 
-    for trans in transactions:
-        data = portfolio[trans.stock_symbol]
-
-        if trans.transaction_type == "BUY":
-            data["quantity"] += trans.quantity
-            data["total_cost"] += trans.quantity * trans.price_per_share
-        else:  # SELL
-            data["quantity"] -= trans.quantity
-            data["total_cost"] -= trans.quantity * trans.price_per_share
-
-        # Track the latest transaction ID
-        if (
-            data["latest_transaction"] is None
-            or trans.transaction_date > data["latest_transaction"].transaction_date
-        ):
-            data["latest_transaction"] = trans
-
-    # Finalize the data
-    for symbol, data in portfolio.items():
-        if data["quantity"] > 0:
-            data["avg_price"] = data["total_cost"] / data["quantity"]
-        else:
-            data["avg_price"] = Decimal("0.00")
-            data["quantity"] = 0
-
-    # Filter only stocks with quantity > 0
-    portfolio = {
-        symbol: {
-            "symbol": symbol,
-            "quantity": data["quantity"],
-            "avg_price": data["avg_price"],
-            "latest_pk": (
-                data["latest_transaction"].pk if data["latest_transaction"] else None
+
+def _performers(user):
+    top_performer = None
+    worst_performer = None
+
+    # Totals and performers computed column-wise from the materialized holdings
+    # at market prices
+    positions = holdings.market_positions(user)
+    total_value = positions.total_value()
+
+    if len(positions):
+        percent_change = positions.percent_change()
+        top = positions.row(int(percent_change.argmax()))
+        worst = positions.row(int(percent_change.argmin()))
+        top_performer = {
+            "symbol": top["symbol"],
+            "gain_percent": (
+                top["percent_change"] if top["percent_change"] > 0 else None
             ),
+            "avg_price": top["avg_price"],
+            "current_price": top["latest_price"],
         }
-        for symbol, data in portfolio.items()
-        if data["quantity"] > 0
+        worst_performer = {
+            "symbol": worst["symbol"],
+            "loss_percent": (
+                abs(worst["percent_change"]) if worst["percent_change"] < 0 else None
+            ),
+            "avg_price": worst["avg_price"],
+            "current_price": worst["latest_price"],
+        }
+
+    return {
+        "total_value": total_value,
+        "top_performer": top_performer,
+        "worst_performer": worst_performer,
     }
 
-    # Convert to list for pagination
-    portfolio_list = list(portfolio.values())
 
-    paginator = Paginator(portfolio_list, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+def _home_summary(user):
+    return {
+        "recent_transactions": list(_recent_transactions(user)),
+        **_performers(user),
+    }
+
+
+async def _ahome_summary(user):
+    recent_transactions, performers = await asyncio.gather(
+        _alist(_recent_transactions(user)),
+        _in_thread(_performers)(user),
+    )
+    return {"recent_transactions": recent_transactions, **performers}
+
+
+@login_required
+def home(request):
+    context = caching.cached(request.user, "home", lambda: _home_summary(request.user))
+    return render(request, "home.html", context)
+
+
+@async_login_required
+async def home_async(request):
+    context = await caching.acached(
+        request.user, "home", lambda: _ahome_summary(request.user)
+    )
+    return await sync_to_async(render)(request, "home.html", context)
+
+
+@login_required
+def transactions_list(request):
+    page_obj = KeysetPaginator(
+        holdings.open_holdings(request.user),
+        ["symbol"],
+        transform=holdings.valued,
+    ).get_page(request.GET.get("cursor"))
 
     return render(request, "transactions.html", {"page_obj": page_obj})
 
@@ -286,8 +291,7 @@ def add_transaction(request):
                 messages.error(request, "Quantity and price must be positive.")
                 return redirect("add-transaction")
 
-            transaction.stock_symbol = transaction.stock_symbol.upper()
-            transaction.save()
+            ledger.add(transaction)
             messages.success(request, "Transaction added successfully.")
             return redirect("portfolio")
         else:
@@ -302,7 +306,7 @@ def edit_transaction(request, pk):
     if request.method == "POST":
         form = StockTransactionForm(request.POST, instance=transaction)
         if form.is_valid():
-            form.save()
+            ledger.update(form.save(commit=False))
             messages.success(request, "Transaction updated successfully.")
             return redirect("transactions-list")
     else:
@@ -316,7 +320,7 @@ def edit_transaction(request, pk):
 @login_required
 def delete_transaction(request, pk):
     transaction = get_object_or_404(StockTransaction, pk=pk)
-    transaction.delete()
+    ledger.delete(transaction)
     messages.success(request, "Transaction deleted successfully.")
     return redirect("portfolio")
 
@@ -379,76 +383,56 @@ def signup(request):
 @login_required
 def avg_price_calculator(request):
     result = None
-    existing_shares = None
-    existing_total_shares = 0
-    existing_total_cost = Decimal("0.00")
+    existing = None
     stock_symbol = ""
 
     if request.method == "POST":
-        stock_symbol = request.POST.get("stock_symbol").upper()
+        stock_symbol = securities.normalize(request.POST.get("stock_symbol"))
         quantities = request.POST.getlist("quantity[]")
         prices = request.POST.getlist("price[]")
 
-        # Fetch existing buy transactions for the stock symbol
-        buy_transactions = (
-            StockTransaction.objects.filter(
-                user=request.user, stock_symbol=stock_symbol, transaction_type="BUY"
-            )
-            .values("quantity", "price_per_share")
-            .annotate(total_cost=F("quantity") * F("price_per_share"))
-        )
-
-        existing_shares = [
-            {
-                "quantity": trans["quantity"],
-                "price_per_share": trans["price_per_share"],
-                "total_cost": trans["total_cost"],
+        # The open position as the dashboard shows it, SELLs included.
+        quantity, cost = whatif.position(request.user, stock_symbol)
+        if quantity:
+            existing = {
+                "quantity": quantity,
+                "total_cost": cost,
+                "avg_price": cost / quantity,
             }
-            for trans in buy_transactions
-        ]
-
-        for trans in buy_transactions:
-            existing_total_shares += trans["quantity"]
-            existing_total_cost += trans["total_cost"]
 
         try:
-            total_shares = existing_total_shares
-            total_cost = existing_total_cost
-
-            # Process new transactions
-            for qty, price in zip(quantities, prices):
-                qty = int(qty)
-                price = Decimal(price)
-                if qty <= 0 or price <= 0:
-                    messages.error(request, "Quantity and price must be positive.")
-                    return redirect("avg_price_calculator")
-                total_shares += qty
-                total_cost += qty * price
-
+            steps = [
+                (int(qty), Decimal(price)) for qty, price in zip(quantities, prices)
+            ]
+            if any(qty <= 0 or price <= 0 for qty, price in steps):
+                messages.error(request, "Quantity and price must be positive.")
+                return redirect("avg_price_calculator")
+            # The form only adds BUYs, so the capital is their total.
+            capital = sum((qty * price for qty, price in steps), Decimal("0.00"))
+        except (ValueError, TypeError, ArithmeticError):
+            messages.error(request, "Please enter valid quantities and prices.")
+        else:
+            total_shares = quantity + sum(qty for qty, _ in steps)
             if total_shares > 0:
-                avg_price = total_cost / total_shares
                 result = {
                     "stock_symbol": stock_symbol,
                     "total_shares": total_shares,
-                    "total_cost": total_cost,
-                    "avg_price": avg_price,
+                    "total_cost": cost + capital,
+                    "avg_price": (cost + capital) / total_shares,
+                    "capital_required": capital,
                 }
             else:
                 messages.error(
                     request,
                     "At least one valid transaction or existing share is required.",
                 )
-        except (ValueError, TypeError):
-            messages.error(request, "Please enter valid quantities and prices.")
 
     return render(
         request,
         "avg_price_calculator.html",
         {
             "result": result,
-            "existing_shares": existing_shares,
-            "existing_total_shares": existing_total_shares,
-            "existing_total_cost": existing_total_cost,
+            "existing": existing,
             "stock_symbol": stock_symbol,
         },
     )
@@ -460,17 +444,133 @@ def search_transactions(request):
     transactions = []
 
     if query:
-        transactions = StockTransaction.objects.filter(
-            Q(user__username__icontains=query)
-            | Q(stock_symbol__icontains=query)
-            | Q(transaction_type__icontains=query)
-            | Q(quantity__icontains=query)
-            | Q(price_per_share__icontains=query)
-            | Q(transaction_date__icontains=query)
-        ).order_by("-transaction_date")
+        transactions = KeysetPaginator(
+            search.search(request.user, query), ["-transaction_date", "-id"]
+        ).get_page(request.GET.get("cursor"))
 
     context = {
         "transactions": transactions,
         "query": query,
     }
     return render(request, "search_results.html", context)
+
+
+def _csv_response(chunks, filename):
+    response = StreamingHttpResponse(chunks, content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_transactions(request):
+    transactions = StockTransaction.objects.filter(user=request.user).order_by(
+        "transaction_date", "id"
+    )
+    return _csv_response(exports.ledger_csv(transactions), "transactions.csv")
+
+
+@login_required
+def export_holdings(request):
+    return _csv_response(
+        exports.holdings_csv(holdings.open_holdings(request.user)), "holdings.csv"
+    )
+
+
+@login_required
+def export_search(request):
+    query = request.GET.get("q", "").strip()
+    transactions = StockTransaction.objects.none()
+    if query:
+        transactions = search.search(request.user, query)
+    return _csv_response(exports.ledger_csv(transactions), "search.csv")
+
+
+@require_POST
+def ingest_transactions(request):
+    # Session-authenticated like the rest of the site, so CSRF applies too.
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        items = json.loads(request.body)["transactions"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"error": 'Send a JSON object with a "transactions" list.'}, status=400
+        )
+    if not isinstance(items, list) or not 0 < len(items) <= ingest.MAX_ITEMS:
+        return JsonResponse(
+            {"error": f"Send between 1 and {ingest.MAX_ITEMS} transactions."},
+            status=400,
+        )
+
+    parsed, errors = ingest.validate(items)
+    if errors:
+        results = [
+            {"index": index, "status": "invalid", "error": error}
+            for index, error in errors.items()
+        ]
+        return JsonResponse({"created": 0, "results": results}, status=400)
+
+    try:
+        results = ingest.ingest(request.user, parsed)
+    except ingest.Conflict:
+        return JsonResponse(
+            {"error": "A concurrent request used the same keys; retry the batch."},
+            status=409,
+        )
+    created = sum(result["status"] == "created" for result in results)
+    return JsonResponse(
+        {"created": created, "results": results}, status=201 if created else 200
+    )
+
+
+@require_POST
+def what_if(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    try:
+        data = json.loads(request.body)
+        symbol = securities.normalize(data["symbol"])
+        grid = data.get("grid")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        symbol = None
+    if not symbol:
+        return JsonResponse(
+            {"error": 'Send a JSON object with a "symbol" and "ladders" or a "grid".'},
+            status=400,
+        )
+
+    try:
+        if isinstance(grid, dict):
+            steps = whatif.grid(grid.get("quantities"), grid.get("prices"))
+        else:
+            steps = whatif.ladders(data.get("ladders"))
+    except ValueError as error:
+        return JsonResponse({"error": f"{error}."}, status=400)
+    return JsonResponse(whatif.scenarios(request.user, symbol, *steps))
+
+
+@login_required
+def job_status(request):
+    # Recent background jobs: the user's own, or everyone's for staff.
+    queue = Job.objects.select_related("user").order_by("-created_at")
+    if not request.user.is_staff:
+        queue = queue.filter(user=request.user)
+    counts = dict(queue.order_by().values_list("status").annotate(Count("id")))
+    return render(
+        request, "jobs.html", {"jobs": queue[:JOB_PAGE_SIZE], "counts": counts}
+    )
+
+
+@staff_member_required
+def performance_stats(request):
+    if request.method == "POST":
+        performance.reset()
+        caching.reset_stats()
+        return redirect("performance_stats")
+
+    context = {
+        "views": performance.view_stats(),
+        "cache": caching.stats(),
+        "enabled": getattr(settings, "STOCKS_PERFORMANCE_ENABLED", False),
+    }
+    return render(request, "performance.html", context)
@@ -0,0 +1,161 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+
+from stocks import caching, securities
+from stocks.models import Holding
+
+MAX_SCENARIOS = 10000
+MAX_STEPS = 20
+# Keeps every ladder's paise sums well inside int64.
+MAX_QUANTITY = 10**7
+MAX_PRICE = 10**8
+
+
+def position(user, symbol):
+    # (quantity, net cost) of the open position, read from the holding the
+    # dashboard shows, so SELLs count. Cached until the user's next write.
+    def compute():
+        row = (
+            Holding.objects.filter(user=user, security__symbol=symbol)
+            .values_list("quantity", "total_cost")
+            .first()
+        )
+        if row is None or row[0] <= 0:
+            return 0, Decimal("0.00")
+        return row
+
+    return caching.cached(user, "position", compute, symbol)
+
+
+def _paise(prices):
+    return np.rint(prices * 100).astype(np.int64)
+
+
+def _steps(quantities, prices):
+    # Signed whole quantities (BUYs positive, SELLs negative) and positive
+    # prices within the limits; raises ValueError.
+    if not np.all(np.isfinite(quantities)) or np.any(quantities != np.rint(quantities)):
+        raise ValueError("Quantities must be whole numbers")
+    if np.any(np.abs(quantities) > MAX_QUANTITY):
+        raise ValueError(f"Quantities must be at most {MAX_QUANTITY:,} shares")
+    if (
+        not np.all(np.isfinite(prices))
+        or np.any(prices <= 0)
+        or np.any(prices > MAX_PRICE)
+    ):
+        raise ValueError(f"Prices must be positive and at most {MAX_PRICE:,}")
+    return quantities.astype(np.int64), _paise(prices)
+
+
+def grid(quantities, prices):
+    # One single-step scenario per (quantity, price) pair, quantity-major.
+    try:
+        quantities = np.asarray(quantities, dtype=float)
+        prices = np.asarray(prices, dtype=float)
+    except (TypeError, ValueError):
+        quantities = prices = None
+    if quantities is None or quantities.ndim != 1 or prices.ndim != 1:
+        raise ValueError("grid quantities and prices must be lists of numbers")
+    if not 0 < len(quantities) * len(prices) <= MAX_SCENARIOS:
+        raise ValueError(f"A grid must have between 1 and {MAX_SCENARIOS} points")
+    quantity_grid, price_grid = np.meshgrid(quantities, prices, indexing="ij")
+    return _steps(quantity_grid.reshape(-1, 1), price_grid.reshape(-1, 1))
+
+
+def ladders(items):
+    # Each ladder is a list of [quantity, price] steps, applied in order.
+    # Shorter ladders are padded with empty steps.
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_SCENARIOS:
+        raise ValueError(f"Send between 1 and {MAX_SCENARIOS} ladders")
+    steps = max(
+        (len(ladder) for ladder in items if isinstance(ladder, list)), default=0
+    )
+    if not 0 < steps <= MAX_STEPS:
+        raise ValueError(f"Each ladder must have between 1 and {MAX_STEPS} steps")
+    quantities = np.zeros((len(items), steps))
+    prices = np.ones((len(items), steps))
+    for index, ladder in enumerate(items):
+        try:
+            rows = np.asarray(ladder, dtype=float)
+        except (TypeError, ValueError):
+            rows = None
+        if rows is None or rows.ndim != 2 or rows.shape[1] != 2 or not len(rows):
+            raise ValueError(f"Ladder {index} must be a list of [quantity, price]")
+        quantities[index, : len(rows)] = rows[:, 0]
+        prices[index, : len(rows)] = rows[:, 1]
+    return _steps(quantities, prices)
+
+
+def evaluate(quantity, cost, quantities, prices):
+    # Applies every ladder to the position at once: a loop over the steps,
+    # each one vectorized across the scenarios. Amounts are int64 paise.
+    #   avg_price: average cost of the shares held; SELLs leave it unchanged.
+    #   break_even: net cash put in per share held, the price at which
+    #     selling everything returns it all; 0 once sales have paid it back.
+    #   capital_required: the most cash the ladder has out at any step.
+    # Scenarios that sell more than they hold are marked invalid.
+    scenarios, steps = quantities.shape
+    held = np.full(scenarios, quantity, dtype=np.int64)
+    basis = np.full(scenarios, float(cost) * 100)
+    net = np.full(scenarios, int(round(cost * 100)), dtype=np.int64)
+    outlay = np.zeros(scenarios, dtype=np.int64)
+    capital = np.zeros(scenarios, dtype=np.int64)
+    valid = np.ones(scenarios, dtype=bool)
+
+    for step in range(steps):
+        change = quantities[:, step]
+        amount = change * prices[:, step]
+        remaining = held + change
+        valid &= remaining >= 0
+        kept = np.divide(
+            remaining, held, out=np.zeros(scenarios), where=(change < 0) & (held > 0)
+        )
+        basis = np.where(change < 0, basis * kept, basis + np.maximum(amount, 0))
+        held = remaining
+        net += amount
+        outlay += amount
+        np.maximum(capital, outlay, out=capital)
+
+    open_ = valid & (held > 0)
+    avg_price = np.divide(basis, held, out=np.full(scenarios, np.nan), where=open_)
+    break_even = np.divide(
+        np.maximum(net, 0), held, out=np.full(scenarios, np.nan), where=open_
+    )
+    return {
+        "valid": valid,
+        "quantity": np.where(valid, held, -1),
+        "avg_price": avg_price / 100,
+        "break_even": break_even / 100,
+        "capital_required": np.where(valid, capital / 100, np.nan),
+    }
+
+
+def _column(values):
+    return [None if math.isnan(value) else value for value in np.round(values, 2)]
+
+
+def scenarios(user, symbol, quantities, prices):
+    # JSON-ready columns, one entry per scenario; None where undefined.
+    symbol = securities.normalize(symbol)
+    quantity, cost = position(user, symbol)
+    results = evaluate(quantity, cost, quantities, prices)
+    return {
+        "symbol": symbol,
+        "position": {
+            "quantity": quantity,
+            "total_cost": float(cost),
+            "avg_price": round(float(cost / quantity), 2) if quantity else None,
+        },
+        "results": {
+            "valid": results["valid"].tolist(),
+            "quantity": [
+                int(value) if valid else None
+                for value, valid in zip(results["quantity"], results["valid"])
+            ],
+            "avg_price": _column(results["avg_price"]),
+            "break_even": _column(results["break_even"]),
+            "capital_required": _column(results["capital_required"]),
+        },
+    }